@@ -0,0 +1,159 @@
+# coding: utf-8
+
+"""bench_bert_batching.py
+
+Compare the throughput of the two batching strategies of bert_SA.py on a synthetic week:
+    - padded: fixed batches of BATCH_SIZE lines, padded to the longest line of the week (bert_SA.predict_padded)
+    - bucketed: lines sorted by length and batched under a token budget (bert_SA.predict)
+
+Throughput is reported as real (non-padding) tokens per second. The agreement of the predictions is reported as well;
+both strategies should predict the same labels.
+
+Usage: python ./benchmarks/bench_bert_batching.py [--model_path PATH] [--lines N]
+Without --model_path, a tiny randomly initialized model is built in a temporary directory.
+
+Author: Gyu-min Lee
+his.nigel at gmail dot com
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "scripts"))
+
+import torch
+
+from transformers import AutoTokenizer
+from transformers import AutoModelForSequenceClassification
+
+import bert_SA
+
+from tiny_model import build_tiny_model
+
+def make_synthetic_week(num_lines:int, seed:int = 70) -> list:
+    """make glued concordance-like lines with a long-tailed length distribution
+
+    Params:
+        num_lines(int): the number of lines
+        seed(int): the random seed
+
+    Returns:
+        list: the lines
+    """
+
+    rng = random.Random(seed)
+    syllables = [chr(code) for code in range(0xAC00, 0xAC00 + 2000)]
+
+    lines = list()
+
+    for _ in range(num_lines):
+        num_words = max(1, int(rng.lognormvariate(2.3, 0.8)))
+        words = ("".join(rng.choice(syllables) for _ in range(rng.randint(1, 4))) for _ in range(num_words))
+        lines.append(" ".join(words))
+
+    return lines
+
+def measure(predict, repeat:int) -> tuple:
+    """run the prediction repeatedly and keep the fastest run
+
+    Params:
+        predict(callable): function returning the predictions
+        repeat(int): the number of runs
+
+    Returns:
+        (float, np.ndarray): the seconds of the fastest run and the predictions
+    """
+
+    best = float("inf")
+
+    for _ in range(repeat):
+        start = time.perf_counter()
+        preds = predict()
+        best = min(best, time.perf_counter() - start)
+
+    return best, preds
+
+def main(model_path, num_lines, repeat, output):
+    device = 'cuda' if torch.cuda.is_available() else 'cpu'
+    model_name = model_path or "tiny"
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        if model_path is None:
+            model_path = build_tiny_model(os.path.join(temp_dir, "tiny-roberta"))
+
+        tokenizer = AutoTokenizer.from_pretrained(model_path, local_files_only=True)
+        model = AutoModelForSequenceClassification.from_pretrained(model_path, local_files_only=True, num_labels=2)
+        model = model.to(device)
+
+    lines = make_synthetic_week(num_lines)
+
+    lengths = [len(ids) for ids in tokenizer(lines, max_length=bert_SA.MAX_LENGTH, truncation=True)['input_ids']]
+    real_tokens = sum(lengths)
+
+    padded_seconds, padded_preds = measure(lambda: bert_SA.predict_padded(lines, tokenizer, model, device), repeat)
+    bucketed_seconds, bucketed_preds = measure(lambda: bert_SA.predict(lines, tokenizer, model, device), repeat)
+
+    report = {
+        "device": device,
+        "model_path": model_name,
+        "lines": num_lines,
+        "real_tokens": real_tokens,
+        "padded_tokens_before": num_lines * max(lengths),
+        "padded_tokens_after": int(sum(len(batch) * max(lengths[idx] for idx in batch)
+                                    for batch in bert_SA.make_batches(np.array(lengths)))),
+        "tokens_per_second_before": real_tokens / padded_seconds,
+        "tokens_per_second_after": real_tokens / bucketed_seconds,
+        "speedup": padded_seconds / bucketed_seconds,
+        "agreement": float(np.mean(padded_preds == bucketed_preds)),
+    }
+
+    print(f"lines: {num_lines}, real tokens: {real_tokens}, device: {device}")
+    print(f"padded (before):   {report['tokens_per_second_before']:12.1f} tokens/s, "
+            f"{report['padded_tokens_before']} tokens fed")
+    print(f"bucketed (after):  {report['tokens_per_second_after']:12.1f} tokens/s, "
+            f"{report['padded_tokens_after']} tokens fed")
+    print(f"speedup: {report['speedup']:.2f}x, agreement: {report['agreement']:.4f}")
+
+    if output is not None:
+        with open(output, 'w') as file:
+            json.dump(report, file, indent=1)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="bench_bert_batching",
+                                    description="Benchmark the batching strategies of bert_SA.py")
+
+    parser.add_argument('-m',
+                        '--model_path',
+                        type=str,
+                        dest='model_path',
+                        default=None,
+                        help="Model to benchmark with. A tiny random model is built if not given")
+    parser.add_argument('-n',
+                        '--lines',
+                        type=int,
+                        dest='lines',
+                        default=2000,
+                        help="Number of lines in the synthetic week")
+    parser.add_argument('-r',
+                        '--repeat',
+                        type=int,
+                        dest='repeat',
+                        default=3,
+                        help="Number of runs per strategy; the fastest is reported")
+    parser.add_argument('-o',
+                        '--output',
+                        type=str,
+                        dest='output',
+                        default=None,
+                        help="Path to save the report as JSON")
+
+    arguments = parser.parse_args()
+
+    main(arguments.model_path, arguments.lines, arguments.repeat, arguments.output)
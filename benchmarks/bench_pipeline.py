@@ -0,0 +1,211 @@
+# coding: utf-8
+
+"""bench_pipeline.py
+
+Time every stage of the pipeline on synthetic corpora of increasing sizes.
+
+For each size, a corpus is generated with synthetic_corpus.py in a temporary directory laid out as the repository
+(scripts linked, a tiny local model in place of the fine-tuned one), and the stages of run_pipeline.py are run there
+one after another as they are in the real pipeline:
+    merge_texts, concordance, get_freq, dict_SA, bert_SA, corpus_stats
+
+The seconds of a stage are those its script records itself with instrument.measure, read from a metrics log of its own
+run (COVID_PRESS_METRICS): the records of the stage process not bound to a file. They leave out the start of the
+interpreter, the imports, and the loading of the model and the lexicon, which would otherwise dominate the small
+corpora. The wall time of the whole process is reported alongside, and their difference as the startup.
+
+The report gives, for each stage and size, the seconds taken and the throughput in articles and morphemes per second,
+and for each stage the scaling exponent: the slope of log(seconds) against log(articles), 1.0 being linear.
+
+Usage: python ./benchmarks/bench_pipeline.py --sizes 2000 4000 8000 --output bench_pipeline.json
+
+Author: Gyu-min Lee
+his.nigel at gmail dot com
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+sys.path.insert(0, os.path.join(REPO_ROOT, "scripts"))
+
+from run_pipeline import STAGES
+
+from synthetic_corpus import make_corpus
+from tiny_model import build_tiny_model
+
+BENCH_STAGES = ["merge_texts", "concordance", "get_freq", "dict_SA", "bert_SA", "corpus_stats"]
+STAGE_ARGS = {"bert_SA": ["--no_cache"]}
+
+def prepare_root(root:str, model_path:str) -> None:
+    """lay out the temporary directory as the repository around the synthetic corpus
+
+    Params:
+        root(str): the temporary directory
+        model_path(str): the model to use in place of the fine-tuned one
+    """
+
+    os.symlink(os.path.join(REPO_ROOT, "scripts"), os.path.join(root, "scripts"))
+    os.makedirs(os.path.join(root, "results"), exist_ok=True)
+    os.makedirs(os.path.join(root, "resources", "model_save"), exist_ok=True)
+    os.symlink(os.path.abspath(model_path), os.path.join(root, "resources", "model_save", "klue-RoBERTa-base-SA"))
+
+def get_measured_seconds(metrics_path:str, stage_name:str, pid:int) -> float:
+    """sum the seconds of the stage recorded by its process, leaving out the records of the files within it
+
+    Params:
+        metrics_path(str): the metrics log of the run of the stage
+        stage_name(str): the name of the stage, as recorded by instrument.measure
+        pid(int): the process of the stage
+
+    Returns:
+        float: the seconds
+    """
+
+    with open(metrics_path) as file:
+        records = [json.loads(line) for line in file]
+
+    records = [record for record in records
+                if record["stage"] == stage_name and record["pid"] == pid and "file" not in record]
+    if not records:
+        raise RuntimeError(f"{stage_name} recorded no measurement in {metrics_path}")
+
+    return sum(record["seconds"] for record in records)
+
+def run_stages(root:str, stage_names:list) -> dict:
+    """run the stages in root, in the order of the pipeline
+
+    Params:
+        root(str): the directory laid out as the repository
+        stage_names(list): the names of the stages to run
+
+    Returns:
+        dict: the stage name and (the seconds measured in the stage, the wall seconds of its process)
+    """
+
+    seconds = dict()
+
+    for stage in STAGES:
+        if stage.name not in stage_names:
+            continue
+        metrics_path = os.path.join(root, "logs", f"{stage.name}.jsonl")
+        start = time.perf_counter()
+        process = subprocess.Popen([sys.executable] + stage.command + STAGE_ARGS.get(stage.name, []),
+                                    cwd=root,
+                                    env=dict(os.environ, COVID_PRESS_METRICS=metrics_path),
+                                    stdout=subprocess.DEVNULL,
+                                    stderr=subprocess.DEVNULL)
+        if process.wait() != 0:
+            raise subprocess.CalledProcessError(process.returncode, process.args)
+        wall_seconds = time.perf_counter() - start
+        seconds[stage.name] = (get_measured_seconds(metrics_path, stage.name, process.pid), wall_seconds)
+        print(f"  {stage.name}: {seconds[stage.name][0]:.2f}s ({wall_seconds:.2f}s with the startup)")
+
+    return seconds
+
+def get_scaling(sizes:list, seconds:list) -> float:
+    """fit the scaling exponent of the seconds against the sizes on a log-log scale"""
+
+    if len(sizes) < 2:
+        return None
+
+    slope, _ = np.polyfit(np.log(sizes), np.log(seconds), 1)
+
+    return float(slope)
+
+def main(sizes, stage_names, days, words, model_path, output):
+    report = {"sizes": sizes, "days": days, "words_per_article": words, "stages": {name: list() for name in stage_names}}
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        if model_path is None:
+            model_path = build_tiny_model(os.path.join(temp_dir, "tiny-roberta"))
+
+        for size in sizes:
+            root = os.path.join(temp_dir, f"corpus_{size}")
+            os.makedirs(root)
+            prepare_root(root, model_path)
+
+            corpus_stats = make_corpus(root, size, num_days=days, words_per_article=words)
+            print(f"{size} articles: {corpus_stats['morphemes']} morphemes")
+
+            for name, (seconds, wall_seconds) in run_stages(root, stage_names).items():
+                report["stages"][name].append({
+                    "articles": corpus_stats["articles"],
+                    "morphemes": corpus_stats["morphemes"],
+                    "seconds": seconds,
+                    "wall_seconds": wall_seconds,
+                    "startup_seconds": wall_seconds - seconds,
+                    "articles_per_second": corpus_stats["articles"] / seconds,
+                    "morphemes_per_second": corpus_stats["morphemes"] / seconds,
+                })
+
+    report["scaling"] = {name: get_scaling([run["articles"] for run in runs], [run["seconds"] for run in runs])
+                        for name, runs in report["stages"].items()}
+
+    print("stage\t" + "\t".join(f"{size} art/s" for size in sizes) + "\tscaling")
+    for name, runs in report["stages"].items():
+        scaling = report["scaling"][name]
+        print(f"{name}\t" + "\t".join(f"{run['articles_per_second']:.1f}" for run in runs)
+                + (f"\t{scaling:.2f}" if scaling is not None else "\t-"))
+
+    if output is not None:
+        with open(output, 'w') as file:
+            json.dump(report, file, indent=1)
+        print(f"Report saved as {output}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="bench_pipeline",
+                                    description="Benchmark the pipeline stages on synthetic corpora")
+
+    parser.add_argument('-s',
+                        '--sizes',
+                        type=int,
+                        nargs='+',
+                        dest='sizes',
+                        default=[2000, 4000, 8000],
+                        help="Numbers of articles of the synthetic corpora")
+    parser.add_argument('--stages',
+                        nargs='+',
+                        dest='stages',
+                        default=BENCH_STAGES,
+                        help=f"Stages to benchmark, among {', '.join(BENCH_STAGES)}")
+    parser.add_argument('--days',
+                        type=int,
+                        dest='days',
+                        default=28,
+                        help="Number of daily files")
+    parser.add_argument('-w',
+                        '--words',
+                        type=int,
+                        dest='words',
+                        default=150,
+                        help="Mean number of words of an article body")
+    parser.add_argument('-m',
+                        '--model_path',
+                        type=str,
+                        dest='model_path',
+                        default=None,
+                        help="Model to use for bert_SA. A tiny random model is built if not given")
+    parser.add_argument('-o',
+                        '--output',
+                        type=str,
+                        dest='output',
+                        default=None,
+                        help="Path to save the report as JSON")
+
+    arguments = parser.parse_args()
+
+    unknown = set(arguments.stages) - set(BENCH_STAGES)
+    if unknown:
+        parser.error(f"unknown stages: {', '.join(sorted(unknown))}")
+
+    main(sorted(arguments.sizes), arguments.stages, arguments.days, arguments.words, arguments.model_path,
+        arguments.output)
@@ -0,0 +1,167 @@
+# coding: utf-8
+
+"""check_kosac_ngrams.py
+
+Check the n-gram scoring of kosac_sent_analyzer.py against the three passes it replaced.
+
+Random lexicons and PoS tagged sentences are drawn from a small vocabulary, so that the n-grams overlap and repeat
+often, and each sentence is scored at the levels 1 to 3 with:
+    - score_ngrams(), the single trie-based scan
+    - VectorizedAnalyzer.analyze_many(), on a polarity.csv written from the same lexicon
+    - a copy of the passes over trigrams, bigrams, and unigrams of the former SentimentAnalyzer.analyze()
+All three must give the same score for every sentence.
+
+Usage: python ./benchmarks/check_kosac_ngrams.py --lexicons 50 --sentences 200 --seed 0
+
+Author: Gyu-min Lee
+his.nigel at gmail dot com
+"""
+
+import argparse
+import csv
+import os
+import random
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "scripts"))
+
+from kosac_sent_analyzer import SentimentLexicon
+from kosac_sent_analyzer import VectorizedAnalyzer
+from kosac_sent_analyzer import score_ngrams
+
+VOCAB = ["코로나/NNP", "백신/NNG", "확진/NNG", "가/JKS", "이/JKS", "나쁘/VA", "좋/VA", "않/VX", "다/EF", "./SF"]
+CATEGORIES = ["POS", "NEUT", "NEG"]
+
+def analyze_unigram(sent_dict, sentence, checked_tokens):
+    sentiment_score = 0
+    tokens_checked_here = list()
+
+    for token in sentence.split(' '):
+        if token in checked_tokens:
+            continue
+        token_score = sent_dict.lookup(token)
+        if token_score != None:
+            sentiment_score += token_score
+            tokens_checked_here.append(token)
+
+    return sentiment_score, tokens_checked_here
+
+def analyze_bigram(sent_dict, sentence, checked_tokens):
+    sentiment_score = 0
+    tokens_checked_here = list()
+    tokens = sentence.split(' ')
+
+    for idx in range(len(tokens)-1):
+        if tokens[idx] in checked_tokens and tokens[idx+1] in checked_tokens:
+            continue
+        bigram_score = sent_dict.lookup(tokens[idx] + ";" + tokens[idx+1])
+        if bigram_score != None:
+            sentiment_score += bigram_score
+            tokens_checked_here.append(tokens[idx])
+            tokens_checked_here.append(tokens[idx+1])
+
+    return sentiment_score, tokens_checked_here
+
+def analyze_trigram(sent_dict, sentence, checked_tokens):
+    sentiment_score = 0
+    tokens_checked_here = list()
+    tokens = sentence.split(' ')
+
+    for idx in range(len(tokens)-2):
+        if tokens[idx] in checked_tokens and tokens[idx+1] in checked_tokens and tokens[idx+2] in checked_tokens:
+            continue
+        trigram_score = sent_dict.lookup(tokens[idx] + ";" + tokens[idx+1] + ";" + tokens[idx+2])
+        if trigram_score != None:
+            sentiment_score += trigram_score
+            tokens_checked_here.append(tokens[idx])
+            tokens_checked_here.append(tokens[idx+1])
+            tokens_checked_here.append(tokens[idx+2])
+
+    return sentiment_score, tokens_checked_here
+
+def reference_score(sent_dict, sentence:str, level:int) -> int:
+    """score the sentence as the former SentimentAnalyzer.analyze() did with no_tagging=True"""
+
+    trigram_score, trigram_checked_list = 0, list()
+    bigram_score, bigram_checked_list = 0, list()
+
+    if level == 3:
+        trigram_score, trigram_checked_list = analyze_trigram(sent_dict, sentence, list())
+    if level >= 2:
+        bigram_score, bigram_checked_list = analyze_bigram(sent_dict, sentence, trigram_checked_list)
+    unigram_score, _ = analyze_unigram(sent_dict, sentence, trigram_checked_list + bigram_checked_list)
+
+    return trigram_score + bigram_score + unigram_score
+
+def make_lexicon(rng:random.Random) -> list:
+    """draw the (ngram, category) rows of a random polarity.csv, some n-grams listed under several categories"""
+
+    rows = list()
+
+    for _ in range(rng.randint(1, 30)):
+        ngram = ";".join(rng.choice(VOCAB) for _ in range(rng.randint(1, 3)))
+        rows.append((ngram, rng.choice(CATEGORIES)))
+
+    return rows
+
+def make_sentence(rng:random.Random) -> str:
+    return " ".join(rng.choice(VOCAB) for _ in range(rng.randint(1, 12)))
+
+def main(num_lexicons:int, num_sentences:int, seed:int):
+    rng = random.Random(seed)
+    num_checked = 0
+
+    with tempfile.TemporaryDirectory() as root:
+        for lexicon_idx in range(num_lexicons):
+            rows = make_lexicon(rng)
+            sentences = [make_sentence(rng) for _ in range(num_sentences)]
+
+            filename = os.path.join(root, f"polarity_{lexicon_idx}.csv")
+            with open(filename, 'w', newline='') as file:
+                writer = csv.writer(file)
+                writer.writerow(["ngram", "max.value"])
+                writer.writerows(rows + [("", "POS")] * 3) # load_sentiment_dictionary() expects at least 3 rows
+
+            lexicon = SentimentLexicon([ngram for ngram, category in rows if category == "POS"],
+                                        [ngram for ngram, category in rows if category == "NEUT"],
+                                        [ngram for ngram, category in rows if category == "NEG"])
+
+            for level in (1, 2, 3):
+                vectorized = VectorizedAnalyzer(level, filename).analyze_many(sentences)
+                for sentence, vectorized_score in zip(sentences, vectorized):
+                    expected = reference_score(lexicon, sentence, level)
+                    scanned = score_ngrams(lexicon, sentence, level)
+                    assert scanned == expected == vectorized_score, \
+                        f"level {level}, {rows}, {sentence!r}: {scanned}, {vectorized_score} != {expected}"
+                    num_checked += 1
+
+    print(f"OK: {num_checked} scores of {num_lexicons} lexicons at the levels 1 to 3 match the three passes.")
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(prog="check_kosac_ngrams",
+                                    description="Check the n-gram scoring of kosac_sent_analyzer.py")
+
+    parser.add_argument('--lexicons',
+                        type=int,
+                        dest='lexicons',
+                        action='store',
+                        default=50,
+                        help="Number of random lexicons")
+    parser.add_argument('--sentences',
+                        type=int,
+                        dest='sentences',
+                        action='store',
+                        default=200,
+                        help="Number of random sentences per lexicon")
+    parser.add_argument('--seed',
+                        type=int,
+                        dest='seed',
+                        action='store',
+                        default=0,
+                        help="Seed of the random lexicons and sentences")
+
+    arguments = parser.parse_args()
+
+    main(arguments.lexicons, arguments.sentences, arguments.seed)
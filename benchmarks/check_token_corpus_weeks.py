@@ -0,0 +1,78 @@
+# coding: utf-8
+
+"""check_token_corpus_weeks.py
+
+Check the weekly frequencies of get_freq.py --token_corpus on a corpus with empty weeks.
+
+A small tagged corpus is written in a temporary directory, with a week whose daily file is empty in the middle and
+another at the end, and indexed with corpus_index.py. The frequencies from get_token_corpus_rows() must be 0 for the
+empty weeks, and those of the other weeks must equal the counts of the keywords in the titles and the bodies of their
+articles.
+
+Usage: python ./benchmarks/check_token_corpus_weeks.py
+
+Author: Gyu-min Lee
+his.nigel at gmail dot com
+"""
+
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "scripts"))
+
+from corpus_index import CorpusIndex
+from corpus_index import build_index
+from get_freq import KEYWORDS
+from get_freq import get_token_corpus_rows
+from merge_texts_by_weeks import get_datetime
+from merge_texts_by_weeks import get_week
+from merge_texts_by_weeks import get_weekly_name
+
+DAILY_FILES = {
+    "2022.03.07.tsv": ["연합뉴스\t코로나/NNP 확진/NNG\t백신/NNG 코로나/NNP 이/JKS 다/EF",
+                        "뉴시스\t마스크/NNG\t거리두기/NNG 마스크/NNG 다/EF"],
+    "2022.03.08.tsv": ["KBS\t백신/NNG\t코로나/NNP 다/EF"],
+    "2022.03.14.tsv": [], # an empty week in the middle
+    "2022.03.21.tsv": ["뉴스1\t확진/NNG 확진/NNG\t코로나/NNP 가/JKS 백신/NNG"],
+    "2022.03.28.tsv": [], # an empty week at the end
+}
+
+def get_expected_rows() -> list:
+    """count the keywords in the titles and the bodies of the articles of each week"""
+
+    rows = dict()
+
+    for name, lines in DAILY_FILES.items():
+        week = get_weekly_name(get_week(get_datetime(name)))
+        counts = rows.setdefault(week, [0] * len(KEYWORDS))
+        for line in lines:
+            tokens = " ".join(line.split('\t')[1:]).split(' ')
+            for idx, keyword in enumerate(KEYWORDS):
+                counts[idx] += tokens.count(keyword)
+
+    return [[week] + counts for week, counts in rows.items()]
+
+def main():
+    with tempfile.TemporaryDirectory() as root:
+        tagged_root = os.path.join(root, "tagged")
+        corpus_dir = os.path.join(root, "tagged_ids")
+        os.makedirs(tagged_root)
+
+        for name, lines in DAILY_FILES.items():
+            with open(os.path.join(tagged_root, name), 'w') as file:
+                file.write("".join(line + '\n' for line in lines))
+
+        build_index(tagged_root, corpus_dir)
+        result_list_abs, result_list_rel = get_token_corpus_rows(CorpusIndex(corpus_dir))
+
+    expected = get_expected_rows()
+
+    assert result_list_abs == expected, f"{result_list_abs} != {expected}"
+    assert all(value == 0 for row in result_list_rel if row[0] in ("2022.03.14_wkly.tsv", "2022.03.28_wkly.tsv")
+                for value in row[1:])
+
+    print(f"OK: the frequencies of {len(expected)} weeks, two of them empty, are as expected.")
+
+if __name__ == "__main__":
+    main()
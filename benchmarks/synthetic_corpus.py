@@ -0,0 +1,208 @@
+# coding: utf-8
+
+"""synthetic_corpus.py
+
+Generate a deterministic synthetic corpus in the format of ./data/COVID19 for benchmarking.
+
+The daily files of cleaned and tagged are written in the PRESS\tTITLE\tARTICLE layout, one article per line:
+    - the morphemes are drawn from a Zipfian vocabulary of FORM/TAG pairs, with the five keywords among the frequent ones
+    - the presses are drawn with the weights of the largest presses of the real corpus (results/press_count.xlsx)
+    - cleaned has the words glued from the morphemes; tagged has the same morphemes in FORM/TAG format
+A small polarity.csv in the format of the KOSAC dictionary is generated from the same vocabulary.
+
+The same arguments always give the same files.
+
+Author: Gyu-min Lee
+his.nigel at gmail dot com
+"""
+
+import argparse
+import datetime
+import os
+
+import numpy as np
+import pandas as pd
+
+KEYWORDS = [("코로나", "NNP"), ("마스크", "NNG"), ("확진", "NNG"), ("거리두기", "NNG"), ("백신", "NNG")]
+
+PRESSES = [("연합뉴스", 190697), ("뉴시스", 176687), ("뉴스1", 141341), ("이데일리", 69545), ("머니투데이", 69431),
+            ("파이낸셜뉴스", 63993), ("KBS", 62483), ("아시아경제", 58206), ("YTN", 49945), ("한국경제", 47341),
+            ("서울경제", 43336), ("매일경제", 39914), ("헤럴드경제", 37697), ("노컷뉴스", 34809), ("세계일보", 33296),
+            ("머니S", 29960), ("국민일보", 29832), ("MBC", 29355), ("조선비즈", 27675), ("서울신문", 27612)]
+
+CONTENT_TAGS = ["NNG", "NNG", "NNG", "NNP", "VV", "VA", "MAG", "SN"]
+FUNCTION_MORPHEMES = [("이", "JKS"), ("가", "JKS"), ("을", "JKO"), ("를", "JKO"), ("의", "JKG"), ("에", "JKB"),
+                        ("은", "JX"), ("는", "JX"), ("다", "EF"), ("고", "EC"), ("었", "EP"), ("ᆫ", "ETM")]
+
+def make_vocab(size:int, rng:np.random.Generator) -> list:
+    """make a vocabulary of content morphemes, the keywords first
+
+    Params:
+        size(int): the number of morphemes
+        rng(np.random.Generator): the random generator
+
+    Returns:
+        list: list of (form, tag), in the order of their Zipfian rank
+    """
+
+    syllables = [chr(code) for code in range(0xAC00, 0xAC00 + 2000)]
+
+    vocab = list(KEYWORDS)
+    seen = set(vocab)
+
+    while len(vocab) < size:
+        form = "".join(rng.choice(syllables, size=rng.integers(1, 4)))
+        morpheme = (form, CONTENT_TAGS[rng.integers(len(CONTENT_TAGS))])
+        if morpheme not in seen:
+            seen.add(morpheme)
+            vocab.append(morpheme)
+
+    # the keywords are frequent, but not the most frequent morphemes
+    order = list(range(len(KEYWORDS), min(size, 20))) + list(range(len(KEYWORDS))) + list(range(20, size))
+
+    return [vocab[idx] for idx in order]
+
+def zipf_weights(size:int, exponent:float = 1.1) -> np.ndarray:
+    weights = 1 / np.arange(1, size + 1) ** exponent
+
+    return weights / weights.sum()
+
+def make_text(vocab:list, weights:np.ndarray, num_words:int, rng:np.random.Generator) -> tuple:
+    """make a text as both glued words and FORM/TAG morphemes
+
+    Params:
+        vocab(list): list of (form, tag)
+        weights(np.ndarray): the probability of each morpheme
+        num_words(int): the number of words
+        rng(np.random.Generator): the random generator
+
+    Returns:
+        (str, str): the cleaned and the tagged text
+    """
+
+    contents = rng.choice(len(vocab), size=num_words, p=weights)
+    suffixes = rng.integers(-len(FUNCTION_MORPHEMES), len(FUNCTION_MORPHEMES), size=num_words) # no suffix if < 0
+
+    words = list()
+    morphemes = list()
+
+    for content, suffix in zip(contents, suffixes):
+        word = [vocab[content]]
+        if suffix >= 0:
+            word.append(FUNCTION_MORPHEMES[suffix])
+        words.append("".join(form for form, _ in word))
+        morphemes.extend(f"{form}/{tag}" for form, tag in word)
+
+    return " ".join(words), " ".join(morphemes)
+
+def write_polarity(path:str, vocab:list, rng:np.random.Generator, size:int = 600) -> None:
+    """write a polarity.csv with unigrams and bigrams of the vocabulary
+
+    Params:
+        path(str): path to the file
+        vocab(list): list of (form, tag)
+        rng(np.random.Generator): the random generator
+        size(int): the number of n-grams
+    """
+
+    tokens = [f"{form}/{tag}" for form, tag in vocab[:size * 2]]
+    tokens += [f"{form}/{tag}" for form, tag in FUNCTION_MORPHEMES]
+
+    ngrams = set()
+    while len(ngrams) < size:
+        n = 1 if rng.random() < 0.6 else 2
+        ngrams.add(";".join(rng.choice(tokens, size=n)))
+
+    polarity = pd.DataFrame({"ngram": sorted(ngrams)})
+    polarity["max.value"] = rng.choice(["POS", "NEUT", "NEG"], size=len(polarity))
+    polarity["max.prop"] = 1
+
+    polarity.to_csv(path, index=False)
+
+def make_corpus(root:str, num_articles:int, num_days:int = 28, words_per_article:int = 150, vocab_size:int = 20000,
+                start:datetime.date = datetime.date(2021, 1, 4), seed:int = 70) -> dict:
+    """write the synthetic corpus into root/data/COVID19 and root/polarity.csv
+
+    Params:
+        root(str): the directory to write in, as the repository root
+        num_articles(int): the number of articles, spread evenly over the days
+        num_days(int): the number of daily files
+        words_per_article(int): the mean number of words of an article body
+        vocab_size(int): the number of content morphemes
+        start(datetime.date): the date of the first daily file
+        seed(int): the random seed
+
+    Returns:
+        dict: the numbers of the articles, the words of cleaned, and the morphemes of tagged
+    """
+
+    rng = np.random.default_rng(seed)
+
+    vocab = make_vocab(vocab_size, rng)
+    weights = zipf_weights(vocab_size)
+    press_names = [press for press, _ in PRESSES]
+    press_weights = np.array([count for _, count in PRESSES], dtype=float)
+    press_weights /= press_weights.sum()
+
+    cleaned_root = os.path.join(root, "data", "COVID19", "cleaned")
+    tagged_root = os.path.join(root, "data", "COVID19", "tagged")
+    os.makedirs(cleaned_root, exist_ok=True)
+    os.makedirs(tagged_root, exist_ok=True)
+
+    write_polarity(os.path.join(root, "polarity.csv"), vocab, rng)
+
+    stats = {"articles": 0, "words": 0, "morphemes": 0}
+
+    for day in range(num_days):
+        name = (start + datetime.timedelta(days=day)).strftime("%Y.%m.%d") + ".tsv"
+        num_day_articles = num_articles // num_days + (day < num_articles % num_days)
+
+        with open(os.path.join(cleaned_root, name), 'w') as cleaned, open(os.path.join(tagged_root, name), 'w') as tagged:
+            for _ in range(num_day_articles):
+                press = press_names[rng.choice(len(press_names), p=press_weights)]
+                cleaned_title, tagged_title = make_text(vocab, weights, int(rng.integers(4, 12)), rng)
+                cleaned_body, tagged_body = make_text(vocab, weights, max(1, int(rng.poisson(words_per_article))), rng)
+
+                cleaned.write(f"{press}\t{cleaned_title}\t{cleaned_body}\n")
+                tagged.write(f"{press}\t{tagged_title}\t{tagged_body}\n")
+
+                stats["articles"] += 1
+                stats["words"] += len(cleaned_title.split(' ')) + len(cleaned_body.split(' '))
+                stats["morphemes"] += len(tagged_title.split(' ')) + len(tagged_body.split(' '))
+
+    return stats
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="synthetic_corpus",
+                                    description="Generate a synthetic corpus in the format of ./data/COVID19")
+
+    parser.add_argument('root',
+                        type=str,
+                        help="Directory to write the corpus in, as the repository root")
+    parser.add_argument('-n',
+                        '--articles',
+                        type=int,
+                        dest='articles',
+                        default=2000,
+                        help="Number of articles")
+    parser.add_argument('--days',
+                        type=int,
+                        dest='days',
+                        default=28,
+                        help="Number of daily files")
+    parser.add_argument('-w',
+                        '--words',
+                        type=int,
+                        dest='words',
+                        default=150,
+                        help="Mean number of words of an article body")
+    parser.add_argument('-s',
+                        '--seed',
+                        type=int,
+                        dest='seed',
+                        default=70,
+                        help="Random seed")
+
+    arguments = parser.parse_args()
+
+    print(make_corpus(arguments.root, arguments.articles, arguments.days, arguments.words, seed=arguments.seed))
@@ -0,0 +1,76 @@
+# coding: utf-8
+
+"""tiny_model.py
+
+Build a tiny, randomly initialized RoBERTa sentiment classifier for benchmarking.
+
+The model has the architecture of klue/roberta-base (a BERT WordPiece tokenizer with a RoBERTa encoder) but only a
+fraction of its size, and is built entirely offline. Its predictions are meaningless; it only exercises the same code
+paths as the fine-tuned model.
+
+Author: Gyu-min Lee
+his.nigel at gmail dot com
+"""
+
+import os
+
+from transformers import BertTokenizerFast
+from transformers import RobertaConfig
+from transformers import RobertaForSequenceClassification
+
+SPECIAL_TOKENS = ["[PAD]", "[UNK]", "[CLS]", "[SEP]", "[MASK]"]
+
+def get_vocab() -> list:
+    """get a WordPiece vocabulary covering all Hangul syllables, ASCII, and common punctuation
+
+    Returns:
+        list: the vocabulary, special tokens first
+    """
+
+    characters = [chr(code) for code in range(0xAC00, 0xD7A4)] # Hangul syllables
+    characters += [chr(code) for code in range(0x21, 0x7F)] # printable ASCII
+    characters += list("…·‘’“”「」『』")
+
+    return SPECIAL_TOKENS + characters + ["##" + character for character in characters]
+
+def build_tiny_model(path:str, hidden_size:int = 64, num_layers:int = 2, seed:int = 70) -> str:
+    """build the tiny model and save it with its tokenizer
+
+    Params:
+        path(str): the directory to save the model in
+        hidden_size(int): the hidden size of the encoder
+        num_layers(int): the number of the encoder layers
+        seed(int): the seed for the random initialization
+
+    Returns:
+        str: the path, to be passed to from_pretrained()
+    """
+
+    import torch
+
+    os.makedirs(path, exist_ok=True)
+
+    vocab_path = os.path.join(path, "vocab.txt")
+    with open(vocab_path, 'w') as file:
+        file.write('\n'.join(get_vocab()))
+        file.write('\n')
+
+    tokenizer = BertTokenizerFast(vocab_file=vocab_path, do_lower_case=False)
+    tokenizer.save_pretrained(path)
+
+    config = RobertaConfig(vocab_size=tokenizer.vocab_size,
+                        hidden_size=hidden_size,
+                        num_hidden_layers=num_layers,
+                        num_attention_heads=max(1, hidden_size // 32),
+                        intermediate_size=hidden_size * 4,
+                        max_position_embeddings=514,
+                        pad_token_id=tokenizer.pad_token_id,
+                        bos_token_id=tokenizer.cls_token_id,
+                        eos_token_id=tokenizer.sep_token_id,
+                        num_labels=2)
+
+    torch.manual_seed(seed)
+    model = RobertaForSequenceClassification(config)
+    model.save_pretrained(path)
+
+    return path
@@ -1,13 +1,3 @@
-python ./scripts/merge_stats_by_weeks.py
-python ./scripts/merge_texts_by_weeks.py
-
-python ./scripts/get_concordance_per_file_batch.py
-
-python ./scripts/get_freq.py
-
-python ./scripts/dict_SA.py
-python ./scripts/bert_SA.py
-
-python ./scripts/get_corpus_stats.py
+python ./scripts/run_pipeline.py "$@"
 
 echo "sh :: DONE"
@@ -3,21 +3,37 @@
 """bert_SA.py
 Performs sentiment analysis with glued text aggregated by week.
 
-The results are to be saved as: bert_SA_wkly.csv in the concordance path.
+On CPU, --workers shards the inference across processes. The model is loaded (and quantized) once, and the workers
+are forked after it, so that they share its weights copy-on-write instead of each loading a copy. They are forked
+before the main process runs any inference, with torch kept to a single thread until then: a process forked after
+torch started its intra-op thread pool may hang in it. Every worker runs torch with its own --threads intra-op
+threads, the CPUs divided among the workers by default. The weekly files of all
+the keywords are split into chunks of CHUNK_LINES lines, handed out to the workers as they become free, the largest
+first. Each chunk gives the sum and the number of its scores, and the average of a week is reassembled from those of
+its chunks.
+
+The results are to be saved as bert_SA in the results store of results_store.py, keyed by the keyword and the week.
+Write bert_SA_wkly.csv in the concordance path with export_results.py.
 
 Author: Gyu-min Lee
 his.nigel at gamil dot com
 """
 
+import argparse
+import hashlib
+import multiprocessing
+import multiprocessing.pool
 import os
+import sqlite3
 import sys
 
 import numpy as np
-import pandas as pd
 
 import torch
 
+from collections import defaultdict
 from datetime import datetime
+from typing import Optional
 
 from torch.utils.data import Dataset
 from torch.utils.data import DataLoader
@@ -25,11 +41,28 @@ from torch.utils.data import DataLoader
 from transformers import AutoTokenizer
 from transformers import AutoModelForSequenceClassification
 
+from corpus_reader import get_line_chunks
+from corpus_reader import iter_lines
+from instrument import measure
+from results_store import ResultsStore
+from results_store import get_keyword
+from results_store import STORE_PATH
+
 from tqdm import tqdm
 
 torch.cuda.empty_cache()
 torch.manual_seed(70)
 
+MAX_LENGTH = 128
+BATCH_SIZE = 128
+MAX_TOKENS = MAX_LENGTH * BATCH_SIZE # padded tokens per batch; as many as a full batch of the longest lines
+MODEL_PATH = "./resources/model_save/klue-RoBERTa-base-SA"
+AGREEMENT_SAMPLE = 512 # lines to compare the int8 predictions with the fp32 ones
+CACHE_PATH = "./data/bert_SA_cache.sqlite3"
+CHUNK_LINES = 2048 # lines of a task of a worker, when sharded
+
+_worker = dict() # the tokenizer, the model, and the prediction cache of a worker process
+
 class BertDataset(Dataset):
     def __init__(self, encodings):
         super().__init__()
@@ -54,41 +87,233 @@ def get_timestamp(path:str) -> str:
     timestamp = os.path.basename(path)
     timestamp = timestamp.rstrip("_wkly.tsv")
     timestamp = datetime.strptime(timestamp, "%Y.%m.%d")
-    timestamp = str(timestamp).rstrip(" 00:00:00")
+    timestamp = timestamp.strftime("%Y-%m-%d")
     
     return timestamp
 
-def get_avg_score(path:str, 
-                    tokenizer:AutoTokenizer,
-                    model: AutoModelForSequenceClassification,
-                    device: str
-                    ) -> tuple([str, float]):
-    """get average sentiment score from the path
+class PredictionCache:
+    """Content-addressed cache of the predictions in a local SQLite file
+
+    Each prediction is keyed by the SHA-256 hash of the model identity, the maximum length, and the text, so the same
+    line is inferred only once, whichever keyword or run it comes from. The file can be shared by several processes.
 
     Params:
-        path(str): path to the file
+        path(str): path to the SQLite file
+        model_id(str): identity of the model, e.g., as get_model_id() returns
+        max_length(int): the maximum length the lines are truncated to
+    """
+
+    QUERY_SIZE = 500 # keys per SELECT; below the limit of SQLite on host parameters
+
+    def __init__(self, path:str = CACHE_PATH, model_id:str = MODEL_PATH, max_length:int = MAX_LENGTH):
+        self.prefix = f"{model_id}\0{max_length}\0".encode()
+        self.connection = sqlite3.connect(path, timeout=600)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("CREATE TABLE IF NOT EXISTS predictions "
+                                "(key BLOB PRIMARY KEY, pred INTEGER NOT NULL) WITHOUT ROWID")
+        self.connection.commit()
+
+    def key(self, text:str) -> bytes:
+        """get the key of the text"""
+
+        return hashlib.sha256(self.prefix + text.encode()).digest()
+
+    def get_many(self, keys:list) -> dict:
+        """get the cached predictions
+
+        Params:
+            keys(list): the keys to look up
+
+        Returns:
+            dict: the key and the prediction, for the keys found in the cache
+        """
+
+        keys = list(set(keys))
+        found = dict()
+
+        for start in range(0, len(keys), self.QUERY_SIZE):
+            chunk = keys[start:start + self.QUERY_SIZE]
+            query = f"SELECT key, pred FROM predictions WHERE key IN ({','.join('?' * len(chunk))})"
+            found.update(self.connection.execute(query, chunk))
+
+        return found
+
+    def put_many(self, items:dict) -> None:
+        """store the predictions
+
+        Params:
+            items(dict): the key and the prediction
+        """
+
+        with self.connection:
+            self.connection.executemany("INSERT OR REPLACE INTO predictions VALUES (?, ?)",
+                                        ((key, int(pred)) for key, pred in items.items()))
+
+    def close(self) -> None:
+        self.connection.close()
+
+def get_model_id(path:str, quantize:bool = False) -> str:
+    """get the identity of the model for the prediction cache
+
+    The identity changes when the files of the model change, e.g., when the model is fine-tuned again, or when the
+    model is quantized, so that the cache never returns the predictions of another model.
+
+    Params:
+        path(str): path to the model
+        quantize(bool): whether the model is run with int8 quantization
+
+    Returns:
+        str: the identity
+    """
+
+    model_id = os.path.realpath(path)
+
+    if os.path.isdir(path):
+        stamps = sorted((file, os.stat(os.path.join(path, file)).st_mtime_ns) for file in os.listdir(path))
+        model_id += repr(stamps)
+    if quantize:
+        model_id += "#int8"
+
+    return model_id
+
+def make_batches(lengths:np.ndarray, max_tokens:int = MAX_TOKENS) -> list:
+    """group the lines into batches of similar lengths under a token budget
+
+    The lines are sorted by their lengths, and consecutive lines are put in a batch as long as the batch, padded to its
+    longest line, has no more than max_tokens tokens. A line longer than the budget gets a batch of its own.
+
+    Params:
+        lengths(np.ndarray): the number of tokens of each line
+        max_tokens(int): the maximum number of (padded) tokens in a batch
+
+    Returns:
+        list: list of np.ndarray, each the indices of the lines in a batch
+    """
+
+    order = np.argsort(lengths, kind="stable")
+    batches = list()
+    start = 0
+
+    for end in range(len(order)):
+        if end > start and (end - start + 1) * lengths[order[end]] > max_tokens:
+            batches.append(order[start:end])
+            start = end
+
+    if start < len(order):
+        batches.append(order[start:])
+
+    return batches
+
+def predict(contents:list,
+            tokenizer:AutoTokenizer,
+            model:AutoModelForSequenceClassification,
+            device:str,
+            max_length:int = MAX_LENGTH,
+            max_tokens:int = MAX_TOKENS,
+            desc:str = "Iterating: ",
+            cache:Optional[PredictionCache] = None,
+            show_progress:bool = True
+            ) -> np.ndarray:
+    """predict the sentiment of the lines with length-bucketed dynamic batches
+
+    Each batch is padded only to its own longest line (see make_batches()), so little computation is spent on padding.
+    With a cache, only the distinct lines not found in the cache are inferred, and their predictions are stored.
+
+    Params:
+        contents(list): the lines to predict the sentiment of
         tokenizer(AutoTokenizer): tokenizer to be used
-        mode(AutoModelForSequenceClassification): model to predict the sentiment
+        model(AutoModelForSequenceClassification): model to predict the sentiment
         device(str): 'cuda' or 'cpu'
+        max_length(int): lines are truncated to this number of tokens
+        max_tokens(int): the maximum number of (padded) tokens in a batch
+        desc(str): description for the progress bar
+        cache(Optional[PredictionCache]): the cache of the predictions of this model and max_length
+        show_progress(bool): whether to show the progress bar of the batches
 
     Returns:
-        (str, float): a tupe of the timestamp and the average score
+        np.ndarray: 1 for positive and -1 for negative, in the order of the lines
     """
-    MAX_LENGTH = 128
-    BATCH_SIZE = 128
 
-    timestamp = get_timestamp(path)
-    
-    with open(path) as file:
-        contents = file.read().split('\n')
+    if cache is not None:
+        keys = [cache.key(content) for content in contents]
+        cached = cache.get_many(keys)
+
+        missing = dict() # key and the line, for the distinct lines not in the cache
+        for key, content in zip(keys, contents):
+            if key not in cached:
+                missing.setdefault(key, content)
+
+        if missing:
+            preds = predict(list(missing.values()), tokenizer, model, device, max_length, max_tokens, desc,
+                            show_progress=show_progress)
+            new_preds = dict(zip(missing.keys(), preds))
+            cache.put_many(new_preds)
+            cached.update(new_preds)
+
+        return np.array([cached[key] for key in keys], dtype=np.int64)
+
+    encodings = tokenizer(contents,
+        max_length=max_length,
+        truncation=True)
+    input_ids = encodings['input_ids']
+    lengths = np.array([len(ids) for ids in input_ids], dtype=np.int64)
+
+    preds = np.zeros(len(contents), dtype=np.int64)
+
+    model.eval()
+
+    for batch in tqdm(make_batches(lengths, max_tokens),
+                    desc=desc,
+                    position=1,
+                    leave=False,
+                    disable=not show_progress):
+        padded = tokenizer.pad({'input_ids': [input_ids[idx] for idx in batch]},
+                            return_tensors='pt')
+        input_ids_batch = padded['input_ids'].to(device)
+        attention_mask = padded['attention_mask'].to(device)
+
+        with torch.inference_mode():
+            outputs = model(input_ids_batch,
+                        attention_mask=attention_mask)
+            logits = outputs['logits']
+
+        pred = logits.argmax(dim=1).cpu().numpy()
+        preds[batch] = np.where(pred == 1, 1, -1)
+
+    return preds
+
+def predict_padded(contents:list,
+                    tokenizer:AutoTokenizer,
+                    model:AutoModelForSequenceClassification,
+                    device:str,
+                    max_length:int = MAX_LENGTH,
+                    batch_size:int = BATCH_SIZE,
+                    desc:str = "Iterating: "
+                    ) -> np.ndarray:
+    """predict the sentiment of the lines with fixed-size batches padded to the longest line of all
+
+    This is how the lines were predicted before predict(), kept as the reference for comparison.
+
+    Params:
+        contents(list): the lines to predict the sentiment of
+        tokenizer(AutoTokenizer): tokenizer to be used
+        model(AutoModelForSequenceClassification): model to predict the sentiment
+        device(str): 'cuda' or 'cpu'
+        max_length(int): lines are truncated to this number of tokens
+        batch_size(int): the number of lines in a batch
+        desc(str): description for the progress bar
+
+    Returns:
+        np.ndarray: 1 for positive and -1 for negative, in the order of the lines
+    """
 
     contents_encoding = tokenizer(contents,
-        max_length=MAX_LENGTH,
+        max_length=max_length,
         truncation=True,
         padding=True)
     contents_dataset = BertDataset(contents_encoding)
     content_loader = DataLoader(contents_dataset,
-                                batch_size=BATCH_SIZE,
+                                batch_size=batch_size,
                                 shuffle=False)
 
     preds = list()
@@ -96,7 +321,7 @@ def get_avg_score(path:str,
     model.eval()
     
     for batch in tqdm(content_loader,
-                    desc=f"Iterating for {timestamp}: ",
+                    desc=desc,
                     position=1,
                     leave=False):
         input_ids = batch['input_ids'].to(device)
@@ -117,12 +342,246 @@ def get_avg_score(path:str,
                 else:
                     preds.append(-1)
 
-    avg_score = sum(preds)/len(preds)
+    return np.array(preds, dtype=np.int64)
+
+def get_avg_score(path:str, 
+                    tokenizer:AutoTokenizer,
+                    model: AutoModelForSequenceClassification,
+                    device: str,
+                    cache: Optional[PredictionCache] = None
+                    ) -> tuple([str, float]):
+    """get average sentiment score from the path
+
+    Params:
+        path(str): path to the file
+        tokenizer(AutoTokenizer): tokenizer to be used
+        mode(AutoModelForSequenceClassification): model to predict the sentiment
+        device(str): 'cuda' or 'cpu'
+        cache(Optional[PredictionCache]): the cache of the predictions
+
+    Returns:
+        (str, float): a tupe of the timestamp and the average score
+    """
+
+    timestamp = get_timestamp(path)
+    
+    with measure("bert_SA", unit="lines", file=path) as record:
+        contents = list(iter_lines(path))
+
+        preds = predict(contents, tokenizer, model, device,
+                        desc=f"Iterating for {timestamp}: ",
+                        cache=cache)
+        record.add(len(contents))
+
+    avg_score = preds.sum()/len(preds)
     
     return (timestamp, avg_score)
 
+def init_worker(tokenizer:AutoTokenizer,
+                model:AutoModelForSequenceClassification,
+                num_threads:int,
+                model_id:Optional[str]
+                ) -> None:
+    """set up a worker process of the sharded inference
+
+    When forked, the worker gets the tokenizer and the model of the parent process without copying them.
+
+    Params:
+        tokenizer(AutoTokenizer): tokenizer to be used
+        model(AutoModelForSequenceClassification): the model prepared for CPU
+        num_threads(int): the number of intra-op threads of torch in the worker
+        model_id(Optional[str]): identity of the model for the prediction cache. None not to use the cache
+    """
+
+    torch.set_num_threads(num_threads)
+
+    _worker["tokenizer"] = tokenizer
+    _worker["model"] = model
+    _worker["cache"] = PredictionCache(CACHE_PATH, model_id) if model_id is not None else None # a connection each
+
+def score_chunk(task:tuple) -> tuple:
+    """get the sum and the number of the sentiment scores of a chunk of lines, in a worker process
+
+    Params:
+        task(tuple): (token, path, start, end), the chunk being the lines of path from the byte offset start to end
+
+    Returns:
+        (str, str, int, int): a tuple of the token, the path, the sum of the scores, and the number of the lines
+    """
+
+    token, path, start, end = task
+
+    with measure("bert_SA", unit="lines", file=path, offset=start) as record:
+        contents = list(iter_lines(path, start, end))
+        if not contents:
+            return (token, path, 0, 0)
+
+        preds = predict(contents, _worker["tokenizer"], _worker["model"], 'cpu',
+                        cache=_worker["cache"],
+                        show_progress=False)
+        record.add(len(contents))
+
+    return (token, path, int(preds.sum()), len(preds))
+
+def start_workers(tokenizer:AutoTokenizer,
+                    model:AutoModelForSequenceClassification,
+                    workers:int,
+                    num_threads:Optional[int] = None,
+                    model_id:Optional[str] = None
+                    ) -> multiprocessing.pool.Pool:
+    """fork the worker processes of the sharded inference on CPU
+
+    The workers should be forked before this process runs any inference, i.e., before torch starts its intra-op thread
+    pool, in which a forked process may hang otherwise.
+
+    Params:
+        tokenizer(AutoTokenizer): tokenizer to be used
+        model(AutoModelForSequenceClassification): the model prepared for CPU
+        workers(int): the number of the worker processes
+        num_threads(Optional[int]): the number of intra-op threads of each worker. Defaults to the CPUs divided among
+            the workers
+        model_id(Optional[str]): identity of the model for the prediction cache. None not to use the cache
+
+    Returns:
+        multiprocessing.pool.Pool: the pool of the workers
+    """
+
+    if num_threads is None:
+        num_threads = max(1, (os.cpu_count() or 1) // workers)
+
+    if "fork" in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context("fork")
+    else: # each worker gets a copy of the model
+        context = multiprocessing.get_context()
+
+    print(f"Started {workers} workers with {num_threads} intra-op threads each.")
+
+    return context.Pool(workers, initializer=init_worker, initargs=(tokenizer, model, num_threads, model_id))
+
+def get_sharded_scores(pool:multiprocessing.pool.Pool,
+                        tokens:list,
+                        chunk_lines:int = CHUNK_LINES
+                        ) -> dict:
+    """get the average scores of the weekly files of the tokens, sharded across the workers of start_workers()
+
+    Params:
+        pool(multiprocessing.pool.Pool): the pool of the workers
+        tokens(list): tokens to analyze. Should be with PoS tag e.g., 코로나_NNP
+        chunk_lines(int): the number of lines in a chunk
+
+    Returns:
+        dict: the token and the list of (timestamp, average score) of its weekly files
+    """
+
+    tasks = list()
+
+    for token in tokens:
+        root = f"./data/conc_result_{token}_glued/"
+        for file in os.listdir(root):
+            if file.endswith(".tsv"):
+                path = os.path.join(root, file)
+                tasks.extend((token, path, start, end) for start, end in get_line_chunks(path, chunk_lines))
+
+    # the larger chunks first, so that no large one is left for the end
+    tasks.sort(key=lambda task: (task[3] if task[3] is not None else os.path.getsize(task[1])) - task[2], reverse=True)
+
+    print(f"Sharding {len(tasks)} chunks across the workers.")
+
+    totals = defaultdict(lambda: [0, 0])
+
+    for token, path, total, count in tqdm(pool.imap_unordered(score_chunk, tasks), total=len(tasks), desc="Chunks: "):
+        totals[(token, path)][0] += total
+        totals[(token, path)][1] += count
+
+    results = {token: list() for token in tokens}
+    for (token, path), (total, count) in totals.items():
+        results[token].append((get_timestamp(path), total / count if count else float('nan')))
 
-def main():
+    return results
+
+def prepare_cpu_model(model:AutoModelForSequenceClassification,
+                        quantize:bool = True,
+                        num_threads:Optional[int] = None
+                        ) -> AutoModelForSequenceClassification:
+    """prepare the model for inference on CPU
+
+    With quantize, the weights of the linear layers are quantized to int8 and their activations are quantized
+    dynamically at inference (torch.quantization.quantize_dynamic). The original model is left untouched.
+
+    Params:
+        model(AutoModelForSequenceClassification): the model loaded on CPU
+        quantize(bool): whether to apply dynamic int8 quantization
+        num_threads(Optional[int]): the number of intra-op threads of torch. None keeps the default of torch
+
+    Returns:
+        AutoModelForSequenceClassification: the model to run the inference with
+    """
+
+    if num_threads is not None:
+        torch.set_num_threads(num_threads)
+
+    model.eval()
+
+    if quantize:
+        model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+    return model
+
+def sample_lines(paths:list, sample_size:int, seed:int = 70) -> list:
+    """sample lines from the files uniformly at random
+
+    Params:
+        paths(list): list of paths to the files
+        sample_size(int): the number of lines
+        seed(int): the random seed
+
+    Returns:
+        list: the sampled lines
+    """
+
+    lines = list()
+
+    for path in paths:
+        lines.extend(line for line in iter_lines(path) if line)
+
+    rng = np.random.default_rng(seed)
+    if len(lines) > sample_size:
+        lines = [lines[idx] for idx in sorted(rng.choice(len(lines), sample_size, replace=False))]
+
+    return lines
+
+def check_agreement(lines:list,
+                    tokenizer:AutoTokenizer,
+                    reference_model:AutoModelForSequenceClassification,
+                    model:AutoModelForSequenceClassification,
+                    device:str
+                    ) -> float:
+    """compare the predictions of the model with those of the reference model
+
+    Params:
+        lines(list): the lines to predict the sentiment of
+        tokenizer(AutoTokenizer): tokenizer to be used
+        reference_model(AutoModelForSequenceClassification): the model to compare with, e.g., the fp32 model
+        model(AutoModelForSequenceClassification): the model to check, e.g., the int8 model
+        device(str): 'cuda' or 'cpu'
+
+    Returns:
+        float: the proportion of the lines on which both models predict the same label
+    """
+
+    if not lines:
+        return float('nan')
+
+    reference_preds = predict(lines, tokenizer, reference_model, device, desc="Agreement (reference): ")
+    preds = predict(lines, tokenizer, model, device, desc="Agreement: ")
+
+    return float(np.mean(reference_preds == preds))
+
+def main(quantize:bool = False,
+        num_threads:Optional[int] = None,
+        agreement_sample:int = AGREEMENT_SAMPLE,
+        use_cache:bool = True,
+        workers:int = 1):
     tokens_to_analyze = ["확진_NNG",
                          "백신_NNG",
                          "거리두기_NNG",
@@ -135,10 +594,23 @@ def main():
 
     if DEVICE == 'cpu':
         print("No CUDA device detected.")
-        print("Will run using CPU... performance may be slow.")
+        if quantize:
+            print("Will run using CPU with int8 dynamic quantization.")
+        else:
+            print("Will run using CPU... performance may be slow. Consider --quantize.")
+    else:
+        if quantize:
+            print("Quantization only applies to CPU inference; running the fp32 model on CUDA.")
+            quantize = False
+        if workers > 1:
+            print("Sharding only applies to CPU inference; running a single process on CUDA.")
+            workers = 1
+
+    if workers > 1:
+        parent_threads = torch.get_num_threads()
+        torch.set_num_threads(1) # no intra-op thread pool before the workers are forked
 
     print("Loading the model: klue-RoBERTa-base-SA...")
-    MODEL_PATH = "./resources/model_save/klue-RoBERTa-base-SA"
     tokenizer = AutoTokenizer.from_pretrained(MODEL_PATH,
         local_files_only=True)
     model = AutoModelForSequenceClassification.from_pretrained(MODEL_PATH, 
@@ -149,8 +621,50 @@ def main():
         )
 
     model = model.to(DEVICE)
+
+    pool = None
+
+    if DEVICE == 'cpu':
+        fp32_model = model
+
+        if workers > 1:
+            model = prepare_cpu_model(model, quantize)
+            pool = start_workers(tokenizer, model, workers, num_threads,
+                                get_model_id(MODEL_PATH, quantize) if use_cache else None)
+            torch.set_num_threads(parent_threads) # for the agreement check, once the workers are forked
+        else:
+            model = prepare_cpu_model(model, quantize, num_threads)
+            print(f"Using {torch.get_num_threads()} intra-op threads.")
+
+        if quantize and agreement_sample > 0:
+            glued_paths = list()
+            for token in tokens_to_analyze:
+                root = f"./data/conc_result_{token}_glued/"
+                glued_paths.extend(os.path.join(root, file) for file in os.listdir(root) if file.endswith(".tsv"))
+            lines = sample_lines(glued_paths, agreement_sample)
+            agreement = check_agreement(lines, tokenizer, fp32_model, model, DEVICE)
+            print(f"int8 predictions agree with fp32 on {agreement:.2%} of {len(lines)} sampled lines.")
+
+        del fp32_model
+
     print("Model has been loaded successfully!")
 
+    if pool is not None:
+        with pool:
+            with measure("bert_SA", unit="files", workers=workers, quantize=quantize) as record:
+                results = get_sharded_scores(pool, tokens_to_analyze)
+                record.add(sum(len(rows) for rows in results.values()))
+
+        with ResultsStore() as store:
+            for token, rows in results.items():
+                store.put("bert_SA", [(get_keyword(token), date, score) for date, score in rows], replace=True)
+
+        print(f"Result saved as bert_SA in {STORE_PATH}!")
+
+        return
+
+    cache = PredictionCache(CACHE_PATH, get_model_id(MODEL_PATH, quantize)) if use_cache else None
+
     for token in tokens_to_analyze:
         print(f"Performing BERT-SA for {token}...")
 
@@ -163,20 +677,61 @@ def main():
 
         results = list()
 
-        for path in tqdm(paths, position=0, desc="Master iter: "):
-            result = get_avg_score(path, tokenizer, model, DEVICE) 
-            results.append(result)
+        with measure("bert_SA", unit="files", keyword=token, quantize=quantize) as record:
+            for path in tqdm(paths, position=0, desc="Master iter: "):
+                result = get_avg_score(path, tokenizer, model, DEVICE, cache)
+                results.append(result)
+                record.add()
 
-        df = pd.DataFrame(results, columns=["date", "score"])
-        df = df.set_index("date")
-        df = df.sort_index()
+        with ResultsStore() as store:
+            store.put("bert_SA", [(get_keyword(token), date, score) for date, score in results], replace=True)
 
-        df.to_csv(f"./data/conc_result_{token}_glued//bert_SA_wkly.csv")
-
-        print(f"Result saved as ./data/conc_result_{token}_glued//bert_SA_wkly.csv!")
+        print(f"Result saved as bert_SA in {STORE_PATH}!")
         print()
 
+    if cache is not None:
+        cache.close()
+
     return
     
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(prog="bert_SA",
+                                    description="Sentiment analysis of the weekly concordances with a RoBERTa model")
+
+    parser.add_argument('-q',
+                        '--quantize',
+                        action='store_true',
+                        dest='quantize',
+                        help="On CPU, run the model with dynamic int8 quantization")
+    parser.add_argument('-t',
+                        '--threads',
+                        type=int,
+                        dest='threads',
+                        default=None,
+                        help="Number of intra-op threads of torch on CPU, of each worker with --workers")
+    parser.add_argument('-a',
+                        '--agreement_sample',
+                        type=int,
+                        dest='agreement_sample',
+                        default=AGREEMENT_SAMPLE,
+                        help="Lines to check the int8 predictions against fp32 on. 0 to skip the check")
+    parser.add_argument('-n',
+                        '--no_cache',
+                        action='store_true',
+                        dest='no_cache',
+                        help=f"Infer every line again instead of using the prediction cache in {CACHE_PATH}")
+    parser.add_argument('-w',
+                        '--workers',
+                        type=int,
+                        dest='workers',
+                        default=1,
+                        help="On CPU, number of worker processes sharing the model, among which the chunks of the "
+                                "weekly files are distributed")
+
+    arguments = parser.parse_args()
+
+    main(quantize=arguments.quantize,
+        num_threads=arguments.threads,
+        agreement_sample=arguments.agreement_sample,
+        use_cache=not arguments.no_cache,
+        workers=arguments.workers)
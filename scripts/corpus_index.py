@@ -0,0 +1,273 @@
+# coding: utf-8
+
+"""corpus_index.py
+
+Build and query a positional inverted index over the tagged corpus.
+
+The index is built once on top of the token-id corpus of token_corpus.py and saved as plain NumPy arrays, which are
+memory-mapped when queried. Frequencies and concordances of any FORM/TAG token can then be read from the postings
+without scanning the corpus again. A token can also be a pattern like 코로나* or 백신/*, whose positions are those of all
+the tokens vocab_index.py expands it into. get_freq.py and get_concordance_per_file_batch.py read their results from
+the index with --token_corpus, and run_pipeline.py keeps it up to date as the corpus_index stage.
+
+Files added to the corpus directory:
+    - postings.npy: int64 positions of every token, grouped by the token id and sorted within a group
+    - postings_offsets.npy: int64 position in postings.npy where the group of each token id starts
+
+The postings are rebuilt whenever the token-id corpus is converted again.
+
+Author: Gyu-min Lee
+his.nigel at gmail dot com
+"""
+
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+from instrument import measure
+from instrument import set_debug
+from merge_texts_by_weeks import get_datetime
+from merge_texts_by_weeks import get_week
+from token_corpus import CORPUS_DIR
+from token_corpus import TokenCorpus
+from token_corpus import build_token_corpus
+from vocab_index import VocabIndex
+from vocab_index import is_pattern
+
+from icecream import ic
+ic.disable()
+
+def build_index(root: str = "./data/COVID19/tagged", corpus_dir: str = CORPUS_DIR, force: bool = False) -> bool:
+    """build the positional index of the daily files in root
+
+    Params:
+        root(str): the directory of the daily tagged files
+        corpus_dir(str): the directory of the token-id corpus, where the index is saved too
+        force(bool): rebuild even if the index is up to date
+
+    Returns:
+        bool: True if the index was (re)built, False if it was up to date
+    """
+
+    postings_path = os.path.join(corpus_dir, "postings.npy")
+    offsets_path = os.path.join(corpus_dir, "postings_offsets.npy")
+
+    converted = build_token_corpus(root, corpus_dir, force)
+
+    if not converted and not force and os.path.exists(offsets_path):
+        return False
+
+    if os.path.exists(offsets_path): # written last: marks the postings as complete
+        os.remove(offsets_path)
+
+    corpus = TokenCorpus(corpus_dir)
+    tokens = np.asarray(corpus.tokens)
+
+    postings = np.argsort(tokens, kind="stable").astype(np.int64)
+    postings_offsets = np.zeros(len(corpus.vocab) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(tokens, minlength=len(corpus.vocab)), out=postings_offsets[1:])
+
+    np.save(postings_path, postings)
+    np.save(offsets_path, postings_offsets)
+
+    return True
+
+class CorpusIndex(TokenCorpus):
+    """Memory-mapped positional index of the tagged corpus, as build_index() saves it
+
+    Params:
+        corpus_dir(str): the directory of the token-id corpus and its index
+    """
+
+    def __init__(self, corpus_dir: str = CORPUS_DIR):
+        super().__init__(corpus_dir)
+
+        self.postings = self.load("postings.npy")
+        self.postings_offsets = self.load("postings_offsets.npy")
+
+        self._vocab_index = None
+
+    def expand(self, query: str) -> list:
+        """get the tokens of the query, the vocabulary being sorted on the first pattern
+
+        Params:
+            query(str): the token in FORM/TAG format, or a pattern of it
+
+        Returns:
+            list: the tokens in the corpus
+        """
+
+        if not is_pattern(query):
+            return [query] if self.token_id(query) is not None else list()
+
+        if self._vocab_index is None:
+            self._vocab_index = VocabIndex(self.vocab)
+
+        return self._vocab_index.expand(query)
+
+    def positions(self, token: str) -> np.ndarray:
+        """get the positions of the token in the corpus, in ascending order
+
+        Params:
+            token(str): the token in FORM/TAG format, or a pattern of it
+
+        Returns:
+            np.ndarray: the positions in tokens.npy, of all the tokens of a pattern
+        """
+
+        token_ids = [self.token_id(token) for token in self.expand(token)]
+        postings = [self.postings[self.postings_offsets[token_id]:self.postings_offsets[token_id + 1]]
+                    for token_id in token_ids]
+
+        if not postings:
+            return np.zeros(0, dtype=np.int64)
+        if len(postings) == 1:
+            return postings[0]
+
+        return np.sort(np.concatenate(postings))
+
+    def locate(self, positions: np.ndarray) -> tuple:
+        """convert positions in the corpus to (file, article, offset)
+
+        Params:
+            positions(np.ndarray): positions in tokens.npy
+
+        Returns:
+            (np.ndarray, np.ndarray, np.ndarray): the file ids, the article ids, and the offsets in the articles
+        """
+
+        article_ids = self.article_of(positions)
+        file_ids = np.asarray(self.article_file)[article_ids]
+        offsets = positions - self.articles[article_ids]
+
+        return file_ids, article_ids, offsets
+
+    def file_lengths(self) -> np.ndarray:
+        """get the number of tokens in each file
+
+        Returns:
+            np.ndarray: the number of tokens, by the file id
+        """
+
+        return np.diff(np.asarray(self.articles)[np.asarray(self.file_articles)])
+
+    def frequencies(self, token: str) -> np.ndarray:
+        """get the absolute frequency of the token in each file
+
+        Params:
+            token(str): the token in FORM/TAG format, or a pattern of it
+
+        Returns:
+            np.ndarray: the frequencies, by the file id
+        """
+
+        file_ids, _, _ = self.locate(self.positions(token))
+
+        return np.bincount(file_ids, minlength=len(self.files))
+
+    def weekly_frequencies(self, tokens: list) -> tuple:
+        """get the absolute and the relative (per million) frequencies of the tokens by week
+
+        Params:
+            tokens(list): the tokens in FORM/TAG format, or patterns of them
+
+        Returns:
+            (pd.DataFrame, pd.DataFrame): the absolute and the relative frequencies, indexed by the Monday of the week.
+                The relative frequencies of a week without any token are 0
+        """
+
+        weeks = [get_week(get_datetime(name)) for name in self.files]
+
+        freq_abs = pd.DataFrame({token: self.frequencies(token) for token in tokens}, index=weeks)
+        freq_abs = freq_abs.groupby(level=0).sum()
+
+        lengths = pd.Series(self.file_lengths(), index=weeks).groupby(level=0).sum()
+        freq_rel = freq_abs.div(lengths.clip(lower=1), axis=0) * 1000000
+
+        return freq_abs, freq_rel
+
+    def concordance(self, token: str, width: int = 200) -> list:
+        """get the concordance lines of the token, with the context taken within each article
+
+        The lines are formatted as nltk.text.Text.concordance_list does: about width // 4 tokens of context on each
+        side, cut to the half of the width.
+
+        Params:
+            token(str): the token in FORM/TAG format, or a pattern of it
+            width(int): the width of each line, in characters
+
+        Returns:
+            list: list of (file name, line), in the order of the corpus
+        """
+
+        positions = np.asarray(self.positions(token))
+        file_ids, article_ids, _ = self.locate(positions)
+
+        context = width // 4 # approx number of words of context
+
+        lines = list()
+
+        for position, file_id, article_id in zip(positions, file_ids, article_ids):
+            form = self.vocab[self.tokens[position]]
+            half_width = (width - len(form) - 2) // 2
+            start, end = self.articles[article_id], self.articles[article_id + 1]
+            left_context = " ".join(self.decode(self.tokens[max(start, position - context):position]))
+            right_context = " ".join(self.decode(self.tokens[position + 1:min(end, position + context)]))
+            lines.append((self.files[file_id], " ".join([left_context[-half_width:], form, right_context[:half_width]])))
+
+        return lines
+
+def main(root, corpus_dir, queries, do_debug):
+
+    set_debug(do_debug)
+
+    with measure("corpus_index", unit="tokens") as record:
+        built = build_index(root, corpus_dir)
+        if built:
+            record.add(len(TokenCorpus(corpus_dir).tokens))
+
+    if built:
+        print(f"Built the index of {root} in {corpus_dir}")
+    else:
+        print(f"The index in {corpus_dir} is up to date")
+
+    if queries:
+        index = CorpusIndex(corpus_dir)
+        freq_abs, freq_rel = index.weekly_frequencies(queries)
+        print(freq_abs)
+        print(freq_rel)
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(prog="corpus_index",
+                                    description="Build (and query) the positional index of the tagged corpus")
+
+    parser.add_argument('queries',
+                        metavar='token',
+                        nargs='*',
+                        type=str,
+                        help="Tokens in FORM/TAG format, or patterns of them, to print the weekly frequencies of")
+    parser.add_argument('-r',
+                        '--root',
+                        type=str,
+                        dest='root',
+                        action='store',
+                        default='./data/COVID19/tagged',
+                        help="Directory of the daily tagged files")
+    parser.add_argument('-o',
+                        '--corpus_dir',
+                        type=str,
+                        dest='corpus_dir',
+                        action='store',
+                        default=CORPUS_DIR,
+                        help="Directory of the token-id corpus, to save the index in")
+    parser.add_argument('-d',
+                        '--debugging',
+                        action='store_true',
+                        dest='debugging')
+
+    arguments = parser.parse_args()
+
+    main(arguments.root, arguments.corpus_dir, arguments.queries, arguments.debugging)
@@ -0,0 +1,168 @@
+# coding: utf-8
+
+"""corpus_reader.py
+
+Read the daily and weekly corpus files lazily through a memory map.
+
+The files are memory-mapped and parsed one line at a time, so only the current line is held in memory no matter how
+large the file is. The lines are exactly those of file.read().split('\n'), including the empty line after a trailing
+line feed, and every line is an article in the PRESS\tTITLE\tARTICLE layout. A file can also be split into ranges
+of lines with get_line_chunks() for the ranges to be read separately, e.g., by the workers of a process pool.
+
+As in get_press() of get_corpus_stats.py, a line without any tab has no metadata: its press is "NA" and the whole line
+is its body.
+
+Author: Gyu-min Lee
+his.nigel at gmail dot com
+"""
+
+import mmap
+import os
+
+from typing import Iterator, NamedTuple, Optional
+
+class Article(NamedTuple):
+    """An article of the corpus
+
+    Params:
+        press(str): the name of the press, "NA" if no metadata available
+        title(Optional[str]): the title, None if no metadata available
+        body(Optional[str]): the body, None if the line ends with the title. Any further tab is kept in the body
+    """
+
+    press: str
+    title: Optional[str]
+    body: Optional[str]
+
+    @property
+    def text(self) -> str:
+        """the title and the body joined by a space, with the tabs in the body replaced by spaces
+
+        The tokens(spacing result) of the article are text.split(' ').
+        """
+
+        return ' '.join(part for part in (self.title, self.body) if part is not None).replace('\t', ' ')
+
+def parse_article(line: str) -> Article:
+    """parse a line of the corpus into an article
+
+    Params:
+        line(str): the line, without the line feed
+
+    Returns:
+        Article: the article
+    """
+
+    fields = line.split('\t', 2)
+
+    if len(fields) < 2: # if no metadata available
+        return Article("NA", None, line)
+
+    return Article(fields[0], fields[1], fields[2] if len(fields) > 2 else None)
+
+def iter_lines(path: str, start: int = 0, end: Optional[int] = None) -> Iterator[str]:
+    """iterate over the lines of a file through a memory map
+
+    Params:
+        path(str): path to the UTF-8 file
+        start(int): the byte offset of the first line to read, at the start of a line
+        end(Optional[int]): the byte offset where to stop, at the start of a line. Defaults to the end of the file,
+            including the empty line after a trailing line feed
+
+    Yields:
+        str: each line of file.read().split('\n') starting in the range, without the line feed
+    """
+
+    with open(path, 'rb') as file:
+        if os.fstat(file.fileno()).st_size == 0: # an empty file cannot be mapped
+            if end is None:
+                yield ''
+            return
+
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            if hasattr(mapped, "madvise"):
+                mapped.madvise(mmap.MADV_SEQUENTIAL)
+
+            while end is None or start < end:
+                stop = mapped.find(b'\n', start)
+                if stop < 0:
+                    yield mapped[start:].decode('utf-8')
+                    return
+                yield mapped[start:stop].decode('utf-8')
+                start = stop + 1
+
+def get_line_chunks(path: str, chunk_lines: int) -> list:
+    """split a file into ranges of lines, to be read with iter_lines(path, start, end)
+
+    Params:
+        path(str): path to the UTF-8 file
+        chunk_lines(int): the number of lines in a range. The last range may have fewer
+
+    Returns:
+        list: list of (start, end) byte offsets, the end of the last range being None
+    """
+
+    chunks = list()
+    start = 0
+
+    with open(path, 'rb') as file:
+        if os.fstat(file.fileno()).st_size == 0:
+            return [(0, None)]
+
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            position = 0
+            lines = 0
+            while True:
+                stop = mapped.find(b'\n', position)
+                if stop < 0:
+                    break
+                position = stop + 1
+                lines += 1
+                if lines == chunk_lines:
+                    chunks.append((start, position))
+                    start = position
+                    lines = 0
+
+    chunks.append((start, None))
+
+    return chunks
+
+def read_articles(path: str) -> Iterator[Article]:
+    """iterate over the articles of a daily or weekly file
+
+    Params:
+        path(str): path to the file
+
+    Yields:
+        Article: each article, one per line
+    """
+
+    for line in iter_lines(path):
+        yield parse_article(line)
+
+def iter_tokens(path: str, split_tabs: bool = True) -> Iterator[str]:
+    """iterate over the tokens of a file split on spaces, as if the whole file were split at once
+
+    The tokens are exactly those of content.split(' '), or content.replace('\t', ' ').split(' ') with split_tabs: the
+    last token of a line and the first token of the next are a single token joined by the line feed.
+
+    Params:
+        path(str): path to the file
+        split_tabs(bool): whether the tabs separate the tokens as the spaces do
+
+    Yields:
+        str: each token
+    """
+
+    pending = None
+
+    for line in iter_lines(path):
+        if split_tabs:
+            line = line.replace('\t', ' ')
+        tokens = line.split(' ')
+        if pending is not None:
+            tokens[0] = pending + '\n' + tokens[0]
+        yield from tokens[:-1]
+        pending = tokens[-1]
+
+    yield pending
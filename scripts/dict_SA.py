@@ -3,23 +3,47 @@
 """dict_SA.py
 Performs sentiment analysis with PoS tagged text aggregated by week.
 
-The results are to be saved as: dict_SA_wkly.csv in the concordance path.
+The lines of each weekly file are scored at once by the vectorized analyzer, which gives the same scores as
+analyze(level=2, no_tagging=True) line by line.
+
+The work is split into chunks of CHUNK_LINES lines across all the keywords and weeks, so that a large week is scored by
+several workers at once instead of keeping the others idle. The analyzer is loaded once before the workers are forked
+and shared by them read-only. Each chunk gives the sum and the number of its scores, and the average of a week is
+reassembled from those of its chunks.
+
+The results are to be saved as dict_SA in the results store of results_store.py, keyed by the keyword and the week.
+Write dict_SA_wkly.csv in the concordance path with export_results.py.
 
 Author: Gyu-min Lee 
 his.nigel at gmail dot com
 """
 
+import multiprocessing
 import os
-import sys
-
-import pandas as pd
 
+from collections import defaultdict
 from datetime import datetime
 
 from tqdm import tqdm
-from tqdm.contrib.concurrent import process_map
 
-from kosac_sent_analyzer import analyze
+from corpus_reader import get_line_chunks, iter_lines
+from instrument import measure
+from kosac_sent_analyzer import get_vectorized_analyzer
+from results_store import ResultsStore
+from results_store import STORE_PATH
+from results_store import get_keyword
+
+CHUNK_LINES = 20000
+
+TOKENS_TO_ANALYZE = ["확진_NNG", "백신_NNG", "거리두기_NNG", "마스크_NNG", "코로나_NNP"]
+
+def get_week(path:str) -> datetime:
+    """get the week of a weekly file from its name"""
+
+    timestamp = os.path.basename(path)
+    timestamp = timestamp.rstrip("_wkly.tsv")
+
+    return datetime.strptime(timestamp, "%Y.%m.%d")
 
 def get_avg_score(path:str) -> tuple([datetime, float]):
     """get average sentiment score from the path
@@ -31,59 +55,100 @@ def get_avg_score(path:str) -> tuple([datetime, float]):
         (str, float): a tuple of the timestamp and the average score
     """
     
-    timestamp = os.path.basename(path)
-    timestamp = timestamp.rstrip("_wkly.tsv")
-    timestamp = datetime.strptime(timestamp, "%Y.%m.%d")
-
-    with open(path) as file:
-        content = file.read()
-    
-    texts = content.split('\n')
+    timestamp = get_week(path)
 
-    scores = list()
+    with measure("dict_SA", unit="lines", file=path) as record:
+        analyzer = get_vectorized_analyzer(level=2) # loaded once per worker process
 
-    for text in tqdm(texts, desc=f"Iterating for {timestamp}: ", position=1, leave=False):
-        score = analyze(text, level=2, no_tagging=True)
-        scores.append(score)
+        scores = analyzer.analyze_many(iter_lines(path))
+        record.add(len(scores))
 
-    avg_score = sum(scores)/len(scores)
+    avg_score = scores.sum()/len(scores)
     
     return (timestamp,avg_score)
 
-def get_score(token:str) -> None:
-    """get score for the token.
+def score_chunk(task:tuple) -> tuple:
+    """get the sum and the number of the sentiment scores of a chunk of lines
 
     Params:
-        token(str): token to analyze. Should be with PoS tag e.g., 코로나_NNP
+        task(tuple): (token, path, start, end), the chunk being the lines of path from the byte offset start to end
+
     Returns:
-        None. It saves the data as a CSV file without returning anything.
+        (str, str, int, int): a tuple of the token, the path, the sum of the scores, and the number of the lines
     """
-    
-    print(f"Performing Dict-SA for {token}...")
 
-    paths = list()
+    token, path, start, end = task
 
-    for file in os.listdir(f"./data/conc_result_{token}/"):
-        if file.endswith(".tsv"):
-            paths.append(os.path.join(f"../conc_result_{token}/", file))
-    
-    results = process_map(get_avg_score, paths, desc="Master iter: ", position=0)
+    with measure("dict_SA", unit="lines", file=path, offset=start) as record:
+        analyzer = get_vectorized_analyzer(level=2) # inherited from the parent process when forked
 
-    df = pd.DataFrame(results, columns=["date", "score"])
-    df = df.set_index("date")
-    df = df.sort_index()
-    
-    df.to_csv(f"./data/conc_result_{token}/dict_SA_wkly.csv")
+        scores = analyzer.analyze_many(iter_lines(path, start, end))
+        record.add(len(scores))
 
-    print(f"Result saved as ./data/conc_result_{token}/dict_SA_wkly.csv!")
-    
+    return (token, path, int(scores.sum()), len(scores))
+
+def get_scores(tokens:list, chunk_lines:int = CHUNK_LINES, processes:int = None) -> None:
+    """get scores for the tokens, scheduling the chunks of all their weekly files in a single pool
+
+    Params:
+        tokens(list): tokens to analyze. Should be with PoS tag e.g., 코로나_NNP
+        chunk_lines(int): the number of lines in a chunk
+        processes(int): the number of the worker processes. Defaults to the number of CPUs
+    Returns:
+        None. It saves the data in the results store without returning anything.
+    """
+
+    print(f"Performing Dict-SA for {', '.join(tokens)}...")
+
+    tasks = list()
+
+    for token in tokens:
+        for file in os.listdir(f"./data/conc_result_{token}/"):
+            if file.endswith(".tsv"):
+                path = os.path.join(f"./data/conc_result_{token}/", file)
+                tasks.extend((token, path, start, end) for start, end in get_line_chunks(path, chunk_lines))
+
+    # the larger chunks first, so that no large one is left for the end
+    tasks.sort(key=lambda task: (task[3] if task[3] is not None else os.path.getsize(task[1])) - task[2], reverse=True)
+
+    get_vectorized_analyzer(level=2) # loaded before forking, so that the workers share it
+
+    if "fork" in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context("fork")
+    else: # each worker loads its own analyzer
+        context = multiprocessing.get_context()
+
+    totals = defaultdict(lambda: [0, 0])
+
+    with measure("dict_SA", unit="chunks", keywords=len(tokens)) as record:
+        with context.Pool(processes) as pool:
+            for token, path, total, count in tqdm(pool.imap_unordered(score_chunk, tasks),
+                                                    total=len(tasks), desc="Chunks: "):
+                totals[(token, path)][0] += total
+                totals[(token, path)][1] += count
+                record.add()
+
+    results = [(get_keyword(token), get_week(path), total / count) for (token, path), (total, count) in totals.items()]
+
+    with ResultsStore() as store:
+        store.put("dict_SA", results, replace=True)
+
+    print(f"Results saved as dict_SA in {STORE_PATH}!")
     print()
 
-def main():
-    tokens_to_analyze = ["확진_NNG", "백신_NNG", "거리두기_NNG", "마스크_NNG", "코로나_NNP"]
+def get_score(token:str) -> None:
+    """get score for the token.
+
+    Params:
+        token(str): token to analyze. Should be with PoS tag e.g., 코로나_NNP
+    Returns:
+        None. It saves the data in the results store without returning anything.
+    """
+
+    get_scores([token])
 
-    for token in tokens_to_analyze:
-        get_score(token)
+def main():
+    get_scores(TOKENS_TO_ANALYZE)
 
 if __name__ == "__main__":
     main()
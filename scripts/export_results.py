@@ -0,0 +1,193 @@
+# coding: utf-8
+
+"""export_results.py
+
+Write the spreadsheets and the CSV files of the results from the results store of results_store.py.
+
+The files are those the stages used to write, in the same layout:
+    - freq_abs, freq_rel: ./data/COVID19/tagged_weekly/freq_abs.xlsx and freq_rel.xlsx
+    - dict_SA: dict_SA_wkly.csv in ./data/conc_result_{keyword}
+    - bert_SA: bert_SA_wkly.csv in ./data/conc_result_{keyword}_glued
+    - press_count: ./results/press_count_result.xlsx, and press_count_wkly: ./results/press_count_wkly.csv
+    - health: ./data/statistics_wkly.xlsx
+    - press_freq_abs: ./results/press_breakdown_wkly.csv, with press_tokens and press_dict_SA_sum of get_press_breakdown.py
+With --wide, every weekly metric is also joined on the weeks into a single table, a column for each metric and keyword
+named as metric:keyword, and written as .xlsx or .csv by its extension.
+
+Usage: python ./scripts/export_results.py --wide ./results/key_stats_wkly.xlsx
+
+Author: Gyu-min Lee
+his.nigel at gmail dot com
+"""
+
+import argparse
+import os
+
+import pandas as pd
+
+from get_concordance_per_file_batch import get_output_dirs
+from get_freq import COLUMNS
+from get_freq import KEYWORDS
+from merge_texts_by_weeks import get_weekly_name
+from results_store import ResultsStore
+from results_store import STORE_PATH
+
+WEEKLY_METRICS = ["freq_abs", "freq_rel", "dict_SA", "bert_SA", "press_count_wkly", "health"]
+
+def export_freq(store: ResultsStore, metric: str) -> str:
+    """write the frequencies as the table of get_freq.py, a row for each weekly file"""
+
+    table = store.get_table(metric).reindex(columns=KEYWORDS)
+    table.insert(0, COLUMNS[0], [get_weekly_name(week) for week in table.index])
+    table.columns = COLUMNS
+
+    path = f"./data/COVID19/tagged_weekly/{metric}.xlsx"
+    table.reset_index(drop=True).to_excel(path)
+
+    return path
+
+def export_sentiment(store: ResultsStore, metric: str) -> list:
+    """write the sentiment averages of each keyword as a CSV file in its concordance directory"""
+
+    paths = list()
+
+    for keyword, rows in store.get(metric).groupby("keyword"):
+        conc_dir, glued_dir = get_output_dirs(keyword)
+        path = os.path.join(glued_dir if metric == "bert_SA" else conc_dir, f"{metric}_wkly.csv")
+
+        df = rows.rename(columns={"week": "date", "value": "score"}).set_index("date")[["score"]]
+        df.to_csv(path)
+        paths.append(path)
+
+    return paths
+
+def export_press_count(store: ResultsStore) -> str:
+    """write the press counts over the corpus, the most frequent first
+
+    The presses are read in the order they were put, so the ties keep the order of count_press() in get_corpus_stats.py.
+    """
+
+    total = store.get("press_count").sort_values("value", ascending=False, kind="stable")
+
+    path = "./results/press_count_result.xlsx"
+    pd.DataFrame(list(zip(total["keyword"], total["value"]))).to_excel(path, index=False)
+
+    return path
+
+def export_press_count_weekly(store: ResultsStore) -> str:
+    """write the press counts per week"""
+
+    rows = store.get("press_count_wkly").rename(columns={"keyword": "press", "value": "count"})
+
+    path = "./results/press_count_wkly.csv"
+    rows.sort_values(["week", "press"])[["week", "press", "count"]].to_csv(path, index=False)
+
+    return path
+
+def export_health(store: ResultsStore) -> str:
+    """write the weekly health statistics"""
+
+    table = store.get_table("health")
+    table.index = table.index.to_pydatetime()
+
+    path = "./data/statistics_wkly.xlsx"
+    table.to_excel(path)
+
+    return path
+
+def export_press_breakdown(store: ResultsStore) -> str:
+    """write the frequencies and the sentiment averages of the keywords by press and week"""
+
+    tokens = store.get("press_tokens").rename(columns={"keyword": "press", "value": "tokens"})
+    freq = store.get("press_freq_abs").rename(columns={"value": "freq_abs"})
+    sentiment = store.get("press_dict_SA_sum").rename(columns={"value": "dict_SA"})
+
+    rows = freq.merge(sentiment, on=["keyword", "week"], how="left")
+    rows[["press", "keyword"]] = rows["keyword"].str.rsplit(":", n=1, expand=True)
+    rows = rows.merge(tokens, on=["press", "week"], how="left")
+    rows["freq_rel"] = rows["freq_abs"] / rows["tokens"]
+    rows["dict_SA"] = rows["dict_SA"] / rows["freq_abs"]
+
+    path = "./results/press_breakdown_wkly.csv"
+    rows.sort_values(["week", "press", "keyword"])[["week", "press", "keyword", "tokens", "freq_abs", "freq_rel",
+                                                    "dict_SA"]].to_csv(path, index=False)
+
+    return path
+
+def get_wide_table(store: ResultsStore, metrics: list = WEEKLY_METRICS) -> pd.DataFrame:
+    """join the weekly metrics on the weeks
+
+    Params:
+        store(ResultsStore): the results store
+        metrics(list): the weekly metrics to join
+
+    Returns:
+        pd.DataFrame: the values indexed by the week, a column for each metric and keyword named as metric:keyword
+    """
+
+    tables = list()
+
+    for metric in metrics:
+        table = store.get_table(metric)
+        table.columns = [f"{metric}:{keyword}" if keyword else metric for keyword in table.columns]
+        tables.append(table)
+
+    return pd.concat(tables, axis=1, sort=True)
+
+def main(metrics: list = None, wide_path: str = None, store_path: str = STORE_PATH):
+    with ResultsStore(store_path) as store:
+        available = store.metrics()
+        metrics = available if metrics is None else [metric for metric in metrics if metric in available]
+
+        paths = list()
+
+        for metric in metrics:
+            if metric in ("freq_abs", "freq_rel"):
+                paths.append(export_freq(store, metric))
+            elif metric in ("dict_SA", "bert_SA"):
+                paths.extend(export_sentiment(store, metric))
+            elif metric == "press_count":
+                paths.append(export_press_count(store))
+            elif metric == "press_count_wkly":
+                paths.append(export_press_count_weekly(store))
+            elif metric == "health":
+                paths.append(export_health(store))
+            elif metric == "press_freq_abs":
+                paths.append(export_press_breakdown(store))
+
+        if wide_path is not None:
+            table = get_wide_table(store, [metric for metric in WEEKLY_METRICS if metric in available])
+            table.index.name = "week"
+            if wide_path.endswith(".csv"):
+                table.to_csv(wide_path)
+            else:
+                table.to_excel(wide_path)
+            paths.append(wide_path)
+
+    for path in paths:
+        print(f"Saved {path}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="export_results",
+                                    description="Write the spreadsheets and the CSV files of the results store")
+
+    parser.add_argument('metrics',
+                        metavar='metric',
+                        nargs='*',
+                        help="Metrics to export. All the metrics in the store if none is given")
+    parser.add_argument('-w',
+                        '--wide',
+                        type=str,
+                        dest='wide',
+                        default=None,
+                        help="Path to write the weekly metrics joined on the weeks, as .xlsx or .csv")
+    parser.add_argument('-s',
+                        '--store',
+                        type=str,
+                        dest='store',
+                        default=STORE_PATH,
+                        help="Path to the results store")
+
+    arguments = parser.parse_args()
+
+    main(arguments.metrics or None, arguments.wide, arguments.store)
@@ -1,19 +1,65 @@
 # coding: utf-8
 
+"""get_concordance_per_file_batch.py
+
+Generate the concordances of the keywords from the weekly tagged corpus.
+
+Every weekly file is streamed once through corpus_reader.py, and the concordances of all the keywords are collected
+in the same pass over its tokens. The files are processed in parallel. The lines are identical to those of nltk.text.Text.concordance_list
+(NLTK 3.7) with width=200 and lines=None.
+
+With --token_corpus, the weekly concordances are drawn from the positional index of corpus_index.py instead of the
+weekly files, built first if it is out of date: the positions of each keyword are read from its postings, and only the
+context windows around them are decoded, so a new keyword costs no pass over the corpus. The keywords are then matched
+case-sensitively, and the context runs over the morphemes of the article without the press names, so the lines differ
+from those of the weekly files around the article boundaries.
+
+With --keywords, the concordances of other keywords are generated instead. A keyword can be a pattern like 코로나* or
+백신/*, expanded by vocab_index.py into the tokens of the corpus; its concordance has the lines of all its tokens, found
+in the same pass as those of the other keywords.
+
+The results are to be saved as: conc_result_{keyword} and conc_result_{keyword}_glued in ./data, the / of the keyword
+written as _ and the wildcards of a pattern percent-encoded, e.g., conc_result_백신_%2A for 백신/*. The keyword itself
+is kept in the keyword.txt of each directory.
+
+Author: Gyu-min Lee
+his.nigel at gmail dot com
+"""
+
+import argparse
 import os
 
 import re
 import kiwipiepy
 
-from tqdm import tqdm
-from nltk.text import Text
+from collections import deque
+from functools import partial
+from typing import Iterable
+
+from tqdm.contrib.concurrent import process_map
+
+from corpus_reader import iter_tokens
+from instrument import measure
+from instrument import set_debug
+from merge_texts_by_weeks import get_datetime
+from merge_texts_by_weeks import get_week
+from merge_texts_by_weeks import get_weekly_name
+from vocab_index import expand_queries
+from vocab_index import get_token_queries
 
 from icecream import ic
 ic.disable()
 
+WIDTH = 200
+KEYWORDS = ["코로나/NNP", "마스크/NNG", "확진/NNG", "거리두기/NNG", "백신/NNG"]
+UNSAFE = re.compile(r"[%*?\[\]]") # characters encoded in the names of the output directories
+KEYWORD_NAME = "keyword.txt"
+
+_kiwi = None
+
 def grab_file_paths(root:str, ext:str=".txt") -> list:
     """grab file paths in a path with certain extension
-    
+
     Params:
         root(str): the root path
         ext(str): the extesion
@@ -30,73 +76,258 @@ def grab_file_paths(root:str, ext:str=".txt") -> list:
 
     return paths
 
+def get_kiwi() -> kiwipiepy.Kiwi:
+    """get the Kiwi instance of the process, creating it on the first call
 
-def main(keyword, do_debug):
-
-    if do_debug:
-        ic.enable()
-
-    kiwi = kiwipiepy.Kiwi()
-
-    files = grab_file_paths("./data/COVID19/tagged_weekly", ".tsv")
-
-    ic(files)
-
-    print("Generating concordances for "+keyword)
-
-    lookup_word = keyword
-    lookup_word_path = re.sub('/', '_', lookup_word)
-    
-    try:
-        os.mkdir(f"./data/conc_result_{lookup_word_path}")
-        os.mkdir(f"./data/conc_result_{lookup_word_path}_glued")
-    except OSError:
-        pass
-
-    for file in tqdm(files):
-        
-        ic(file)
-        file_name = os.path.basename(file)
-        ic(file_name)
-
-        with open(file) as f:
-            tokens = f.read()
-
-        tokens = re.sub('\t', ' ', tokens)
-        tokens = tokens.split(' ')
-        
-        ic(tokens[0])
-
-        text = Text(tokens)
-
-        conc = text.concordance_list(lookup_word, width=200, lines=None)
-    
-        with open(f"./data/conc_result_{lookup_word_path}_glued/{file_name}", 'w') as f:
-            if ic(len(conc)) == 0:
-                f.write('')
-            else:
-                for c in conc:
-                    line = c.line
-                    line = re.sub(r"\/\w+", '', line)
-                    line = line.split(' ')
-                    line = kiwi.glue(line)
-                    f.write(line)
-                    f.write('\n')
-
-        with open(f"./data/conc_result_{lookup_word_path}/{file_name}", 'w') as f:
-            if ic(len(conc)) == 0:
-                f.write('')
-            else:
-                for c in conc:
-                    line = c.line
-                    f.write(line)
-                    f.write('\n')
-
-    print(f"Wrote concordances for {lookup_word}.")    
- 
-if __name__ == "__main__":
-    keywords = ["코로나/NNP", "마스크/NNG", "확진/NNG", "거리두기/NNG", "백신/NNG"]
-    do_debug = False
+    Returns:
+        kiwipiepy.Kiwi: the Kiwi instance
+    """
+    global _kiwi
+
+    if _kiwi is None:
+        _kiwi = kiwipiepy.Kiwi()
+
+    return _kiwi
+
+def get_output_dirs(keyword:str) -> tuple:
+    """get the output directories for the keyword
+
+    The wildcards of a pattern, and %, are percent-encoded, so that the names are safe to glob and to pass to a shell and
+    can be read back with results_store.get_keyword().
+
+    Params:
+        keyword(str): the keyword in FORM/TAG format, or a pattern of it
+
+    Returns:
+        (str, str): the directories for the tagged and the glued concordances
+    """
+
+    keyword_path = UNSAFE.sub(lambda match: f"%{ord(match.group(0)):02X}", re.sub('/', '_', keyword))
+
+    return (f"./data/conc_result_{keyword_path}", f"./data/conc_result_{keyword_path}_glued")
+
+def make_output_dirs(keyword:str) -> tuple:
+    """create the output directories for the keyword, writing the keyword in their keyword.txt
+
+    Params:
+        keyword(str): the keyword in FORM/TAG format, or a pattern of it
+
+    Returns:
+        (str, str): the directories for the tagged and the glued concordances
+    """
+
+    output_dirs = get_output_dirs(keyword)
+
+    for output_dir in output_dirs:
+        os.makedirs(output_dir, exist_ok=True)
+        with open(os.path.join(output_dir, KEYWORD_NAME), 'w') as file:
+            file.write(keyword + "\n")
+
+    return output_dirs
+
+def find_concordances(tokens:Iterable[str], keywords:list, width:int=WIDTH, expansions:dict=None) -> dict:
+    """find the concordance lines of all the keywords in a single pass over the tokens
+
+    The tokens are matched case-insensitively, and each line has about width // 4 tokens of context on each side, cut
+    to the half of the width, as NLTK's ConcordanceIndex does. The tokens are consumed as a stream: only the context
+    window around the current token is kept.
+
+    Params:
+        tokens(Iterable[str]): the tokens of the text
+        keywords(list): the keywords to find
+        width(int): the width of each line, in characters
+        expansions(dict): the tokens of each keyword, as expand_queries() gives. Each keyword is its only token if None
+
+    Returns:
+        dict: the keyword and the list of its concordance lines, in the order of appearance
+    """
+
+    keys = dict()
+    for token, queries in get_token_queries(expansions or {keyword: [keyword] for keyword in keywords}).items():
+        keys.setdefault(token.lower(), list()).extend(queries)
+
+    context = width // 4 # approx number of words of context
+
+    concordances = {keyword: list() for keyword in keywords}
+
+    left_tokens = deque(maxlen=context)
+    pending = deque() # matches waiting for their right context: (keywords, token, left context, right tokens)
+
+    def write_line(match):
+        matched, token, left_context, right_tokens = match
+        right_context = " ".join(right_tokens)
+        half_width = (width - len(token) - 2) // 2
+        for keyword in matched:
+            concordances[keyword].append(" ".join([left_context[-half_width:], token, right_context[:half_width]]))
+
+    for token in tokens:
+        for match in pending:
+            match[3].append(token)
+
+        matched = keys.get(token.lower())
+        if matched is not None:
+            pending.append((matched, token, " ".join(left_tokens), list()))
+
+        while pending and len(pending[0][3]) >= context - 1:
+            write_line(pending.popleft())
+
+        left_tokens.append(token)
+
+    while pending: # matches near the end of the text
+        write_line(pending.popleft())
+
+    return concordances
+
+def glue(line:str) -> str:
+    """remove the tags from the concordance line and restore the spacing
+
+    Params:
+        line(str): the concordance line in FORM/TAG format
+
+    Returns:
+        str: the line in natural Korean spacing
+    """
+
+    line = re.sub(r"\/\w+", '', line)
+    line = line.split(' ')
+
+    return get_kiwi().glue(line)
+
+def write_concordances(path:str, lines:list) -> None:
+    """write the concordance lines, one line each
+
+    Params:
+        path(str): path to the output file
+        lines(list): the lines
+    """
+
+    with open(path, 'w') as f:
+        for line in lines:
+            f.write(line)
+            f.write('\n')
+
+def process_file(path:str, keywords:list, expansions:dict=None) -> dict:
+    """generate the concordances of the keywords from a weekly file
+
+    Params:
+        path(str): path to the weekly tagged file
+        keywords(list): the keywords in FORM/TAG format, or patterns of them
+        expansions(dict): the tokens of each keyword, as expand_queries() gives
+
+    Returns:
+        dict: the keyword and the number of its concordance lines in the file
+    """
+
+    file_name = os.path.basename(path)
+
+    with measure("concordance", unit="bytes", file=path) as record:
+        concordances = find_concordances(iter_tokens(path), keywords, expansions=expansions)
+
+        for keyword, lines in concordances.items():
+            conc_dir, glued_dir = get_output_dirs(keyword)
+            write_concordances(os.path.join(glued_dir, file_name), [glue(line) for line in lines])
+            write_concordances(os.path.join(conc_dir, file_name), lines)
+
+        record.add(os.path.getsize(path))
+
+    return {keyword: len(lines) for keyword, lines in concordances.items()}
+
+def process_keyword(keyword:str, width:int=WIDTH) -> int:
+    """generate the weekly concordances of the keyword from the positional index of corpus_index.py
+
+    Params:
+        keyword(str): the keyword in FORM/TAG format, or a pattern of it
+        width(int): the width of each line, in characters
+
+    Returns:
+        int: the number of its concordance lines
+    """
+
+    from corpus_index import CorpusIndex
+
+    index = CorpusIndex() # memory-mapped: cheap to open in every worker
+    weeks, _ = index.weeks()
+    conc_dir, glued_dir = get_output_dirs(keyword)
+
+    with measure("concordance", unit="lines", keyword=keyword) as record:
+        concordances = {get_weekly_name(week): list() for week in weeks}
+        for file_name, line in index.concordance(keyword, width):
+            concordances[get_weekly_name(get_week(get_datetime(file_name)))].append(line)
+
+        for file_name, lines in concordances.items():
+            write_concordances(os.path.join(glued_dir, file_name), [glue(line) for line in lines])
+            write_concordances(os.path.join(conc_dir, file_name), lines)
+            record.add(len(lines))
+
+    return record.items
+
+def main(keywords, do_debug, max_workers=None, use_token_corpus=False):
+
+    set_debug(do_debug)
+
+    print("Generating concordances for "+", ".join(keywords))
+
+    if use_token_corpus:
+        from corpus_index import CorpusIndex
+        from corpus_index import build_index
+
+        build_index()
+        index = CorpusIndex()
+        expansions = {keyword: index.expand(keyword) for keyword in keywords}
+    else:
+        expansions = expand_queries(keywords)
+
+    for keyword, tokens in expansions.items():
+        if tokens != [keyword]:
+            print(f"{keyword}: {', '.join(tokens) if tokens else 'no token in the corpus'}")
 
     for keyword in keywords:
-        main(keyword, do_debug)  
+        make_output_dirs(keyword)
+
+    with measure("concordance", unit="lines", token_corpus=use_token_corpus) as record:
+        if use_token_corpus:
+            counts = process_map(process_keyword, keywords,
+                                max_workers=max_workers,
+                                chunksize=1,
+                                desc="Keywords: ")
+        else:
+            files = grab_file_paths("./data/COVID19/tagged_weekly", ".tsv")
+
+            ic(files)
+
+            counts = process_map(partial(process_file, keywords=keywords, expansions=expansions), files,
+                                max_workers=max_workers,
+                                chunksize=1,
+                                desc="Files: ")
+            counts = [sum(count.values()) for count in counts]
+
+        record.add(sum(counts))
+
+    ic(counts)
+
+    print(f"Wrote concordances for {', '.join(keywords)}.")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="get_concordance_per_file_batch",
+                                    description="Generate the weekly concordances of the keywords")
+
+    parser.add_argument('-t',
+                        '--token_corpus',
+                        action='store_true',
+                        dest='token_corpus',
+                        help="Draw the concordances from the positional index built by corpus_index.py")
+    parser.add_argument('-k',
+                        '--keywords',
+                        nargs='+',
+                        type=str,
+                        dest='keywords',
+                        default=KEYWORDS,
+                        help="Keywords in FORM/TAG format, or patterns of them like 코로나* or 백신/*")
+    parser.add_argument('-d',
+                        '--debugging',
+                        action='store_true',
+                        dest='debugging')
+
+    arguments = parser.parse_args()
+
+    main(arguments.keywords, arguments.debugging, use_token_corpus=arguments.token_corpus)
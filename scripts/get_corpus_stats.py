@@ -9,17 +9,39 @@ Will calculate:
     - number of ecels in cleaned
     - number of tokens in tagged
 
+Each file is read once, an article at a time through corpus_reader.py, and the files are counted in parallel. With
+--token_corpus, the tokens in tagged are counted from the token-id corpus of token_corpus.py instead, without reading
+the text at all. The count then excludes the empty tokens from repeated spaces and the empty lines at the end of the
+files.
+
+The counts are saved in the results store of results_store.py by the week of the files, as press_count_wkly keyed by
+the press and corpus_size_wkly keyed by ecels and words, and summed over the weeks as press_count and corpus_size with
+no week. ingest_daily.py replaces the weeks it updates and sums them again the same way. Write
+./results/press_count_result.xlsx with export_results.py.
+
 Author: Gyu-min Lee 
 his.nigel at gmail dot com
 """
 
+import argparse
 import os
 
-import pandas as pd
+import numpy as np
 
 from collections import Counter
+from typing import Optional
+
+from tqdm.contrib.concurrent import process_map
+
+import instrument
 
-from tqdm import tqdm
+from corpus_reader import parse_article
+from corpus_reader import read_articles
+from instrument import measure
+from merge_texts_by_weeks import get_datetime
+from merge_texts_by_weeks import get_week
+from results_store import ResultsStore
+from results_store import STORE_PATH
 
 from icecream import ic
 ic.disable()
@@ -51,33 +73,133 @@ def get_press(article: str) -> str:
     Returns:
         str: the name of the press
     """
-    article = article.split('\t')
-   
-    if len(article) < 2: # if no metadata available
-        press = "NA"
-    else:
-        press = article[0]
-    
-    return press
 
-def get_article_len(article: str) -> int:
+    return parse_article(article).press
+
+def get_article_len(article) -> int:
     """grab an article and returns the true length
 
     Params:
-        article(str): the artlce where the press name is seprated by a '\t'
+        article(Union[str, Article]): the artlce where the press name is seprated by a '\t', or the parsed article
     Returns:
         int: the length excluding the press name
     """
-    article = article.split('\t')
-    if len(article) < 2: # if no metadata available
-        article = ' '.join(article)
-    else:
-        article = article[1:]
-        article = ' '.join(article) # for just in case there is a tab in the body
-    article = article.split(' ')
-    length = len(article)
-   
-    return length
+    if isinstance(article, str):
+        article = parse_article(article)
+
+    return article.text.count(' ') + 1 # the number of article.text.split(' ')
+
+def count_file(path: str) -> tuple:
+    """count the presses and the tokens of a file in a single streaming pass
+
+    Params:
+        path(str): path to the file
+    Returns:
+        (Counter, int): the count of each press, and the number of tokens(spacing result) excluding the press names
+    """
+    press_count = Counter()
+    token_count = 0
+
+    with measure("corpus_stats", unit="articles", file=path) as record:
+        for article in read_articles(path):
+            if instrument.DEBUG and "아시아?姸?" in article.press:
+                ic(path)
+                ic(article.press)
+            press_count[article.press] += 1
+            token_count += get_article_len(article)
+
+        record.add(sum(press_count.values()))
+
+    return press_count, token_count
+
+def count_each_file(paths: list, max_workers: Optional[int] = None) -> list:
+    """count the presses and the tokens of each file across a single process pool
+
+    Params:
+        paths(list): list of paths to the articles.
+        max_workers(Optional[int]): the number of the processes. Defaults to the number of CPUs
+    Returns:
+        list: (Counter, int) of each file as count_file() gives, in the order of the paths
+    """
+
+    if len(paths) < 2: # not worth a process pool
+        return list(map(count_file, paths))
+
+    return process_map(count_file, paths, max_workers=max_workers, chunksize=max(1, len(paths) // 256))
+
+def count_files(paths: list, max_workers: Optional[int] = None) -> tuple:
+    """count the presses and the tokens of the files across a process pool
+
+    Params:
+        paths(list): list of paths to the articles.
+        max_workers(Optional[int]): the number of the processes. Defaults to the number of CPUs
+    Returns:
+        (Counter, int): the count of each press, and the number of tokens, over all the files
+    """
+    press_count = Counter()
+    token_count = 0
+
+    for file_press_count, file_token_count in count_each_file(paths, max_workers): # merged in the order of the paths
+        press_count.update(file_press_count)
+        token_count += file_token_count
+
+    return press_count, token_count
+
+def sum_by_weeks(paths: list, file_counts: list) -> tuple:
+    """sum the counts of each file by the week of its date
+
+    Params:
+        paths(list): list of paths to the articles.
+        file_counts(list): (Counter, int) of each file as count_each_file() gives, in the order of the paths
+    Returns:
+        (dict, Counter): the Monday of each week and the count of each press, and the number of tokens of each week
+    """
+    press_counts = dict()
+    token_counts = Counter()
+
+    for path, (file_press_count, file_token_count) in zip(paths, file_counts):
+        week = get_week(get_datetime(path))
+        press_counts.setdefault(week, Counter()).update(file_press_count)
+        token_counts[week] += file_token_count
+
+    return press_counts, token_counts
+
+def store_weekly_counts(store: ResultsStore, press_counts: dict, ecel_counts: Counter, word_counts: Counter,
+                        weeks: Optional[list] = None) -> tuple:
+    """replace the counts of the weeks in the results store, and sum the counts of all the weeks again
+
+    Params:
+        store(ResultsStore): the results store
+        press_counts(dict): the Monday of each week and the count of each press in cleaned
+        ecel_counts(Counter): the number of ecels in cleaned of each week
+        word_counts(Counter): the number of words in tagged of each week
+        weeks(Optional[list]): the Mondays of the weeks to replace. All the weeks in the store if None
+    Returns:
+        (dict, int, int): the count of each press, the most frequent first, and the numbers of ecels and words
+    """
+
+    store.delete("press_count_wkly", weeks)
+    store.put("press_count_wkly", [(press, week, count) for week, press_count in press_counts.items()
+                                    for press, count in press_count.items()])
+
+    store.delete("corpus_size_wkly", weeks)
+    store.put("corpus_size_wkly", [("ecels", week, count) for week, count in ecel_counts.items()] +
+                                    [("words", week, count) for week, count in word_counts.items()])
+
+    # the presses in the order they first appear, so that the ties are ordered as by count_press()
+    press_count = Counter()
+    for press, count in store.get("press_count_wkly")[["keyword", "value"]].itertuples(index=False):
+        press_count[press] += count
+    press_count = dict(press_count.most_common())
+
+    sizes = store.get("corpus_size_wkly").groupby("keyword")["value"].sum()
+    ecel_count, word_count = int(sizes.get("ecels", 0)), int(sizes.get("words", 0))
+
+    store.delete("press_count")
+    store.put("press_count", [(press, "", count) for press, count in press_count.items()])
+    store.put("corpus_size", [("ecels", "", ecel_count), ("words", "", word_count)])
+
+    return press_count, ecel_count, word_count
 
 def count_press(paths: list) -> dict:
     """count presses in the paths
@@ -88,20 +210,7 @@ def count_press(paths: list) -> dict:
         dict: press name and corresponding count.
     """
 
-    press_names = list()
-
-    for path in tqdm(paths):
-        with open(path) as file:
-            content = file.read()
-        articles = content.split('\n')
-        for article in articles:
-            press = get_press(article)
-            if "아시아?姸?" in press:
-                ic(path)
-                ic(press)
-            press_names.append(press)
-   
-    count = Counter(press_names)
+    count, _ = count_files(paths)
     count = count.most_common()
     count = dict(count)
     
@@ -115,50 +224,78 @@ def count_tokens(paths: list) -> int:
     Returns:
         int: number of tokens.
     """
-    count = 0
 
-    for path in tqdm(paths):
-        with open(path) as file:
-            content = file.read()
-        articles = content.split('\n')
-        for article in articles:
-            count += get_article_len(article)
+    _, count = count_files(paths)
 
     return count
 
-def main(do_debug):
+def count_token_corpus(corpus) -> tuple:
+    """count the presses and the tokens of the token-id corpus from its arrays
+
+    Params:
+        corpus(TokenCorpus): the token-id corpus
+    Returns:
+        (Counter, Counter): the count of each press, and the number of tokens excluding the press names of each week
+    """
+    counts = np.bincount(corpus.article_press, minlength=len(corpus.presses))
+    press_count = Counter(dict(zip(corpus.presses, counts.tolist())))
+
+    weeks, starts = corpus.weeks()
+    token_counts = Counter(dict(zip(weeks, np.diff(np.asarray(corpus.articles)[starts]).tolist())))
+
+    return press_count, token_counts
+
+def main(do_debug, use_token_corpus=False):
     
-    if do_debug:
-        ic.enable()
+    instrument.set_debug(do_debug)
     
     print("Loading the paths...")
-    cleaned_paths = get_file_paths("./data/COVID19/cleaned")
-    tagged_paths = get_file_paths("./data/COVID19/tagged")
+    cleaned_paths = sorted(get_file_paths("./data/COVID19/cleaned"))
+    tagged_paths = None if use_token_corpus else sorted(get_file_paths("./data/COVID19/tagged"))
     print("Paths loaded!")
 
-    print("Counting the press...")
-    press_count = count_press(cleaned_paths) 
-    print("Press counted!")
-
-    print("Counting the ecels...")
-    ecel_count = count_tokens(cleaned_paths)
-    print("Ecels counted!")
+    print("Counting the press and the ecels...")
+    with measure("corpus_stats", unit="ecels", corpus="cleaned") as record:
+        press_counts, ecel_counts = sum_by_weeks(cleaned_paths, count_each_file(cleaned_paths))
+        record.add(sum(ecel_counts.values()))
+    print("Press and ecels counted!")
 
     print("Counting the words...")
-    word_count = count_tokens(tagged_paths)
+    with measure("corpus_stats", unit="tokens", corpus="tagged", token_corpus=use_token_corpus) as record:
+        if use_token_corpus:
+            from token_corpus import TokenCorpus
+
+            _, word_counts = count_token_corpus(TokenCorpus())
+        else:
+            _, word_counts = sum_by_weeks(tagged_paths, count_each_file(tagged_paths))
+        record.add(sum(word_counts.values()))
     print("Words counted!")
 
+    print("\nSaving the counts...")
+    with ResultsStore() as store:
+        _, ecel_count, word_count = store_weekly_counts(store, press_counts, ecel_counts, word_counts)
+    print(f"Counts saved as press_count, corpus_size, and their weekly counts in {STORE_PATH}")
+
     print("========RESULT========")
     print(f"num_ecel:\t{ecel_count}")
     print(f"num_words:\t{word_count}")
 
-    print("\nAlso saving the press count...")
-    press_count_df = pd.DataFrame(press_count.items())
-    press_count_df.to_excel("./results/press_count_result.xlsx", index=False)
-    print("Count saved as ./results/press_count_result.xlsx")
-
     print("Done!")
 
 if __name__ ==  "__main__":
-    do_debug = False
-    main(do_debug)
+    parser = argparse.ArgumentParser(prog="get_corpus_stats",
+                                    description="Calculate the statistics of the corpus")
+
+    parser.add_argument('-t',
+                        '--token_corpus',
+                        action='store_true',
+                        dest='token_corpus',
+                        help="Count the tokens in tagged from the token-id corpus built by token_corpus.py")
+    parser.add_argument('-d',
+                        '--debugging',
+                        action='store_true',
+                        dest='debugging')
+
+    arguments = parser.parse_args()
+
+    main(arguments.debugging, arguments.token_corpus)
@@ -2,15 +2,40 @@
 
 Get absolute and relative frequencies from the tagged corpus.
 
+With --token_corpus, the frequencies are read from the positional index of corpus_index.py instead of the weekly
+files, built first if it is out of date: each keyword costs a look-up of its postings rather than a pass over the
+corpus. The relative frequencies are then per million morphemes, without the press names and the empty tokens the
+weekly files are split into.
+
+With --keywords, the frequencies of other keywords are counted instead of KEYWORDS. A keyword can be a pattern like
+코로나* or 백신/*, expanded by vocab_index.py into the tokens of the corpus; its frequency is that of all its tokens,
+which are counted in the same pass over the corpus as the other keywords.
+
+The frequencies are saved in the results store of results_store.py as the metrics freq_abs and freq_rel, keyed by the
+keyword and the week. Write ./data/COVID19/tagged_weekly/freq_abs.xlsx and freq_rel.xlsx with export_results.py.
+
 Author: Gyu-min Lee
 his.nigel at gmail dot com
 """
 
+import argparse
 import os
 
 from tqdm import tqdm 
 
-import pandas as pd
+from corpus_reader import iter_tokens
+from instrument import measure
+from merge_texts_by_weeks import get_datetime
+from merge_texts_by_weeks import get_weekly_name
+from results_store import ResultsStore
+from vocab_index import expand_queries
+from vocab_index import get_token_queries
+
+KEYWORDS = ["코로나/NNP", "백신/NNG", 
+        "확진/NNG", "마스크/NNG", "거리두기/NNG"]
+COLUMNS = ["path", 
+        "covid", "vaccine", "confirmed", "mask",
+        "distancing"]
 
 def freq_per_mille(token: str, corpus: str) -> float:
     """Calculate the token's freuqency per million
@@ -46,42 +71,137 @@ def freq_absolute(token: str, corpus: str) -> int:
 
     return token_freq
 
-def main():
-    keywords = ["코로나/NNP", "백신/NNG", 
-            "확진/NNG", "마스크/NNG", "거리두기/NNG"]
-    path = "./data/COVID19/tagged_weekly/"
-    file_paths = os.listdir(path)
-    
-    result_list_abs, result_list_rel = list(), list()
+def get_freq_rows(path: str, keywords: list = KEYWORDS, expansions: dict = None) -> tuple:
+    """Calculate the absolute and relative frequencies of the keywords in a weekly file
+
+    The file is streamed through corpus_reader.py, with the same counts as freq_absolute() and freq_per_mille() on the
+    whole content.
+
+    Parameters:
+        path(str): path to the weekly file
+        keywords(list): the keywords in FORM/TAG format, or patterns of them
+        expansions(dict): the tokens of each keyword, as expand_queries() gives. Each keyword is its only token if None
+
+    Returns:
+        (list, list): the rows of the absolute and the relative frequencies, each starting with the file name
+    """
+
+    list_abs = [os.path.basename(path)]
+    list_rel = [os.path.basename(path)]
+
+    with measure("get_freq", unit="tokens", file=path) as record:
+        token_queries = get_token_queries(expansions or {word: [word] for word in keywords})
+        counts = dict.fromkeys(keywords, 0)
+        corpus_size = 0
+
+        for token in iter_tokens(path, split_tabs=False): # the tokens of content.split(' ')
+            corpus_size += 1
+            if token in token_queries:
+                for word in token_queries[token]:
+                    counts[word] += 1
 
-    for file_path in tqdm(file_paths):
-        list_abs = [file_path]
-        list_rel = [file_path] 
-        with open(f"{path}{file_path}") as file:
-            content = file.read()
         for word in keywords:
-            count_abs = freq_absolute(word, content)
-            count_rel = freq_per_mille(word, content)
-            list_abs.append(count_abs)
-            list_rel.append(count_rel)
-        result_list_abs.append(list_abs)
-        result_list_rel.append(list_rel)
-    
-    result_df_abs = pd.DataFrame(result_list_abs, columns=["path", 
-        "covid", "vaccine", "confirmed", "mask",
-        "distancing"])
+            list_abs.append(counts[word])
+            list_rel.append(counts[word] / corpus_size * 1000000)
 
-    result_df_abs.to_excel("./data/COVID19/tagged_weekly/freq_abs.xlsx")
-    
-    result_df_rel = pd.DataFrame(result_list_rel, columns=["path", 
-        "covid", "vaccine", "confirmed", "mask",
-        "distancing"])
+        record.add(corpus_size)
+
+    return list_abs, list_rel
+
+def get_token_corpus_rows(index, keywords: list = KEYWORDS) -> tuple:
+    """Calculate the absolute and relative frequencies of the keywords by week from the positional index
+
+    Parameters:
+        index(CorpusIndex): the positional index of the token-id corpus
+        keywords(list): the keywords in FORM/TAG format, or patterns of them
+
+    Returns:
+        (list, list): the rows of the absolute and the relative frequencies, each starting with the weekly file name
+    """
+
+    freq_abs, freq_rel = index.weekly_frequencies(keywords)
+
+    result_list_abs, result_list_rel = list(), list()
+
+    for week in freq_abs.index:
+        result_list_abs.append([get_weekly_name(week)] + [int(freq_abs.at[week, word]) for word in keywords])
+        result_list_rel.append([get_weekly_name(week)] + [float(freq_rel.at[week, word]) for word in keywords])
+
+    return result_list_abs, result_list_rel
+
+def store_freq_rows(store: ResultsStore, result_list_abs: list, result_list_rel: list, keywords: list = KEYWORDS,
+                    replace: bool = False) -> None:
+    """Save the rows of the frequencies in the results store as freq_abs and freq_rel
+
+    Parameters:
+        store(ResultsStore): the results store
+        result_list_abs(list): the rows of the absolute frequencies, each starting with the weekly file name
+        result_list_rel(list): the rows of the relative frequencies, each starting with the weekly file name
+        keywords(list): the keywords of the columns after the file name
+        replace(bool): remove the other weeks of the keywords from the store
+    """
+
+    for metric, rows in (("freq_abs", result_list_abs), ("freq_rel", result_list_rel)):
+        store.put(metric,
+                    [(keyword, get_datetime(row[0]), value) for row in rows for keyword, value in zip(keywords, row[1:])],
+                    replace=replace)
+
+def main(use_token_corpus=False, keywords=KEYWORDS):
+    path = "./data/COVID19/tagged_weekly/"
+
+    if use_token_corpus:
+        from corpus_index import CorpusIndex
+        from corpus_index import build_index
+
+        build_index()
+        index = CorpusIndex()
+        expansions = {word: index.expand(word) for word in keywords}
+    else:
+        expansions = expand_queries(keywords)
+
+    for word, tokens in expansions.items():
+        if tokens != [word]:
+            print(f"{word}: {', '.join(tokens) if tokens else 'no token in the corpus'}")
+
+    with measure("get_freq", unit="weeks", token_corpus=use_token_corpus) as record:
+        if use_token_corpus:
+            result_list_abs, result_list_rel = get_token_corpus_rows(index, keywords)
+        else:
+            file_paths = sorted(file for file in os.listdir(path) if file.endswith(".tsv"))
+
+            result_list_abs, result_list_rel = list(), list()
+
+            for file_path in tqdm(file_paths):
+                list_abs, list_rel = get_freq_rows(f"{path}{file_path}", keywords, expansions)
+                result_list_abs.append(list_abs)
+                result_list_rel.append(list_rel)
+
+        record.add(len(result_list_abs))
 
-    result_df_rel.to_excel("./data/COVID19/tagged_weekly/freq_rel.xlsx")
+    with ResultsStore() as store:
+        store_freq_rows(store, result_list_abs, result_list_rel, keywords, replace=True)
 
     print("Done.")
 
     return
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(prog="get_freq",
+                                    description="Get the weekly keyword frequencies of the tagged corpus")
+
+    parser.add_argument('-t',
+                        '--token_corpus',
+                        action='store_true',
+                        dest='token_corpus',
+                        help="Read the frequencies from the positional index built by corpus_index.py")
+    parser.add_argument('-k',
+                        '--keywords',
+                        nargs='+',
+                        type=str,
+                        dest='keywords',
+                        default=KEYWORDS,
+                        help="Keywords in FORM/TAG format, or patterns of them like 코로나* or 백신/*")
+
+    arguments = parser.parse_args()
+
+    main(arguments.token_corpus, arguments.keywords)
@@ -0,0 +1,127 @@
+# coding: utf-8
+
+"""get_press_breakdown.py
+
+Break the keyword frequencies and the dictionary-based sentiment scores down by press and week.
+
+Every weekly tagged file is streamed once through corpus_reader.py, skipping the empty line merge_texts_by_weeks.py
+writes after each daily file, and for each article, grouped by its press:
+    - the tokens(spacing result) of the title and the body are counted
+    - the keywords among them are counted
+    - the concordance lines of the keywords are drawn as get_concordance_per_file_batch.py does, but with the context
+      within the article
+The lines of a file are then scored at once by the vectorized analyzer of dict_SA.py, and the scores are summed by
+press and keyword. The files are processed in parallel, the analyzer loaded once before the workers are forked.
+
+The results are to be saved in the results store of results_store.py, keyed by the week and:
+    - press_tokens: the press, the number of the tokens
+    - press_freq_abs: PRESS:KEYWORD, the number of the keyword in the articles of the press
+    - press_dict_SA_sum: PRESS:KEYWORD, the sum of the sentiment scores of its concordance lines, one for each keyword
+The relative frequency is press_freq_abs / press_tokens and the average sentiment press_dict_SA_sum / press_freq_abs.
+Write ./results/press_breakdown_wkly.csv with export_results.py.
+
+Author: Gyu-min Lee
+his.nigel at gmail dot com
+"""
+
+import os
+
+from collections import Counter
+from collections import defaultdict
+
+from tqdm.contrib.concurrent import process_map
+
+from corpus_reader import read_articles
+from get_concordance_per_file_batch import WIDTH
+from get_concordance_per_file_batch import find_concordances
+from get_freq import KEYWORDS
+from instrument import measure
+from kosac_sent_analyzer import get_vectorized_analyzer
+from merge_texts_by_weeks import get_datetime
+from results_store import ResultsStore
+from results_store import STORE_PATH
+
+TAGGED_WEEKLY_ROOT = "./data/COVID19/tagged_weekly"
+
+def get_series(press:str, keyword:str) -> str:
+    """get the key of the press and the keyword in the results store, e.g., 연합뉴스:코로나/NNP"""
+
+    return f"{press}:{keyword}"
+
+def count_file(path:str, keywords:list = KEYWORDS, width:int = WIDTH) -> tuple:
+    """count the tokens and the keywords, and sum the sentiment scores of the keywords, by press in a weekly file
+
+    Params:
+        path(str): path to the weekly tagged file
+        keywords(list): the keywords in FORM/TAG format
+        width(int): the width of the concordance lines
+
+    Returns:
+        (Counter, Counter, dict): the number of the tokens of each press, the number of each (press, keyword), and the
+            sum of the sentiment scores of each (press, keyword)
+    """
+
+    keyword_set = set(keywords)
+
+    tokens = Counter()
+    freq = Counter()
+    groups = list() # (press, keyword) of each concordance line
+    lines = list()
+
+    with measure("press_breakdown", unit="articles", file=path) as record:
+        for article in read_articles(path):
+            if article.title is None and not article.body: # the empty line after each merged daily file
+                continue
+
+            article_tokens = article.text.split(' ')
+            tokens[article.press] += len(article_tokens)
+            record.add()
+
+            found = Counter(token for token in article_tokens if token in keyword_set)
+            if not found:
+                continue
+
+            for keyword, count in found.items():
+                freq[(article.press, keyword)] += count
+
+            for keyword, keyword_lines in find_concordances(article_tokens, list(found), width).items():
+                groups.extend((article.press, keyword) for _ in keyword_lines)
+                lines.extend(keyword_lines)
+
+        scores = get_vectorized_analyzer(level=2).analyze_many(lines)
+
+    sentiment = defaultdict(int)
+    for group, score in zip(groups, scores.tolist()):
+        sentiment[group] += score
+
+    return tokens, freq, dict(sentiment)
+
+def main():
+    paths = sorted(os.path.join(TAGGED_WEEKLY_ROOT, file) for file in os.listdir(TAGGED_WEEKLY_ROOT)
+                    if file.endswith(".tsv"))
+
+    print(f"Breaking down {len(KEYWORDS)} keywords by press in {len(paths)} weekly files...")
+
+    get_vectorized_analyzer(level=2) # loaded before forking, so that the workers share it
+
+    with measure("press_breakdown", unit="files") as record:
+        results = process_map(count_file, paths, desc="Files: ")
+        record.add(len(results))
+
+    rows = {"press_tokens": list(), "press_freq_abs": list(), "press_dict_SA_sum": list()}
+
+    for path, (tokens, freq, sentiment) in zip(paths, results):
+        week = get_datetime(os.path.basename(path))
+        rows["press_tokens"].extend((press, week, count) for press, count in tokens.items())
+        rows["press_freq_abs"].extend((get_series(*group), week, count) for group, count in freq.items())
+        rows["press_dict_SA_sum"].extend((get_series(*group), week, total) for group, total in sentiment.items())
+
+    with ResultsStore() as store:
+        for metric, metric_rows in rows.items():
+            store.delete(metric)
+            store.put(metric, metric_rows)
+
+    print(f"Results saved as {', '.join(rows)} in {STORE_PATH}!")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,268 @@
+# coding: utf-8
+
+"""ingest_daily.py
+
+Add new daily corpus files and update only the aggregates of the weeks they belong to.
+
+For each week touched by the new files, the script updates:
+    - the weekly merged files in cleaned_weekly and tagged_weekly
+    - the concordances in conc_result_{keyword} and conc_result_{keyword}_glued
+and, in the results store of results_store.py:
+    - the keyword frequencies as freq_abs and freq_rel
+    - the dictionary-based and the BERT-based sentiment averages as dict_SA and bert_SA
+    - the press counts per week as press_count_wkly, and their total as press_count
+    - the numbers of ecels and words per week as corpus_size_wkly, and their totals as corpus_size
+The rows of the other weeks are left as they are. Write the spreadsheets and the CSV files with export_results.py.
+
+Usage: python ./scripts/ingest_daily.py --cleaned NEW/cleaned/2022.07.01.tsv --tagged NEW/tagged/2022.07.01.tsv
+
+Author: Gyu-min Lee
+his.nigel at gmail dot com
+"""
+
+import argparse
+import os
+import shutil
+
+from tqdm import tqdm
+
+import get_concordance_per_file_batch as concordance
+
+from get_corpus_stats import count_each_file
+from get_corpus_stats import store_weekly_counts
+from get_corpus_stats import sum_by_weeks
+from get_freq import KEYWORDS
+from get_freq import get_freq_rows
+from get_freq import store_freq_rows
+from instrument import measure
+from instrument import set_debug
+from merge_texts_by_weeks import get_datetime
+from merge_texts_by_weeks import get_file_paths
+from merge_texts_by_weeks import get_week
+from merge_texts_by_weeks import get_weekly_name
+from merge_texts_by_weeks import group_by_weeks
+from merge_texts_by_weeks import merge_corpora
+from results_store import ResultsStore
+
+from icecream import ic
+ic.disable()
+
+CLEANED_ROOT = "./data/COVID19/cleaned"
+TAGGED_ROOT = "./data/COVID19/tagged"
+CLEANED_WEEKLY_ROOT = "./data/COVID19/cleaned_weekly"
+TAGGED_WEEKLY_ROOT = "./data/COVID19/tagged_weekly"
+
+def copy_daily_files(paths: list, root: str) -> list:
+    """copy the daily files into the corpus directory
+
+    Params:
+        paths(list): paths to the new daily files
+        root(str): the corpus directory
+
+    Returns:
+        list: the paths of the files in the corpus directory
+    """
+
+    copied = list()
+
+    for path in paths:
+        get_datetime(path) # fail early on a file not named by its date
+        target = os.path.join(root, os.path.basename(path))
+        if os.path.abspath(path) != os.path.abspath(target):
+            shutil.copyfile(path, target + ".tmp")
+            os.replace(target + ".tmp", target)
+        copied.append(target)
+
+    return copied
+
+def update_freq(weekly_paths: list) -> None:
+    """update the keyword frequencies of the weekly files
+
+    Params:
+        weekly_paths(list): paths to the updated weekly tagged files
+    """
+
+    rows = [get_freq_rows(path) for path in weekly_paths]
+
+    with ResultsStore() as store:
+        store_freq_rows(store, [row[0] for row in rows], [row[1] for row in rows])
+
+def update_concordances(weekly_paths: list, keywords: list) -> None:
+    """update the concordances of the keywords from the weekly files
+
+    Params:
+        weekly_paths(list): paths to the updated weekly tagged files
+        keywords(list): the keywords in FORM/TAG format
+    """
+
+    for keyword in keywords:
+        concordance.make_output_dirs(keyword)
+
+    for path in tqdm(weekly_paths, desc="Concordances: "):
+        concordance.process_file(path, keywords)
+
+def update_dict_SA(weekly_names: list, keywords: list) -> None:
+    """update the dictionary-based sentiment averages of the weeks
+
+    Params:
+        weekly_names(list): names of the updated weekly files
+        keywords(list): the keywords in FORM/TAG format
+    """
+
+    from dict_SA import get_avg_score
+
+    rows = list()
+    for keyword in keywords:
+        conc_dir, _ = concordance.get_output_dirs(keyword)
+        rows.extend((keyword, date, score) for date, score in
+                    (get_avg_score(os.path.join(conc_dir, name)) for name in weekly_names))
+
+    with ResultsStore() as store:
+        store.put("dict_SA", rows)
+
+def update_bert_SA(weekly_names: list, keywords: list) -> None:
+    """update the BERT-based sentiment averages of the weeks
+
+    Params:
+        weekly_names(list): names of the updated weekly files
+        keywords(list): the keywords in FORM/TAG format
+    """
+
+    import bert_SA
+
+    device = 'cuda' if bert_SA.torch.cuda.is_available() else 'cpu'
+    tokenizer = bert_SA.AutoTokenizer.from_pretrained(bert_SA.MODEL_PATH, local_files_only=True)
+    model = bert_SA.AutoModelForSequenceClassification.from_pretrained(bert_SA.MODEL_PATH,
+        local_files_only=True,
+        num_labels=2)
+    model = model.to(device)
+    cache = bert_SA.PredictionCache(bert_SA.CACHE_PATH, bert_SA.get_model_id(bert_SA.MODEL_PATH))
+
+    rows = list()
+    for keyword in keywords:
+        _, glued_dir = concordance.get_output_dirs(keyword)
+        rows.extend((keyword, date, score) for date, score in
+                    (bert_SA.get_avg_score(os.path.join(glued_dir, name), tokenizer, model, device, cache)
+                        for name in weekly_names))
+
+    cache.close()
+
+    with ResultsStore() as store:
+        store.put("bert_SA", rows)
+
+def update_corpus_stats(weeks: list) -> None:
+    """update the press counts and the corpus sizes of the weeks, and their totals over the corpus
+
+    The counts are kept per week as press_count_wkly and corpus_size_wkly in the results store, as get_corpus_stats.py
+    saves them. If it has none yet, they are counted once from all the files. The cleaned and the tagged files of all
+    the weeks are counted in a single process pool.
+
+    Params:
+        weeks(list): the Mondays of the updated weeks
+    """
+
+    cleaned_weeks = group_by_weeks(get_file_paths(CLEANED_ROOT))
+    tagged_weeks = group_by_weeks(get_file_paths(TAGGED_ROOT))
+
+    with ResultsStore() as store:
+        if store.get("press_count_wkly").empty or store.get("corpus_size_wkly").empty:
+            weeks = sorted(set(cleaned_weeks) | set(tagged_weeks))
+
+        cleaned_paths = [path for week in weeks for path in cleaned_weeks.get(week, list())]
+        tagged_paths = [path for week in weeks for path in tagged_weeks.get(week, list())]
+
+        file_counts = count_each_file(cleaned_paths + tagged_paths)
+        press_counts, ecel_counts = sum_by_weeks(cleaned_paths, file_counts[:len(cleaned_paths)])
+        _, word_counts = sum_by_weeks(tagged_paths, file_counts[len(cleaned_paths):])
+
+        store_weekly_counts(store, press_counts, ecel_counts, word_counts, weeks)
+
+def ingest(cleaned_paths: list, tagged_paths: list, keywords: list = KEYWORDS, run_bert: bool = True) -> list:
+    """add the daily files and update the aggregates of their weeks
+
+    Params:
+        cleaned_paths(list): paths to the new daily cleaned files
+        tagged_paths(list): paths to the new daily tagged files
+        keywords(list): the keywords in FORM/TAG format
+        run_bert(bool): whether to update the BERT-based sentiment averages
+
+    Returns:
+        list: the Mondays of the updated weeks
+    """
+
+    cleaned_paths = copy_daily_files(cleaned_paths, CLEANED_ROOT)
+    tagged_paths = copy_daily_files(tagged_paths, TAGGED_ROOT)
+
+    weeks = sorted({get_week(get_datetime(path)) for path in cleaned_paths + tagged_paths})
+    weekly_names = [get_weekly_name(week) for week in weeks]
+    ic(weekly_names)
+
+    print(f"Updating {len(weeks)} week(s): {', '.join(weekly_names)}")
+
+    merge_corpora({CLEANED_ROOT: CLEANED_WEEKLY_ROOT, TAGGED_ROOT: TAGGED_WEEKLY_ROOT})
+
+    tagged_weekly_paths = [os.path.join(TAGGED_WEEKLY_ROOT, name) for name in weekly_names]
+    tagged_weekly_paths = [path for path in tagged_weekly_paths if os.path.exists(path)]
+    tagged_weekly_names = [os.path.basename(path) for path in tagged_weekly_paths]
+
+    if tagged_weekly_paths:
+        print("Updating the frequencies...")
+        with measure("ingest_daily", unit="weeks", step="freq") as record:
+            update_freq(tagged_weekly_paths)
+            record.add(len(tagged_weekly_paths))
+
+        print("Updating the concordances...")
+        with measure("ingest_daily", unit="weeks", step="concordance") as record:
+            update_concordances(tagged_weekly_paths, keywords)
+            record.add(len(tagged_weekly_paths))
+
+        print("Updating the dictionary-based sentiment scores...")
+        with measure("ingest_daily", unit="weeks", step="dict_SA") as record:
+            update_dict_SA(tagged_weekly_names, keywords)
+            record.add(len(tagged_weekly_names))
+
+        if run_bert:
+            print("Updating the BERT-based sentiment scores...")
+            with measure("ingest_daily", unit="weeks", step="bert_SA") as record:
+                update_bert_SA(tagged_weekly_names, keywords)
+                record.add(len(tagged_weekly_names))
+
+    print("Updating the press counts and the corpus sizes...")
+    with measure("ingest_daily", unit="weeks", step="corpus_stats") as record:
+        update_corpus_stats(weeks)
+        record.add(len(weeks))
+
+    print("Done!")
+
+    return weeks
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="ingest_daily",
+                                    description="Add new daily corpus files and update the aggregates of their weeks")
+
+    parser.add_argument('-c',
+                        '--cleaned',
+                        nargs='*',
+                        default=[],
+                        dest='cleaned',
+                        help="New daily files of the cleaned corpus")
+    parser.add_argument('-t',
+                        '--tagged',
+                        nargs='*',
+                        default=[],
+                        dest='tagged',
+                        help="New daily files of the tagged corpus")
+    parser.add_argument('--skip_bert',
+                        action='store_true',
+                        dest='skip_bert',
+                        help="Do not update the BERT-based sentiment scores")
+    parser.add_argument('-d',
+                        '--debugging',
+                        action='store_true',
+                        dest='debugging')
+
+    arguments = parser.parse_args()
+
+    set_debug(arguments.debugging)
+
+    ingest(arguments.cleaned, arguments.tagged, run_bert=not arguments.skip_bert)
@@ -0,0 +1,148 @@
+# coding: utf-8
+
+"""instrument.py
+
+Record the wall time, the items processed, the throughput, and the peak memory of the stages as JSON lines.
+
+A stage, or a file within a stage, is measured with:
+
+    with measure("get_freq", unit="tokens", file=path) as record:
+        ...
+        record.add(len(tokens))
+
+and, when the block exits, a line like the following is appended to METRICS_PATH:
+
+    {"stage": "get_freq", "file": "2022.03.07_wkly.tsv", "seconds": 0.41, "items": 120394, "unit": "tokens",
+     "throughput": 293644.2, "peak_rss_mb": 212.5, "pid": 4242, "time": "2022-08-10T12:00:00"}
+
+Each record is a single write to a file opened in append mode, so the workers of a process pool can record their
+files to the same log. The path is taken from the environment variable COVID_PRESS_METRICS, and recording is turned
+off by setting it to an empty string.
+
+Debugging output in the hot paths is guarded by the module flag DEBUG, e.g., "if instrument.DEBUG: ic(token)", so that
+it costs a single attribute check when disabled instead of a call to ic.
+
+Author: Gyu-min Lee
+his.nigel at gmail dot com
+"""
+
+import datetime
+import json
+import os
+import resource
+import sys
+import time
+
+from typing import Optional
+
+try:
+    from icecream import ic
+except ImportError:  # Graceful fallback if IceCream isn't installed.
+    ic = lambda *a: None if not a else (a[0] if len(a) == 1 else a)  # noqa
+    ic.enable = ic.disable = lambda: None
+
+METRICS_PATH = os.environ.get("COVID_PRESS_METRICS", "./logs/metrics.jsonl")
+
+DEBUG = False
+
+def set_debug(enabled: bool) -> None:
+    """turn the debugging output on or off, for ic and for the hot paths guarded by DEBUG
+
+    Params:
+        enabled(bool): whether to print the debugging output
+    """
+    global DEBUG
+
+    DEBUG = enabled
+
+    if enabled:
+        ic.enable()
+    else:
+        ic.disable()
+
+def get_peak_rss() -> float:
+    """get the peak resident set size of the process and its finished children, in MB
+
+    Returns:
+        float: the peak RSS in MB
+    """
+
+    scale = 1024 * 1024 if sys.platform == "darwin" else 1024 # ru_maxrss is in bytes on macOS, KB on Linux
+
+    peak = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+                resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+
+    return peak * scale / (1024 * 1024)
+
+def write_record(record: dict, path: Optional[str] = None) -> None:
+    """append the record to the metrics log as a JSON line
+
+    Params:
+        record(dict): the record
+        path(Optional[str]): the log. Defaults to METRICS_PATH
+    """
+
+    path = METRICS_PATH if path is None else path
+
+    if not path:
+        return
+
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    line = json.dumps(record, ensure_ascii=False) + '\n'
+
+    with open(path, 'a') as file:
+        file.write(line)
+
+class measure:
+    """Context manager measuring a stage, or a file within a stage
+
+    Params:
+        stage(str): the name of the stage
+        unit(str): what the items are, e.g., articles, tokens, or lines
+        file(Optional[str]): the file being processed, if measuring a file
+        **extra: other fields to record
+    """
+
+    def __init__(self, stage: str, unit: str = "items", file: Optional[str] = None, **extra):
+        self.stage = stage
+        self.unit = unit
+        self.file = file
+        self.extra = extra
+        self.items = 0
+        self.seconds = None
+
+    def add(self, items: int = 1) -> None:
+        """count the items processed"""
+
+        self.items += items
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.seconds = time.perf_counter() - self._start
+
+        record = {"stage": self.stage}
+        if self.file is not None:
+            record["file"] = os.path.basename(self.file)
+        record.update({
+            "seconds": round(self.seconds, 6),
+            "items": self.items,
+            "unit": self.unit,
+            "throughput": round(self.items / self.seconds, 3) if self.seconds > 0 else None,
+            "peak_rss_mb": round(get_peak_rss(), 1),
+            "pid": os.getpid(),
+            "time": datetime.datetime.now().isoformat(timespec="seconds"),
+        })
+        record.update(self.extra)
+        if exc_type is not None:
+            record["error"] = exc_type.__name__
+
+        write_record(record)
+
+        return False
@@ -5,7 +5,7 @@
 
 This script performs a sentimental analysis over a Korean text using the KOSAC sentiment dictionary.
 
-The script considers up to trigram and calculate the sentiment score for the input string.
+The script considers up to trigram by default (any n with the level option) and calculate the sentiment score for the input string.
 
 KOSAC dictionary is announced with: 
     Shin, Hyopil, Munhyong Kim, Yu-Mi Jo, Hayeon Jang, and Andrew Cattle. 2013. KOSAC(Korean Sentiment Analysis Corpus): 
@@ -18,17 +18,27 @@ his.nigel at gmail dot com
 """
 
 import argparse
+import functools
+import itertools
+import os
+import pickle
 
+from array import array
+
+import numpy as np
 import pandas as pd
 
-from typing import Optional
+from typing import Iterable, Optional, Union
 
 from konlpy import tag
 
+import instrument
+
 try:
     from icecream import ic
 except ImportError:  # Graceful fallback if IceCream isn't installed.
     ic = lambda *a: None if not a else (a[0] if len(a) == 1 else a)  # noqa
+    ic.enable = ic.disable = lambda: None
 
 ic.disable() # ic is disabled by default UNLESS the main function calls for the debugging mode
 
@@ -110,6 +120,171 @@ def load_sentiment_dictionary(filename:str = "./polarity.csv") -> dict:
     
     return result
 
+LEXICON_CACHE_VERSION = 2
+
+class SentimentLexicon:
+
+    """Compiled sentiment dictionary
+
+    The three lists of load_sentiment_dictionary() are compiled into a single hash table which maps each n-gram, written
+    as in "polarity.csv" (e.g., "가/JKS;나쁘/VA"), to its sentiment score. A lookup is therefore O(1) regardless of the
+    size of the dictionary, instead of up to three linear scans over the lists.
+
+    An n-gram listed under more than one category keeps the score of the category checked first by the list-based
+    evaluation: positive, neutral, and then negative.
+
+    The n-grams are also indexed as a trie of their tokens, so that every n-gram starting at a position of a sentence
+    can be found by walking the trie along the following tokens (see scan_ngrams()).
+
+    Attributes
+    ------------
+    polarity : dict{str: int}
+        n-gram and its sentiment score
+    trie : dict{str: list}
+        token and a [score, children] pair, where score is None if the path so far is not an n-gram of the dictionary
+    max_level : int
+        the longest n of the n-grams in the dictionary
+    source_stamp : Optional[tuple]
+        size and modification time of the file the lexicon was compiled from
+    """
+
+    def __init__(self, positive:list = [], neutral:list = [], negative:list = []):
+        self.polarity = dict()
+        self.trie = dict()
+        self.max_level = 0
+        self.source_stamp = None
+
+        for score, ngrams in ((1, positive), (0, neutral), (-1, negative)):
+            for ngram in ngrams:
+                if not isinstance(ngram, str): # empty cells are read as NaN
+                    continue
+                if ngram not in self.polarity:
+                    self.polarity[ngram] = score
+                    self._insert(ngram.split(";"), score)
+
+    def _insert(self, tokens:list, score:int) -> None:
+        node = self.trie
+        for token in tokens[:-1]:
+            node = node.setdefault(token, [None, dict()])[1]
+        node.setdefault(tokens[-1], [None, dict()])[0] = score
+        self.max_level = max(self.max_level, len(tokens))
+
+    @classmethod
+    def from_dictionary(cls, sent_dict:dict):
+
+        """Compile the dictionary of lists as load_sentiment_dictionary() outputs"""
+
+        return cls(sent_dict["pos"], sent_dict["neut"], sent_dict["neg"])
+
+    def lookup(self, ngram:str) -> Optional[int]:
+
+        """Return the sentiment score of the n-gram, or None if it is not in the dictionary"""
+
+        return self.polarity.get(ngram)
+
+    def __getitem__(self, category:str) -> frozenset:
+
+        """Return the n-grams of a category keyed as in load_sentiment_dictionary()"""
+
+        score = {"pos": 1, "neut": 0, "neg": -1}[category]
+
+        return frozenset(ngram for ngram, value in self.polarity.items() if value == score)
+
+    def __contains__(self, ngram:str) -> bool:
+        return ngram in self.polarity
+
+    def __len__(self) -> int:
+        return len(self.polarity)
+
+    def save(self, filename:str) -> None:
+
+        """Serialize the lexicon into a binary cache file
+        
+        The file is written to a temporary name first and then renamed so that a concurrent reader never sees a
+        partially written cache.
+        """
+
+        temp_filename = f"{filename}.{os.getpid()}.tmp"
+        with open(temp_filename, "wb") as file:
+            pickle.dump((LEXICON_CACHE_VERSION, self), file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_filename, filename)
+
+    @classmethod
+    def load(cls, filename:str):
+
+        """Load a lexicon serialized with save()
+
+        Raises
+        ---------
+        ValueError
+            if the file is not a lexicon cache of the current version
+        """
+
+        with open(filename, "rb") as file:
+            try:
+                version, lexicon = pickle.load(file)
+            except (pickle.UnpicklingError, EOFError, TypeError, ValueError, AttributeError):
+                raise ValueError(f"{filename} is not a sentiment lexicon cache")
+        
+        if version != LEXICON_CACHE_VERSION or not isinstance(lexicon, cls):
+            raise ValueError(f"{filename} is not a sentiment lexicon cache of version {LEXICON_CACHE_VERSION}")
+
+        return lexicon
+
+def get_file_stamp(filename:str) -> tuple:
+    
+    """Return the size and the modification time of the file, used to tell whether a cache is stale"""
+
+    stat = os.stat(filename)
+
+    return (stat.st_size, stat.st_mtime_ns)
+
+def load_sentiment_lexicon(filename:str = "./polarity.csv", cache_filename:Optional[str] = None) -> SentimentLexicon:
+
+    """Load a compiled sentiment lexicon
+
+    The dictionary file is parsed with load_sentiment_dictionary() only once. The compiled lexicon is cached next to it 
+    (or to "cache_filename") and reused on later runs for as long as the dictionary file is not modified.
+
+    Parameters
+    -------------
+    filename : str
+        The name of the dictionary file
+    cache_filename : Optional[str]
+        The name of the binary cache file. Defaults to "filename" followed by ".lexicon"
+    
+    Returns
+    ------------
+    SentimentLexicon
+        The compiled lexicon
+    """
+
+    if cache_filename is None:
+        cache_filename = filename + ".lexicon"
+
+    try:
+        source_stamp = get_file_stamp(filename)
+    except OSError:
+        source_stamp = None # load_sentiment_dictionary() below reports the missing file
+
+    if source_stamp is not None and os.path.exists(cache_filename):
+        try:
+            lexicon = SentimentLexicon.load(cache_filename)
+            if lexicon.source_stamp == source_stamp:
+                return lexicon
+        except (OSError, ValueError):
+            pass # a stale or broken cache is simply rebuilt
+
+    lexicon = SentimentLexicon.from_dictionary(load_sentiment_dictionary(filename))
+    lexicon.source_stamp = source_stamp
+
+    try:
+        lexicon.save(cache_filename)
+    except OSError:
+        pass # caching is an optimization; a read-only location is not an error
+
+    return lexicon
+
 def tokenize(sentence: str = "", tagger = tag.Mecab) -> str:
 
 
@@ -131,7 +306,7 @@ def tokenize(sentence: str = "", tagger = tag.Mecab) -> str:
     sentence : str
         The sentence to tokenize
     tagger : konlpy.tag.Tagger
-        The tagger to use from konlpy
+        The tagger to use from konlpy, either the class or an instance of it
 
     Returns
     -------------
@@ -139,7 +314,10 @@ def tokenize(sentence: str = "", tagger = tag.Mecab) -> str:
         The tokenized, linear sentence. For example, "동해물과 백두산이" would be "동해/NNP 물/NNG 과/JC..."
     """
 
-    pos_tagger = tagger()
+    if isinstance(tagger, type):
+        pos_tagger = tagger()
+    else:
+        pos_tagger = tagger
 
     sentence_pos_tagged = pos_tagger.pos(sentence)
 
@@ -158,8 +336,8 @@ def evaluate(sent_dict, token: str = "") -> Optional[int]:
     
     Parameters
     ------------
-    sent_dict : dict
-        sentiment dictionary as load_sentiment_dictionary outputs
+    sent_dict : Union[SentimentLexicon, dict]
+        sentiment lexicon as load_sentiment_lexicon outputs, or dictionary as load_sentiment_dictionary outputs
     token : str
         token to analyze. A unigram, bigram, or trigram.
     
@@ -169,9 +347,12 @@ def evaluate(sent_dict, token: str = "") -> Optional[int]:
         sentiment score. Return value is None if no match was found.
     """
 
-    ic(token)
+    if instrument.DEBUG: # checked before the call, so the hot path costs nothing when not debugging
+        ic(token)
 
-    if token in sent_dict["pos"]:
+    if isinstance(sent_dict, SentimentLexicon):
+        sentiment_score = sent_dict.lookup(token)
+    elif token in sent_dict["pos"]:
         sentiment_score = 1
     elif token in sent_dict["neut"]:
         sentiment_score = 0
@@ -182,140 +363,396 @@ def evaluate(sent_dict, token: str = "") -> Optional[int]:
 
     return sentiment_score
 
-def analyze_unigram(sent_dict, sentence:str = "", checked_tokens:list = []) -> tuple[int, list]:
-    
-    """Analyze the sentence on the basis of unigram
+def scan_ngrams(sent_dict:SentimentLexicon, tokens:list, level:int = 3) -> list:
+
+    """Find every n-gram of the dictionary in the tokens, up to the level, in a single left-to-right scan
+
+    At each position the trie of the lexicon is walked along the following tokens, so the scan takes at most "level"
+    steps per token no matter how large the dictionary is.
 
     Parameters
     ---------
-    sent_dict : dict
-        sentiment dictionary as load_sentiment_dictionary() outputs
-    sentence : str
-        sentence to analyze the sentiment
-    checked_tokens : list
-        tokens already checked. Items should be unigram with PoS tag
-    
+    sent_dict : SentimentLexicon
+        sentiment lexicon as load_sentiment_lexicon() outputs
+    tokens : list
+        tokens of the sentence, each with PoS tag
+    level : int
+        the longest n of the n-grams to find
+
     Returns
     ---------
-    int
-        sentiment score
     list
-        list of unigrams checked in this method
-    """    
+        list of (n, start, score) for every match, ordered by the start and then by n
+    """
 
-    sentiment_score = 0
-    tokens_checked_here = list() 
+    hits = list()
+    trie = sent_dict.trie
+    num_tokens = len(tokens)
 
-    for token in sentence.split(' '):
-        if token in checked_tokens:
-            continue
-        else:
-            ic()
-            token_score = ic(evaluate(sent_dict, token))
-            if token_score != None:
-                sentiment_score += token_score
-                tokens_checked_here.append(token)
+    for start in range(num_tokens):
+        node = trie
+        for idx in range(start, min(start + level, num_tokens)):
+            entry = node.get(tokens[idx])
+            if entry is None:
+                break
+            score, node = entry
+            if score is not None:
+                hits.append((idx - start + 1, start, score))
 
+    return hits
 
-    return sentiment_score, tokens_checked_here
+def score_ngrams(sent_dict:SentimentLexicon, sentence:str = "", level:int = 3) -> int:
+
+    """Score the sentence with the n-grams of the dictionary, longer n-grams first
+
+    The priority is the one of the original passes over trigrams, bigrams, and unigrams, generalized to any level: 
+    every match of the longest n counts; a match of a shorter n is skipped only if all of its tokens already appear in 
+    a counted match of a longer n. As in those passes, tokens are compared by their form and tag, not by position, so a 
+    token matched anywhere in the sentence shadows the same token elsewhere in the sentence.
 
-def analyze_bigram(sent_dict, sentence:str = "", checked_tokens:list = []) -> tuple[int, list]:
-    
-    """Analyze the sentence on the basis of bigram
-    
     Parameters
     ---------
-    sent_dict : dict
-        sentiment dictionary as load_sentiment_dictionary() outputs
+    sent_dict : SentimentLexicon
+        sentiment lexicon as load_sentiment_lexicon() outputs
     sentence : str
-        sentence to analyze the sentiment
-    
+        PoS tagged sentence to analyze the sentiment
+    level : int
+        the depth of the n-gram
+
     Returns
     ---------
     int
         sentiment score
-    list
-        list of unigrams checked in this method
     """
-    
-    sentiment_score = 0
-    tokens_checked_here = list()
 
     tokens = sentence.split(' ')
+    hits = scan_ngrams(sent_dict, tokens, level)
+    if instrument.DEBUG:
+        ic(hits)
 
-    for idx in range(len(tokens)-1):
+    if not hits:
+        return 0
 
-        if tokens[idx] in checked_tokens and tokens[idx+1] in checked_tokens:
-            continue
-        else:
-            ic()
-            bigram = tokens[idx] + ";" + tokens[idx+1]
-            
-            bigram_score = ic(evaluate(sent_dict, bigram))
-            if bigram_score != None:
-                sentiment_score += bigram_score
-                tokens_checked_here.append(tokens[idx])
-                tokens_checked_here.append(tokens[idx+1]) 
-    
-    return sentiment_score, tokens_checked_here
+    hits_by_level = [list() for _ in range(level + 1)]
+    for n, start, score in hits:
+        hits_by_level[n].append((start, score))
 
-def analyze_trigram(sent_dict, sentence:str = "", checked_tokens:list = []) -> tuple[int, list]:
+    sentiment_score = 0
+    checked_tokens = set()
+
+    for n in range(level, 0, -1):
+        tokens_checked_here = set()
+        for start, score in hits_by_level[n]:
+            window = tokens[start:start + n]
+            if checked_tokens.issuperset(window):
+                continue
+            sentiment_score += score
+            tokens_checked_here.update(window)
+        checked_tokens |= tokens_checked_here
+
+    return sentiment_score
+
+class SentimentAnalyzer:
+
+    """Reusable sentiment analyzer
+
+    The tagger and the sentiment lexicon are loaded once, when the analyzer is created, and reused for every sentence. 
+    Create one analyzer per process and call analyze() or analyze_many() as many times as needed.
 
-    """Analyze the sentence on the basis of trigram
-    
     Parameters
-    ---------
-    sent_dict : dict
-        sentiment dictionary as load_sentiment_dictionary() outputs
-    sentence : str
-        sentence to analyze the sentiment
-    
-    Returns
-    ---------
-    int
-        sentiment score
-    list
-        list of unigrams checked in this method
+    -----------
+    level : int
+        the depth of the n-gram. A positive integer; 3 considers up to trigrams
+    sent_dict_filename : str
+        path to the sentiment dictionary
+    tagger : str
+        name of the tagger to use
+    no_tagging : bool
+        if True, sentences are expected to be PoS tagged already
     """
 
-    sentiment_score = 0
-    tokens_checked_here = list()
+    def __init__(self, level:int = 3, sent_dict_filename:str = "./polarity.csv", tagger:str = "mecab", 
+                    no_tagging:bool = False):
 
-    tokens = sentence.split(' ')
+        if level < 1:
+            raise ValueError("Level must be a positive integer")
+
+        self.level = level
+        self.no_tagging = no_tagging
+        self.tagger = determine_tagger(tagger)
+        self.sent_dict = load_sentiment_lexicon(sent_dict_filename)
+        self._pos_tagger = None
+
+    def tokenize(self, sentence:str = "") -> str:
+
+        """Tokenize the sentence with a tagger instantiated only once"""
+
+        if self._pos_tagger is None:
+            self._pos_tagger = self.tagger()
+
+        return tokenize(sentence, self._pos_tagger)
 
-    for idx in range(len(tokens)-2):
+    def analyze(self, sentence:str = "") -> int:
+
+        """Analyze the sentence
+        
+        Parameters
+        -----------
+        sentence : str
+            sentence to analyze the sentiment
         
-        if tokens[idx] in checked_tokens and tokens[idx+1] in checked_tokens and tokens[idx+2] in checked_tokens:
-            continue
+        Returns
+        ---------
+        int
+            sentiment score of the sentence
+        """
+
+        if self.no_tagging:
+            tokenized_sentence = sentence
         else:
-            ic()
-
-            trigram = tokens[idx] + ";" + tokens[idx+1] + ";" + tokens[idx+2]
-            
-            trigram_score = ic(evaluate(sent_dict, trigram))
-            if trigram_score != None:
-                sentiment_score += trigram_score
-                tokens_checked_here.append(tokens[idx])
-                tokens_checked_here.append(tokens[idx+1])                
-                tokens_checked_here.append(tokens[idx+2])                
+            tokenized_sentence = self.tokenize(sentence)
+        
+        score = score_ngrams(self.sent_dict, tokenized_sentence, self.level)
+        
+        return score
+
+    def analyze_many(self, sentences:Iterable[str]) -> np.ndarray:
+
+        """Analyze the sentences in a batch
+        
+        Parameters
+        -----------
+        sentences : Iterable[str]
+            sentences to analyze the sentiment, e.g., lines of a concordance file
+        
+        Returns
+        ---------
+        np.ndarray
+            sentiment scores of the sentences, in the input order
+        """
+
+        return np.fromiter((self.analyze(sentence) for sentence in sentences), dtype=np.int64)
+
+@functools.lru_cache(maxsize=None)
+def get_analyzer(level:int = 3, sent_dict_filename:str = "./polarity.csv", tagger:str = "mecab", 
+                    no_tagging:bool = False) -> SentimentAnalyzer:
     
-    return sentiment_score, tokens_checked_here
+    """Return the analyzer for the settings, creating it only on the first call in the process"""
+
+    return SentimentAnalyzer(level, sent_dict_filename, tagger, no_tagging)
+
+class VectorizedAnalyzer:
+
+    """Sentiment analyzer for PoS tagged sentences, scoring whole batches with NumPy
+
+    The scores are exactly those of SentimentAnalyzer.analyze() with no_tagging=True, computed over arrays instead of
+    one sentence at a time:
+
+    - the tokens of the lexicon n-grams get ids from 1; every other token gets 0 and never matches
+    - the unigrams are scored through a dense array indexed by the token id
+    - a longer n-gram is encoded as a single int64 in base (number of ids), and the n-grams of the sentences are matched
+      against the sorted codes of the lexicon with np.searchsorted
+    - the priority of score_ngrams() is kept by encoding each token of a counted n-gram with its sentence id, so that a 
+      shorter n-gram is skipped when all of its (sentence, token) codes were counted at a longer n
+
+    Parameters
+    -----------
+    level : int
+        the depth of the n-gram. A positive integer; 3 considers up to trigrams
+    sent_dict_filename : str
+        path to the sentiment dictionary
+    """
+
+    def __init__(self, level:int = 3, sent_dict_filename:str = "./polarity.csv"):
+
+        if level < 1:
+            raise ValueError("Level must be a positive integer")
+
+        self.level = level
+        self.sent_dict = load_sentiment_lexicon(sent_dict_filename)
+
+        ngrams = [(ngram.split(";"), score) for ngram, score in self.sent_dict.polarity.items()]
+        ngrams = [(tokens, score) for tokens, score in ngrams if len(tokens) <= level]
+
+        self.token_ids = dict()
+        for tokens, _ in ngrams:
+            for token in tokens:
+                self.token_ids.setdefault(token, len(self.token_ids) + 1)
+        self.radix = len(self.token_ids) + 1
+
+        if self.radix ** level >= 2 ** 63:
+            raise ValueError(f"Level {level} is too deep to encode the n-grams of the dictionary as int64")
+
+        self.has_unigram = np.zeros(self.radix, dtype=bool)
+        self.unigram_scores = np.zeros(self.radix, dtype=np.int64)
+
+        codes = [list() for _ in range(level + 1)]
+        scores = [list() for _ in range(level + 1)]
+
+        for tokens, score in ngrams:
+            if len(tokens) == 1:
+                self.has_unigram[self.token_ids[tokens[0]]] = True
+                self.unigram_scores[self.token_ids[tokens[0]]] = score
+            else:
+                code = 0
+                for token in tokens:
+                    code = code * self.radix + self.token_ids[token]
+                codes[len(tokens)].append(code)
+                scores[len(tokens)].append(score)
+
+        self.ngram_codes = list()
+        self.ngram_scores = list()
+        self.ngram_heads = list() # whether each token id starts an n-gram of the dictionary, for n >= 2
+        for n in range(level + 1):
+            order = np.argsort(np.array(codes[n], dtype=np.int64))
+            self.ngram_codes.append(np.array(codes[n], dtype=np.int64)[order])
+            self.ngram_scores.append(np.array(scores[n], dtype=np.int64)[order])
+            self.ngram_heads.append(np.zeros(self.radix, dtype=bool))
+            if n > 1:
+                self.ngram_heads[n][self.ngram_codes[n] // self.radix ** (n - 1)] = True
+
+    def encode(self, sentences:Iterable[str]) -> tuple:
+
+        """Encode the PoS tagged sentences into token ids
+
+        Parameters
+        -----------
+        sentences : Iterable[str]
+            PoS tagged sentences, tokens separated by a space
+
+        Returns
+        ---------
+        (np.ndarray, np.ndarray)
+            the token ids of all the sentences, concatenated, and the number of tokens of each sentence
+        """
+
+        get = self.token_ids.get
+        token_ids = array('q')
+        lengths = array('q')
+
+        for sentence in sentences:
+            tokens = sentence.split(' ')
+            token_ids.extend([get(token, 0) for token in tokens])
+            lengths.append(len(tokens))
+
+        return np.frombuffer(token_ids, dtype=np.int64), np.frombuffer(lengths, dtype=np.int64)
+
+    def find_ngrams(self, n:int, token_ids:np.ndarray, sentence_ids:np.ndarray) -> tuple:
+
+        """Find the n-grams of the dictionary, for a single n, within the sentences
+        
+        Returns
+        ---------
+        (np.ndarray, np.ndarray)
+            the start positions of the matches, and their scores
+        """
+
+        if n == 1:
+            starts = np.flatnonzero(self.has_unigram[token_ids])
+            return starts, self.unigram_scores[token_ids[starts]]
+
+        codes = self.ngram_codes[n]
+        num_windows = len(token_ids) - n + 1
+
+        if len(codes) == 0 or num_windows <= 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+
+        starts = np.flatnonzero(self.ngram_heads[n][token_ids[:num_windows]]) # windows starting as an n-gram does
+        starts = starts[sentence_ids[starts] == sentence_ids[starts + n - 1]]
+
+        window_codes = token_ids[starts]
+        for k in range(1, n):
+            window_codes = window_codes * self.radix + token_ids[starts + k]
+
+        idx = np.minimum(np.searchsorted(codes, window_codes), len(codes) - 1)
+        matched = codes[idx] == window_codes
+
+        return starts[matched], self.ngram_scores[n][idx[matched]]
+
+    def score_ids(self, token_ids:np.ndarray, lengths:np.ndarray) -> np.ndarray:
+
+        """Score encoded sentences as encode() outputs
+
+        Returns
+        ---------
+        np.ndarray
+            sentiment scores of the sentences
+        """
+
+        sentence_ids = np.repeat(np.arange(len(lengths), dtype=np.int64), lengths)
+        scores = np.zeros(len(lengths), dtype=np.int64)
+        checked = np.zeros(0, dtype=np.int64) # (sentence, token) codes of the counted n-grams
+
+        for n in range(self.level, 0, -1):
+            starts, hit_scores = self.find_ngrams(n, token_ids, sentence_ids)
+            if len(starts) == 0:
+                continue
+
+            positions = starts[:, None] + np.arange(n)
+            keys = sentence_ids[positions] * self.radix + token_ids[positions]
+            counted = ~np.isin(keys, checked).all(axis=1)
+
+            np.add.at(scores, sentence_ids[starts[counted]], hit_scores[counted])
+            if n > 1:
+                checked = np.concatenate([checked, keys[counted].ravel()])
+
+        return scores
+
+    def analyze_many(self, sentences:Iterable[str], batch_size:int = 100000) -> np.ndarray:
+
+        """Analyze the PoS tagged sentences in batches
+
+        Parameters
+        -----------
+        sentences : Iterable[str]
+            PoS tagged sentences to analyze the sentiment, e.g., lines of a concordance file
+        batch_size : int
+            the number of sentences scored at once, bounding the memory used
+        
+        Returns
+        ---------
+        np.ndarray
+            sentiment scores of the sentences, in the input order
+        """
+
+        sentences = iter(sentences)
+        results = [np.zeros(0, dtype=np.int64)]
+
+        while True:
+            batch = list(itertools.islice(sentences, batch_size))
+            if not batch:
+                break
+            results.append(self.score_ids(*self.encode(batch)))
+
+        return np.concatenate(results)
+
+@functools.lru_cache(maxsize=None)
+def get_vectorized_analyzer(level:int = 3, sent_dict_filename:str = "./polarity.csv") -> VectorizedAnalyzer:
+
+    """Return the vectorized analyzer for the settings, creating it only on the first call in the process"""
+
+    return VectorizedAnalyzer(level, sent_dict_filename)
 
 def analyze(sentence:str= "", level:int=3, sent_dict_filename:str="./polarity.csv", 
                 tagger:str="mecab", no_tagging:bool=False) -> int:
 
     """Analyze the sentence
     
-    This is the function to actually analyze the sentence.
+    A thin wrapper around SentimentAnalyzer. The analyzer for the same settings is reused across calls, so the 
+    dictionary is loaded only once per process.
     
     Parameters
     -----------
     sentence : str
         sentence to analyze the sentiment
+    level : int
+        the depth of the n-gram. A positive integer; 3 considers up to trigrams
     sent_dict_filename : str
         path to the sentiment dictionary
     tagger : str
         name of the tagger to use
+    no_tagging : bool
+        if True, the sentence is expected to be PoS tagged already
     
     Returns
     ---------
@@ -323,38 +760,7 @@ def analyze(sentence:str= "", level:int=3, sent_dict_filename:str="./polarity.cs
         sentiment score of the sentence
     """
 
-    score = 0
-
-    tagger = determine_tagger(tagger)
-    sent_dict = load_sentiment_dictionary(sent_dict_filename)
-    
-    if no_tagging:
-        tokenized_sentence = sentence
-    else:
-        tokenized_sentence = tokenize(sentence, tagger)
-    
-    if level == 3:
-        trigram_score, trigram_checked_list = ic(analyze_trigram(sent_dict, tokenized_sentence))
-        bigram_score, bigram_checked_list = ic(analyze_bigram(sent_dict, tokenized_sentence, trigram_checked_list))
-        bi_tri_checked_list = trigram_checked_list + bigram_checked_list
-        unigram_score, _ = ic(analyze_unigram(sent_dict, tokenized_sentence, bi_tri_checked_list))
-    elif level == 2: 
-        trigram_score = 0
-        trigram_checked_list = list()
-        bigram_score, bigram_checked_list = ic(analyze_bigram(sent_dict, tokenized_sentence, trigram_checked_list))
-        bi_tri_checked_list = trigram_checked_list + bigram_checked_list        
-        unigram_score, _ = ic(analyze_unigram(sent_dict, tokenized_sentence, bi_tri_checked_list))
-    elif level == 1:
-        bigram_score, trigram_score = 0, 0
-        bigram_checked_list, trigram_checked_list = list(), list()
-        bi_tri_checked_list = trigram_checked_list + bigram_checked_list        
-        unigram_score, _ = ic(analyze_unigram(sent_dict, tokenized_sentence, bi_tri_checked_list))
-    else: 
-        assert RuntimeError("Level must be between 1 to 3")
-
-    score = trigram_score + bigram_score + unigram_score
-    
-    return score
+    return get_analyzer(level, sent_dict_filename, tagger, no_tagging).analyze(sentence)
 
 def main(sentence:str = "",
         level:int = 3,
@@ -364,7 +770,7 @@ def main(sentence:str = "",
         debugging:bool = False):
 
     if debugging == True:
-        ic.enable()
+        instrument.set_debug(True)
 
     score = analyze(sentence, level, sent_dict_filename, tagger, no_tagging)
 
@@ -389,7 +795,7 @@ if __name__ == '__main__':
                         dest='level',
                         action='store',
                         default=3,
-                        help="The depth of †he n-gram. An integer between 1 and 3.")
+                        help="The depth of †he n-gram. A positive integer; 3 considers up to trigrams.")
     parser.add_argument('-t',
                         '--tagger',
                         type=str,
@@ -4,30 +4,219 @@
 
 Merge the raw statistics by weekly basis.
 
-Author: Gyu-min Lee 
+The daily statistics are read from ./data/statistics.xlsx only when the file changed since the last run, and are
+otherwise loaded from a columnar cache next to it (Parquet if pyarrow is installed, pickle if not). The dates of 일자 are
+parsed whether they are dates or strings like 2022.03.01, and the columns are made numeric.
+
+The statistics can be resampled with get_stats() to:
+    - daily
+    - weekly, each week from Monday to Sunday labelled with its Monday as the _wkly.tsv files are
+    - monthly, each month labelled with its first day
+by summing the days of each period. Given the directory of the daily corpus files, the periods are aligned to those of
+the corpus aggregates: one row for each period the corpus has files in, in the order of the dates.
+
+The weekly statistics are saved in the results store of results_store.py as health, keyed by the column and the week.
+Write ./data/statistics_wkly.xlsx with export_results.py.
+
+Author: Gyu-min Lee
 his.nigel at gmail dot com
 """
 
+import json
+import os
+
 import pandas as pd
 
-from pandas.tseries.frequencies import to_offset
+from datetime import datetime
+from typing import Optional
+
+from instrument import measure
+from instrument import set_debug
+from merge_texts_by_weeks import get_datetime
+from merge_texts_by_weeks import get_file_paths
+from merge_texts_by_weeks import get_week
+from results_store import ResultsStore
 
 from icecream import ic
 ic.disable()
 
+try:
+    import pyarrow # noqa: F401, the engine of the Parquet cache
+    CACHE_FORMAT = "parquet"
+except ImportError: # the cache is pickled instead
+    CACHE_FORMAT = "pickle"
+
+STATS_PATH = "./data/statistics.xlsx"
+CACHE_PATH = "./data/statistics.parquet"
+CORPUS_ROOT = "./data/COVID19/tagged"
+
+FREQUENCIES = {"daily": "D", "weekly": "W-MON", "monthly": "MS"}
+
+def get_period(date: datetime, frequency: str) -> datetime:
+    """get the label of the period of the date
+
+    Params:
+        date(datetime): the date
+        frequency(str): one of daily, weekly, and monthly
+
+    Returns:
+        datetime: the date itself, the Monday of its week, or the first day of its month
+    """
+
+    if frequency == "daily":
+        return date
+    if frequency == "weekly":
+        return get_week(date)
+    if frequency == "monthly":
+        return date.replace(day=1)
+
+    raise ValueError(f"unknown frequency: {frequency}, should be one of {', '.join(FREQUENCIES)}")
+
+def parse_dates(dates: pd.Series) -> pd.Series:
+    """parse the dates given either as dates or as strings like 2022.03.01
+
+    Params:
+        dates(pd.Series): the dates
+
+    Returns:
+        pd.Series: the dates as datetime64
+    """
+
+    return pd.to_datetime(dates.map(lambda date: date.replace('.', '-') if isinstance(date, str) else date))
+
+def read_stats(path: str = STATS_PATH) -> pd.DataFrame:
+    """read the daily statistics from the spreadsheet
+
+    Params:
+        path(str): path to the spreadsheet
+
+    Returns:
+        pd.DataFrame: the numeric statistics indexed by the date, without 순서. Cells that are not numbers are NaN
+    """
+
+    df = pd.read_excel(path)
+    df['일자'] = parse_dates(df['일자'])
+    df = df.drop(["순서"], axis=1).set_index('일자').sort_index()
+    df = df.apply(pd.to_numeric, errors="coerce")
+
+    return df
+
+def get_cache_path(cache_path: str) -> str:
+    if CACHE_FORMAT == "parquet":
+        return cache_path
+
+    return os.path.splitext(cache_path)[0] + ".pkl"
+
+def get_source_stamp(path: str) -> list:
+    stat = os.stat(path)
+
+    return [stat.st_size, stat.st_mtime_ns]
+
+def load_stats(path: str = STATS_PATH, cache_path: str = CACHE_PATH) -> pd.DataFrame:
+    """load the daily statistics, from the cache unless the spreadsheet changed since it was cached
+
+    Params:
+        path(str): path to the spreadsheet
+        cache_path(str): path to the cache. A record of the cached spreadsheet is saved alongside as .json
+
+    Returns:
+        pd.DataFrame: the numeric statistics indexed by the date
+    """
+
+    cache_path = get_cache_path(cache_path)
+    stamp_path = cache_path + ".json"
+    stamp = get_source_stamp(path)
+
+    try:
+        with open(stamp_path) as file:
+            is_cached = json.load(file) == {"source": stamp, "format": CACHE_FORMAT}
+    except (OSError, ValueError):
+        is_cached = False
+
+    if is_cached and os.path.exists(cache_path):
+        ic(cache_path)
+        if CACHE_FORMAT == "parquet":
+            return pd.read_parquet(cache_path)
+        return pd.read_pickle(cache_path)
+
+    df = read_stats(path)
+
+    if CACHE_FORMAT == "parquet":
+        df.to_parquet(cache_path)
+    else:
+        df.to_pickle(cache_path)
+
+    with open(stamp_path, 'w') as file:
+        json.dump({"source": stamp, "format": CACHE_FORMAT}, file)
+
+    return df
+
+def get_corpus_periods(root: str, frequency: str) -> list:
+    """get the periods the daily corpus files fall in
+
+    Params:
+        root(str): the directory of the daily corpus files
+        frequency(str): one of daily, weekly, and monthly
+
+    Returns:
+        list: the sorted labels of the periods
+    """
+
+    return sorted({get_period(get_datetime(path), frequency) for path in get_file_paths(root)})
+
+def resample_stats(df: pd.DataFrame, frequency: str = "weekly") -> pd.DataFrame:
+    """sum the daily statistics by the periods
+
+    Params:
+        df(pd.DataFrame): the daily statistics indexed by the date
+        frequency(str): one of daily, weekly, and monthly
+
+    Returns:
+        pd.DataFrame: the statistics indexed by the label of each period
+    """
+
+    if frequency not in FREQUENCIES:
+        raise ValueError(f"unknown frequency: {frequency}, should be one of {', '.join(FREQUENCIES)}")
+
+    # the weeks are left-closed and left-labelled, so that a week is labelled with its Monday
+    return df.resample(FREQUENCIES[frequency], closed='left', label='left').sum()
+
+def get_stats(frequency: str = "weekly", corpus_root: Optional[str] = CORPUS_ROOT, path: str = STATS_PATH,
+                cache_path: str = CACHE_PATH) -> pd.DataFrame:
+    """get the statistics by the periods, aligned to those of the corpus
+
+    Params:
+        frequency(str): one of daily, weekly, and monthly
+        corpus_root(Optional[str]): the directory of the daily corpus files. If None, every period of the statistics
+            is kept
+        path(str): path to the spreadsheet
+        cache_path(str): path to the cache
+
+    Returns:
+        pd.DataFrame: the statistics indexed by the label of each period. The periods of the corpus out of the
+            statistics are NaN
+    """
+
+    df = resample_stats(load_stats(path, cache_path), frequency)
+
+    if corpus_root is not None:
+        df = df.reindex(pd.DatetimeIndex(get_corpus_periods(corpus_root, frequency), name=df.index.name))
+
+    return df
+
 def main(do_debug):
-    if do_debug:
-        ic.enable()
-    
-    df = pd.read_excel("./data/statistics.xlsx")
-    df = df.set_index('일자').resample('1W', label='left').sum()
-    df.index = df.index.to_pydatetime()
-    df.index = df.index + to_offset("1D")
-    df = df.drop(["순서"], axis=1)
-    ic(df)
-    df.to_excel("./data/statistics_wkly.xlsx")
+    set_debug(do_debug)
+
+    with measure("merge_stats", unit="rows") as record:
+        df = get_stats("weekly", corpus_root=None)
+        record.add(len(df))
+        ic(df)
+
+        with ResultsStore() as store:
+            store.put("health", [(column, week, value) for column in df.columns for week, value in df[column].items()],
+                        replace=True)
 
 if __name__ == "__main__":
     do_debug = False
 
-    main(do_debug)
\ No newline at end of file
+    main(do_debug)
@@ -4,20 +4,34 @@
 
 Merge the text files based on the date, which is given with its filename.
 
+Daily files are grouped by the (ISO) week of their dates, and each weekly file is named with the Monday of that week.
+The daily files are copied into the weekly file as byte streams, without loading them into memory. A weekly file is 
+rewritten only when the set of its daily files, or any of them, changed since it was last merged, and removed when
+none of its daily files is left.
+
 Author: Gyu-min Lee
 his.nigel at gmail dot com
 """
 
+import json
 import os
 import re
+import shutil
 
 from datetime import datetime
+from datetime import timedelta
+
+from instrument import measure
+from instrument import set_debug
 
-from tqdm import tqdm
+from tqdm.contrib.concurrent import thread_map
 
 from icecream import ic
 ic.disable()
 
+BUFFER_SIZE = 1024 * 1024 # bytes copied at a time
+MANIFEST_NAME = ".merge_manifest.json"
+
 def get_file_paths(root:str, ext:str=".tsv") -> list:
     """grab file paths in a path with certain extension
     
@@ -54,54 +68,220 @@ def get_datetime(name: str) -> datetime:
     
     return date
 
-def main(do_debug):
-    if do_debug:
-        ic.enable()
-    
-    print("Combining the corpus file (cleaned)...")
+def get_week(date: datetime) -> datetime:
+    """get the Monday of the (ISO) week of the date
 
-    os.mkdir("./data/COVID19/cleaned_weekly")
+    Params:
+        date(datetime): the date
 
-    paths = get_file_paths("./data/COVID19/cleaned")
-    
-    ic(paths)
-    
-    for i in tqdm(range(0, len(paths), 7)): 
-        ic(paths[i])
-        combined_path = get_datetime(paths[i])
-        combined_path = combined_path.strftime("%Y.%m.%d")
-        combined_path += "_wkly.tsv"
-        ic(combined_path)
-
-        with open(f"./data/COVID19/cleaned_weekly/{combined_path}", 'w') as file_combined:
-            for j in range(7):
-                with open(paths[i+j]) as file:
-                    file_combined.write(file.read())
-                    file_combined.write("\n")
-    
-    print("Wrote combined files to cleaned_weekly")
+    Returns:
+        datetime: the Monday of the week
+    """
 
-    print("Combining the corpus file (tagged)...")
-    
-    os.mkdir("./data/COVID19/tagged_weekly")
+    return date - timedelta(days=date.weekday())
 
-    paths = get_file_paths("./data/COVID19/tagged")
-    
-    ic(paths)
-
-    for i in tqdm(range(0, len(paths), 7)): 
-        ic(paths[i])
-        combined_path = get_datetime(paths[i])
-        combined_path = combined_path.strftime("%Y.%m.%d")
-        combined_path += "_wkly.tsv"
-        ic(combined_path)
-        with open(f"./data/COVID19/tagged_weekly/{combined_path}", 'w') as file_combined:
-            for j in range(7):
-                with open(paths[i+j]) as file:
-                    file_combined.write(file.read())
-                    file_combined.write("\n")
+def get_weekly_name(week: datetime) -> str:
+    """get the file name of the weekly file for the week
+
+    Params:
+        week(datetime): the Monday of the week
+
+    Returns:
+        str: the file name, e.g., 2022.06.06_wkly.tsv
+    """
+
+    return week.strftime("%Y.%m.%d") + "_wkly.tsv"
+
+def group_by_weeks(paths: list) -> dict:
+    """group the daily file paths by the week of their dates
+
+    Params:
+        paths(list): list of paths to the daily files
+
+    Returns:
+        dict: the Monday of each week and the sorted list of the paths in that week, sorted by the week
+    """
+
+    weeks = dict()
+
+    for path in paths:
+        week = get_week(get_datetime(path))
+        weeks.setdefault(week, list()).append(path)
+
+    weeks = {week: sorted(weeks[week]) for week in sorted(weeks)}
+
+    return weeks
+
+def get_sources_signature(paths: list) -> list:
+    """get the name, size, and modification time of each path
+
+    Params:
+        paths(list): list of paths
+
+    Returns:
+        list: list of [name, size, mtime] for each path
+    """
+
+    signature = list()
+
+    for path in paths:
+        stat = os.stat(path)
+        signature.append([os.path.basename(path), stat.st_size, stat.st_mtime_ns])
+
+    return signature
+
+def load_manifest(root: str) -> dict:
+    """load the record of the daily files each weekly file in the root was merged from
+
+    Params:
+        root(str): the directory of the weekly files
+
+    Returns:
+        dict: the weekly file name and the signature of its daily files
+    """
+
+    try:
+        with open(os.path.join(root, MANIFEST_NAME)) as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return dict()
+
+def save_manifest(root: str, manifest: dict) -> None:
+    """save the record of the daily files each weekly file in the root was merged from
+
+    Params:
+        root(str): the directory of the weekly files
+        manifest(dict): the weekly file name and the signature of its daily files
+    """
+
+    temp_path = os.path.join(root, MANIFEST_NAME + ".tmp")
+    with open(temp_path, 'w') as file:
+        json.dump(manifest, file, ensure_ascii=False, indent=1)
+    os.replace(temp_path, os.path.join(root, MANIFEST_NAME))
+
+def merge_week(target: str, sources: list) -> str:
+    """merge the daily files into the weekly file
+
+    Each daily file is followed by a line feed. The weekly file is written under a temporary name and then renamed, so
+    an interrupted run never leaves a partial weekly file behind.
+
+    Params:
+        target(str): path to the weekly file
+        sources(list): sorted list of paths to the daily files
+
+    Returns:
+        str: the path to the weekly file
+    """
+
+    temp_target = target + ".tmp"
+
+    with measure("merge_texts", unit="bytes", file=target) as record:
+        with open(temp_target, 'wb') as file_combined:
+            for source in sources:
+                with open(source, 'rb') as file:
+                    shutil.copyfileobj(file, file_combined, BUFFER_SIZE)
+                file_combined.write(b"\n")
+            record.add(file_combined.tell())
+
+        os.replace(temp_target, target)
+
+    return target
+
+def plan_merges(source_root: str, target_root: str) -> list:
+    """list the weekly files to be (re)written
+
+    Params:
+        source_root(str): the directory of the daily files
+        target_root(str): the directory of the weekly files
+
+    Returns:
+        list: list of (target path, source paths, signature) for each outdated weekly file
+    """
+
+    manifest = load_manifest(target_root)
+    jobs = list()
+
+    for week, sources in group_by_weeks(get_file_paths(source_root)).items():
+        target = os.path.join(target_root, get_weekly_name(week))
+        signature = get_sources_signature(sources)
+        if os.path.exists(target) and manifest.get(os.path.basename(target)) == signature:
+            continue
+        jobs.append((target, sources, signature))
+
+    return jobs
+
+def plan_removals(source_root: str, target_root: str) -> list:
+    """list the weekly files merged earlier whose daily files were all removed since
+
+    Only the weekly files recorded in the manifest are listed, so the other files in the directory are left alone.
+
+    Params:
+        source_root(str): the directory of the daily files
+        target_root(str): the directory of the weekly files
+
+    Returns:
+        list: list of paths to the stale weekly files, sorted
+    """
+
+    weekly_names = {get_weekly_name(week) for week in group_by_weeks(get_file_paths(source_root))}
+
+    return sorted(os.path.join(target_root, name) for name in load_manifest(target_root) if name not in weekly_names)
+
+def merge_corpora(roots: dict, max_workers: int = 8) -> dict:
+    """merge the daily files of the corpora into weekly files, concurrently across the corpora
+
+    Params:
+        roots(dict): the directory of the daily files and the directory of the weekly files for each corpus
+        max_workers(int): the number of the threads copying the files
+
+    Returns:
+        dict: the directory of the weekly files and the list of the weekly files written there
+    """
+
+    jobs = list()
+    removals = list()
+
+    for source_root, target_root in roots.items():
+        os.makedirs(target_root, exist_ok=True)
+        for target, sources, signature in plan_merges(source_root, target_root):
+            jobs.append((target_root, target, sources, signature))
+        removals.extend((target_root, target) for target in plan_removals(source_root, target_root))
+
+    ic(jobs, removals)
+
+    thread_map(lambda job: merge_week(job[1], job[2]), jobs, max_workers=max_workers, desc="Merging weeks: ")
+
+    written = {target_root: list() for target_root in roots.values()}
+    manifests = {target_root: load_manifest(target_root) for target_root in written}
+
+    for target_root, target, sources, signature in jobs:
+        written[target_root].append(target)
+        manifests[target_root][os.path.basename(target)] = signature
+
+    for target_root, target in removals:
+        if os.path.exists(target):
+            os.remove(target)
+        del manifests[target_root][os.path.basename(target)]
+        print(f"Removed {target}, all of whose daily files are gone")
+
+    for target_root, targets in written.items():
+        if targets or any(root == target_root for root, _ in removals):
+            save_manifest(target_root, manifests[target_root])
+
+    return written
+
+def main(do_debug):
+    set_debug(do_debug)
     
-    print("Wrote combined files to tagged_weekly")
+    print("Combining the corpus files (cleaned and tagged)...")
+
+    with measure("merge_texts", unit="files") as record:
+        written = merge_corpora({"./data/COVID19/cleaned": "./data/COVID19/cleaned_weekly",
+                                "./data/COVID19/tagged": "./data/COVID19/tagged_weekly"})
+        record.add(sum(len(targets) for targets in written.values()))
+
+    for target_root, targets in written.items():
+        print(f"Wrote {len(targets)} combined files to {target_root} (others were up to date)")
 
     return
 
@@ -0,0 +1,186 @@
+# coding: utf-8
+
+"""results_store.py
+
+Keep the results of every stage in a single local SQLite file.
+
+Each result is a value keyed by (metric, keyword, week):
+    - metric: what the value is, e.g., freq_abs, freq_rel, dict_SA, bert_SA, press_count, or health
+    - keyword: the series within the metric, e.g., 코로나/NNP for the frequencies and the sentiment scores, the press
+      for the press counts, or the column of the health statistics. Empty if the metric has a single series
+    - week: the Monday of the week as YYYY-MM-DD, as the _wkly.tsv files are named. Empty for the totals over the corpus
+A stage puts its rows in a single transaction, and a row with the same key replaces the existing one, so the stages
+and ingest_daily.py update the weeks they computed without rewriting the others. The rows of every metric are read
+back as a week by keyword table with get_table(), for joining the metrics on the weeks.
+
+The keywords of a metric keep the order in which they were first put, e.g., the columns of the health statistics or
+the presses from the most frequent, and are read back in that order rather than alphabetically.
+
+The spreadsheets and the CSV files of the results are written from the store on demand with export_results.py.
+
+Author: Gyu-min Lee
+his.nigel at gmail dot com
+"""
+
+import sqlite3
+
+import pandas as pd
+
+from datetime import datetime
+from typing import Iterable, Optional, Union
+from urllib.parse import unquote
+
+STORE_PATH = "./data/results.sqlite3"
+
+def get_week_key(week: Union[datetime, str]) -> str:
+    """get the week of the key from a date, or from a string like 2022-03-07 or 2022.03.07
+
+    Params:
+        week(Union[datetime, str]): the Monday of the week
+
+    Returns:
+        str: the week as YYYY-MM-DD
+    """
+
+    if isinstance(week, str):
+        return week.replace('.', '-')
+
+    return week.strftime("%Y-%m-%d")
+
+def get_keyword(token: str) -> str:
+    """get the keyword in FORM/TAG format from the token in the names of the concordance paths
+
+    Params:
+        token(str): the token, e.g., 코로나_NNP, or 백신_%2A for the pattern 백신/*
+
+    Returns:
+        str: the keyword, e.g., 코로나/NNP
+    """
+
+    return unquote("/".join(token.rsplit("_", 1)))
+
+class ResultsStore:
+    """Results of the stages keyed by (metric, keyword, week) in a local SQLite file
+
+    Params:
+        path(str): path to the SQLite file
+    """
+
+    def __init__(self, path: str = STORE_PATH):
+        self.connection = sqlite3.connect(path, timeout=600) # the stages run concurrently may write at once
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("CREATE TABLE IF NOT EXISTS results "
+                                "(metric TEXT NOT NULL, keyword TEXT NOT NULL, week TEXT NOT NULL, value, "
+                                "PRIMARY KEY (metric, keyword, week)) WITHOUT ROWID")
+        self.connection.execute("CREATE TABLE IF NOT EXISTS series "
+                                "(metric TEXT NOT NULL, keyword TEXT NOT NULL, ordinal INTEGER NOT NULL, "
+                                "PRIMARY KEY (metric, keyword)) WITHOUT ROWID")
+        self.connection.commit()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+        return False
+
+    def put(self, metric: str, rows: Iterable[tuple], replace: bool = False) -> int:
+        """store the rows of the metric, replacing those with the same key
+
+        Params:
+            metric(str): the metric
+            rows(Iterable[tuple]): (keyword, week, value) of each row, the week as a date or a string
+            replace(bool): remove the other rows of the metric with the keywords of the rows first, e.g., when the
+                stage computed all the weeks of the keywords. The keywords then take the order of the rows
+
+        Returns:
+            int: the number of the rows stored
+        """
+
+        rows = [(metric, keyword, get_week_key(week), value.item() if hasattr(value, "item") else value)
+                for keyword, week, value in rows]
+        keywords = list(dict.fromkeys(keyword for _, keyword, _, _ in rows)) # in the order of the rows
+
+        with self.connection:
+            if replace:
+                self.connection.executemany("DELETE FROM results WHERE metric = ? AND keyword = ?",
+                                            [(metric, keyword) for keyword in keywords])
+                self.connection.executemany("DELETE FROM series WHERE metric = ? AND keyword = ?",
+                                            [(metric, keyword) for keyword in keywords])
+            self.connection.executemany("INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?)", rows)
+
+            # the new keywords are ordered after those already in the store
+            start, = self.connection.execute("SELECT COALESCE(MAX(ordinal) + 1, 0) FROM series WHERE metric = ?",
+                                            (metric,)).fetchone()
+            self.connection.executemany("INSERT OR IGNORE INTO series VALUES (?, ?, ?)",
+                                        [(metric, keyword, start + idx) for idx, keyword in enumerate(keywords)])
+
+        return len(rows)
+
+    def delete(self, metric: str, weeks: Optional[list] = None) -> None:
+        """remove the rows of the metric
+
+        Params:
+            metric(str): the metric
+            weeks(Optional[list]): only the rows of the weeks, if given
+        """
+
+        with self.connection:
+            if weeks is None:
+                self.connection.execute("DELETE FROM results WHERE metric = ?", (metric,))
+                self.connection.execute("DELETE FROM series WHERE metric = ?", (metric,))
+            else:
+                self.connection.executemany("DELETE FROM results WHERE metric = ? AND week = ?",
+                                            [(metric, get_week_key(week)) for week in weeks])
+
+    def get(self, metric: str, keyword: Optional[str] = None) -> pd.DataFrame:
+        """get the rows of the metric
+
+        Params:
+            metric(str): the metric
+            keyword(Optional[str]): only the rows of the keyword, if given
+
+        Returns:
+            pd.DataFrame: the keyword, the week, and the value of each row, sorted by the order of the keywords and
+                the week
+        """
+
+        query = ("SELECT results.keyword, week, value FROM results LEFT JOIN series "
+                    "ON series.metric = results.metric AND series.keyword = results.keyword "
+                    "WHERE results.metric = ?")
+        parameters = [metric]
+        if keyword is not None:
+            query += " AND results.keyword = ?"
+            parameters.append(keyword)
+
+        # the keywords put before the order was kept come last, alphabetically
+        query += " ORDER BY ordinal IS NULL, ordinal, results.keyword, week"
+
+        return pd.read_sql_query(query, self.connection, params=parameters)
+
+    def get_table(self, metric: str) -> pd.DataFrame:
+        """get the values of the metric as a table of the weeks by the keywords
+
+        Params:
+            metric(str): the metric
+
+        Returns:
+            pd.DataFrame: the values indexed by the week as datetime, a column for each keyword in their order
+        """
+
+        rows = self.get(metric)
+        table = rows.pivot(index="week", columns="keyword", values="value")
+        table = table[rows["keyword"].unique()] # pivot() sorts the columns
+        table.index = pd.to_datetime(table.index)
+        table.columns.name = None
+
+        return table
+
+    def metrics(self) -> list:
+        """get the metrics in the store"""
+
+        return [metric for metric, in self.connection.execute("SELECT DISTINCT metric FROM results ORDER BY metric")]
+
+    def close(self) -> None:
+        self.connection.close()
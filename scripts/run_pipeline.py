@@ -0,0 +1,420 @@
+# coding: utf-8
+
+"""run_pipeline.py
+
+Run the analysis scripts as a pipeline of stages with incremental rebuilds.
+
+Each stage declares the files it reads and the files it writes as glob patterns relative to the repository root. A
+stage runs after every stage writing its inputs, and stages with no such relation run concurrently, e.g., dict_SA
+alongside bert_SA and get_corpus_stats. A stage is skipped when its outputs exist and its inputs, including its own
+scripts and the modules of ./scripts they import, are unchanged since its last successful run. Inputs are compared by size and mtime, or by the SHA-256 of
+their contents with --checksum.
+
+The corpus_index stage converts the tagged corpus into the token-id format and indexes it (corpus_index.py). With
+--token_corpus, get_freq and concordance are answered from that index instead of the weekly files.
+
+An optional stage, e.g., tag_corpus which overwrites the tagged corpus, runs only when named on the command line. The
+stages save their results in the results store ./data/results.sqlite3 (results_store.py), and the spreadsheets and the
+CSV files are written from it by the optional stage export_results.
+
+The state of the last runs is saved in .pipeline_state.json.
+
+Author: Gyu-min Lee
+his.nigel at gmail dot com
+"""
+
+import argparse
+import ast
+import glob
+import hashlib
+import json
+import os
+import subprocess
+import sys
+
+from concurrent.futures import FIRST_COMPLETED
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import wait
+from fnmatch import fnmatch
+
+from instrument import measure
+from instrument import set_debug
+
+from icecream import ic
+ic.disable()
+
+STATE_PATH = "./.pipeline_state.json"
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+
+def get_script_imports(script:str) -> list:
+    """get the modules of ./scripts the script imports, directly or through the other modules
+
+    The imports within functions are included, e.g., token_corpus imported only with --token_corpus.
+
+    Params:
+        script(str): path to the script, relative to the repository root
+
+    Returns:
+        list: the sorted paths to the imported modules, relative to the repository root
+    """
+
+    own = os.path.splitext(os.path.basename(script))[0]
+    found = set()
+    pending = [own]
+
+    while pending:
+        with open(os.path.join(SCRIPTS_DIR, pending.pop() + ".py"), encoding="utf-8") as file:
+            tree = ast.parse(file.read())
+
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Import):
+                modules = [alias.name for alias in node.names]
+            elif isinstance(node, ast.ImportFrom) and node.level == 0 and node.module:
+                modules = [node.module]
+            else:
+                continue
+
+            for module in modules:
+                module = module.split('.')[0]
+                if module not in found and os.path.exists(os.path.join(SCRIPTS_DIR, module + ".py")):
+                    found.add(module)
+                    pending.append(module)
+
+    return sorted(f"./scripts/{module}.py" for module in found - {own})
+
+class Stage:
+    """A stage of the pipeline
+
+    Params:
+        name(str): the name of the stage
+        command(list): the command to run, relative to the repository root
+        inputs(list): glob patterns of the files the stage reads. The modules the scripts of the command import are
+            added to them
+        outputs(list): glob patterns of the files the stage writes
+        optional(bool): run the stage only when it is named explicitly
+    """
+
+    def __init__(self, name:str, command:list, inputs:list, outputs:list, optional:bool = False):
+        self.name = name
+        self.command = command
+        self.inputs = inputs + [path for script in command if script.endswith(".py")
+                                for path in get_script_imports(script) if path not in inputs]
+        self.outputs = outputs
+        self.optional = optional
+
+    def __repr__(self):
+        return f"Stage({self.name})"
+
+STAGES = [
+    Stage("tag_corpus",
+        ["./scripts/tag_corpus.py"],
+        ["./scripts/tag_corpus.py", "./data/COVID19/cleaned/*.tsv"],
+        ["./data/COVID19/tagged/*.tsv"],
+        optional=True),
+    Stage("merge_stats",
+        ["./scripts/merge_stats_by_weeks.py"],
+        ["./scripts/merge_stats_by_weeks.py", "./data/statistics.xlsx"],
+        ["./data/results.sqlite3"]),
+    Stage("merge_texts",
+        ["./scripts/merge_texts_by_weeks.py"],
+        ["./scripts/merge_texts_by_weeks.py", "./data/COVID19/cleaned/*.tsv", "./data/COVID19/tagged/*.tsv"],
+        ["./data/COVID19/cleaned_weekly/*.tsv", "./data/COVID19/tagged_weekly/*.tsv"]),
+    Stage("corpus_index",
+        ["./scripts/corpus_index.py"],
+        ["./scripts/corpus_index.py", "./data/COVID19/tagged/*.tsv"],
+        ["./data/COVID19/tagged_ids/*.npy"]),
+    Stage("concordance",
+        ["./scripts/get_concordance_per_file_batch.py"],
+        ["./scripts/get_concordance_per_file_batch.py", "./data/COVID19/tagged_weekly/*.tsv",
+            "./data/COVID19/tagged_ids/*.npy"],
+        ["./data/conc_result_*/*.tsv"]),
+    Stage("get_freq",
+        ["./scripts/get_freq.py"],
+        ["./scripts/get_freq.py", "./data/COVID19/tagged_weekly/*.tsv", "./data/COVID19/tagged_ids/*.npy"],
+        ["./data/results.sqlite3"]),
+    Stage("dict_SA",
+        ["./scripts/dict_SA.py"],
+        ["./scripts/dict_SA.py", "./scripts/kosac_sent_analyzer.py", "./polarity.csv", "./data/conc_result_*/*.tsv"],
+        ["./data/results.sqlite3"]),
+    Stage("bert_SA",
+        ["./scripts/bert_SA.py"],
+        ["./scripts/bert_SA.py", "./data/conc_result_*_glued/*.tsv", "./resources/model_save/klue-RoBERTa-base-SA/*"],
+        ["./data/results.sqlite3"]),
+    Stage("corpus_stats",
+        ["./scripts/get_corpus_stats.py"],
+        ["./scripts/get_corpus_stats.py", "./data/COVID19/cleaned/*.tsv", "./data/COVID19/tagged/*.tsv"],
+        ["./data/results.sqlite3"]),
+    Stage("press_breakdown",
+        ["./scripts/get_press_breakdown.py"],
+        ["./scripts/get_press_breakdown.py", "./scripts/kosac_sent_analyzer.py", "./polarity.csv",
+            "./data/COVID19/tagged_weekly/*.tsv"],
+        ["./data/results.sqlite3"]),
+    Stage("export_results",
+        ["./scripts/export_results.py"],
+        ["./scripts/export_results.py", "./data/results.sqlite3"],
+        ["./data/COVID19/tagged_weekly/freq_abs.xlsx", "./data/COVID19/tagged_weekly/freq_rel.xlsx",
+            "./data/conc_result_*/dict_SA_wkly.csv", "./data/conc_result_*_glued/bert_SA_wkly.csv",
+            "./results/press_count_result.xlsx", "./results/press_breakdown_wkly.csv", "./data/statistics_wkly.xlsx"],
+        optional=True),
+    Stage("transfer_entropy",
+        ["./scripts/transfer_entropy.py"],
+        ["./scripts/transfer_entropy.py", "./data/results.sqlite3"],
+        ["./results/TE_wkly.xlsx"],
+        optional=True),
+]
+
+def patterns_overlap(pattern_a:str, pattern_b:str) -> bool:
+    """check whether two glob patterns may match the same file
+
+    Params:
+        pattern_a(str): a glob pattern
+        pattern_b(str): another glob pattern
+
+    Returns:
+        bool: True if either pattern matches the other taken as a path
+    """
+
+    return fnmatch(pattern_a, pattern_b) or fnmatch(pattern_b, pattern_a)
+
+def get_dependencies(stages:list) -> dict:
+    """find the stages each stage depends on, i.e., the stages writing its inputs
+
+    Params:
+        stages(list): list of Stage
+
+    Returns:
+        dict: the stage name and the set of the names of the stages it depends on
+    """
+
+    dependencies = {stage.name: set() for stage in stages}
+
+    for stage in stages:
+        for other in stages:
+            if other is stage:
+                continue
+            if any(patterns_overlap(output, input_) for output in other.outputs for input_ in stage.inputs):
+                dependencies[stage.name].add(other.name)
+
+    return dependencies
+
+def expand(patterns:list) -> list:
+    """expand the glob patterns into the sorted list of files
+
+    Params:
+        patterns(list): glob patterns
+
+    Returns:
+        list: the files matching any of the patterns
+    """
+
+    paths = set()
+
+    for pattern in patterns:
+        paths.update(path for path in glob.glob(pattern) if os.path.isfile(path))
+
+    return sorted(paths)
+
+def get_signature(patterns:list, checksum:bool = False, args:list = None) -> str:
+    """get the signature of the files matching the patterns
+
+    Params:
+        patterns(list): glob patterns
+        checksum(bool): hash the contents of the files instead of their sizes and mtimes
+        args(list): the additional arguments to the command of the stage, so that changing them reruns it
+
+    Returns:
+        str: the hex digest of the signature
+    """
+
+    signature = hashlib.sha256()
+
+    if args:
+        signature.update(json.dumps(args).encode())
+
+    for path in expand(patterns):
+        signature.update(path.encode())
+        if checksum:
+            with open(path, 'rb') as file:
+                for chunk in iter(lambda: file.read(1024 * 1024), b""):
+                    signature.update(chunk)
+        else:
+            stat = os.stat(path)
+            signature.update(f"{stat.st_size}:{stat.st_mtime_ns}".encode())
+
+    return signature.hexdigest()
+
+def load_state(path:str = STATE_PATH) -> dict:
+    try:
+        with open(path) as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return dict()
+
+def save_state(state:dict, path:str = STATE_PATH) -> None:
+    temp_path = path + ".tmp"
+    with open(temp_path, 'w') as file:
+        json.dump(state, file, indent=1)
+    os.replace(temp_path, path)
+
+def is_up_to_date(stage:Stage, signature:str, state:dict) -> bool:
+    """check whether the stage can be skipped
+
+    Params:
+        stage(Stage): the stage
+        signature(str): the current signature of its inputs
+        state(dict): the state of the last runs
+
+    Returns:
+        bool: True if every output pattern has a file and the inputs are unchanged since the last successful run
+    """
+
+    if state.get(stage.name) != signature:
+        return False
+
+    return all(glob.glob(pattern) for pattern in stage.outputs)
+
+def run_stage(stage:Stage, extra_args:list) -> tuple:
+    """run the command of the stage
+
+    Params:
+        stage(Stage): the stage
+        extra_args(list): additional arguments to the command
+
+    Returns:
+        (int, float): the return code and the seconds taken
+    """
+
+    with measure("run_pipeline", unit="stages", step=stage.name) as record:
+        process = subprocess.run([sys.executable] + stage.command + extra_args)
+        record.extra["returncode"] = process.returncode
+        record.add()
+
+    return process.returncode, record.seconds
+
+def run_pipeline(stages:list = STAGES, max_workers:int = 3, force:bool = False, checksum:bool = False,
+                    only:list = None, stage_args:dict = None) -> bool:
+    """run the stages in the order of their dependencies, skipping the stages that are up to date
+
+    Params:
+        stages(list): list of Stage
+        max_workers(int): the number of stages run at the same time
+        force(bool): run every stage regardless of its state
+        checksum(bool): compare the inputs by their contents instead of sizes and mtimes
+        only(list): names of the stages to consider; the other stages are treated as done. If None, all the stages
+            but the optional ones
+        stage_args(dict): the stage name and the additional arguments to its command
+
+    Returns:
+        bool: True if no stage failed
+    """
+
+    stage_args = stage_args or dict()
+    dependencies = get_dependencies(stages)
+    ic(dependencies)
+
+    state = load_state()
+    pending = {stage.name: stage for stage in stages
+                if (only is None and not stage.optional) or (only is not None and stage.name in only)}
+    done = {stage.name for stage in stages if stage.name not in pending}
+    failed = set()
+    running = dict()
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        while pending or running:
+            num_pending = len(pending)
+
+            for name, stage in list(pending.items()):
+                if dependencies[name] & failed:
+                    print(f"[{name}] skipped: an upstream stage failed")
+                    failed.add(name)
+                    del pending[name]
+                elif dependencies[name] <= done:
+                    del pending[name]
+                    signature = get_signature(stage.inputs, checksum, stage_args.get(name))
+                    if not force and is_up_to_date(stage, signature, state):
+                        print(f"[{name}] up to date")
+                        done.add(name)
+                        continue
+                    print(f"[{name}] running: {' '.join(stage.command + stage_args.get(name, []))}")
+                    future = executor.submit(run_stage, stage, stage_args.get(name, []))
+                    running[future] = (stage, signature)
+
+            if not running:
+                if len(pending) == num_pending:
+                    raise RuntimeError(f"Dependency cycle among the stages: {', '.join(pending)}")
+                continue
+
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+
+            for future in finished:
+                stage, signature = running.pop(future)
+                returncode, seconds = future.result()
+                if returncode == 0:
+                    print(f"[{stage.name}] done in {seconds:.1f}s")
+                    state[stage.name] = signature
+                    save_state(state)
+                    done.add(stage.name)
+                else:
+                    print(f"[{stage.name}] failed with return code {returncode}")
+                    state.pop(stage.name, None)
+                    save_state(state)
+                    failed.add(stage.name)
+
+    return not failed
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="run_pipeline",
+                                    description="Run the analysis pipeline, skipping the stages that are up to date")
+
+    parser.add_argument('stages',
+                        metavar='stage',
+                        nargs='*',
+                        help=f"Stages to run, among {', '.join(stage.name for stage in STAGES)}. All but the optional ones (tag_corpus, export_results, transfer_entropy) if none is given")
+    parser.add_argument('-j',
+                        '--jobs',
+                        type=int,
+                        dest='jobs',
+                        default=3,
+                        help="Number of stages run at the same time")
+    parser.add_argument('-f',
+                        '--force',
+                        action='store_true',
+                        dest='force',
+                        help="Run the stages even if they are up to date")
+    parser.add_argument('-c',
+                        '--checksum',
+                        action='store_true',
+                        dest='checksum',
+                        help="Compare the inputs by their contents instead of sizes and mtimes")
+    parser.add_argument('-t',
+                        '--token_corpus',
+                        action='store_true',
+                        dest='token_corpus',
+                        help="Answer get_freq and concordance from the positional index of the corpus_index stage")
+    parser.add_argument('--bert_args',
+                        type=str,
+                        dest='bert_args',
+                        default="",
+                        help="Additional arguments to bert_SA.py, e.g., \"--quantize --workers 8 --threads 8\"")
+    parser.add_argument('-d',
+                        '--debugging',
+                        action='store_true',
+                        dest='debugging')
+
+    arguments = parser.parse_args()
+
+    unknown = set(arguments.stages) - {stage.name for stage in STAGES}
+    if unknown:
+        parser.error(f"unknown stages: {', '.join(sorted(unknown))}")
+
+    set_debug(arguments.debugging)
+
+    succeeded = run_pipeline(max_workers=arguments.jobs,
+                            force=arguments.force,
+                            checksum=arguments.checksum,
+                            only=arguments.stages or None,
+                            stage_args={"bert_SA": arguments.bert_args.split(),
+                                        "get_freq": ["--token_corpus"] if arguments.token_corpus else [],
+                                        "concordance": ["--token_corpus"] if arguments.token_corpus else []})
+
+    sys.exit(0 if succeeded else 1)
@@ -0,0 +1,290 @@
+# coding: utf-8
+
+"""tag_corpus.py
+
+Tag the cleaned corpus with Kiwi into the tagged corpus.
+
+Every field of an article but the press name is tokenized by Kiwi and written as FORM/TAG morphemes spaced by a
+single space, so the PRESS\tTITLE\tARTICLE layout of the cleaned files is kept as is. The articles of each daily file
+are sent in batches to a pool of processes, each with its own Kiwi instance. User words such as 코로나 are added to
+every instance before tagging.
+
+The tagging is resumable per daily file: a file is written under a temporary name and renamed when complete, and the
+sources and the tagger settings of the tagged files are saved in .tag_manifest.json in the tagged directory. A file is
+tagged again only if its cleaned file or the settings (the user words, the user dictionary, or the Kiwi version)
+changed since.
+
+Author: Gyu-min Lee
+his.nigel at gmail dot com
+"""
+
+import argparse
+import hashlib
+import json
+import os
+
+from multiprocessing import Pool
+from typing import Optional
+
+import kiwipiepy
+
+from tqdm import tqdm
+
+from instrument import measure
+from instrument import set_debug
+from merge_texts_by_weeks import get_file_paths
+
+from icecream import ic
+ic.disable()
+
+CLEANED_ROOT = "./data/COVID19/cleaned"
+TAGGED_ROOT = "./data/COVID19/tagged"
+MANIFEST_NAME = ".tag_manifest.json"
+BATCH_SIZE = 64
+
+USER_WORDS = [("코로나", "NNP", 0.0)] # (form, tag, score)
+
+_kiwi = None
+
+def init_worker(user_words: list, user_dict: Optional[str]) -> None:
+    """create the Kiwi instance of the worker process
+
+    Params:
+        user_words(list): list of (form, tag, score) to add
+        user_dict(Optional[str]): path to a Kiwi user dictionary to load
+    """
+    global _kiwi
+
+    _kiwi = kiwipiepy.Kiwi()
+
+    for form, tag, score in user_words:
+        _kiwi.add_user_word(form, tag, score)
+
+    if user_dict is not None:
+        _kiwi.load_user_dictionary(user_dict)
+
+def tag_text(text: str) -> str:
+    """tokenize the text into morphemes in FORM/TAG format
+
+    Params:
+        text(str): the text in natural Korean spacing
+
+    Returns:
+        str: the morphemes spaced by a single space
+    """
+
+    if not text.strip():
+        return text
+
+    return ' '.join(f"{token.form}/{token.tag}" for token in _kiwi.tokenize(text))
+
+def tag_article(article: str) -> str:
+    """tag every field of the article but the press name
+
+    Params:
+        article(str): the article where the press name is separated by a '\t'
+
+    Returns:
+        str: the tagged article in the same layout
+    """
+
+    fields = article.split('\t')
+
+    if len(fields) < 2: # if no metadata available
+        return tag_text(article)
+
+    return '\t'.join([fields[0]] + [tag_text(field) for field in fields[1:]])
+
+def tag_batch(lines: list) -> list:
+    """tag the lines of a daily file, keeping their line feeds
+
+    Params:
+        lines(list): the lines, each an article
+
+    Returns:
+        list: the tagged lines
+    """
+
+    return [tag_article(line[:-1]) + '\n' if line.endswith('\n') else tag_article(line) for line in lines]
+
+def get_settings(user_words: list, user_dict: Optional[str]) -> str:
+    """get the signature of the tagger settings
+
+    Params:
+        user_words(list): list of (form, tag, score)
+        user_dict(Optional[str]): path to a Kiwi user dictionary
+
+    Returns:
+        str: the hex digest of the settings
+    """
+
+    settings = hashlib.sha256()
+    settings.update(kiwipiepy.__version__.encode())
+    settings.update(json.dumps(user_words, ensure_ascii=False).encode())
+
+    if user_dict is not None:
+        with open(user_dict, 'rb') as file:
+            settings.update(file.read())
+
+    return settings.hexdigest()
+
+def get_source_stamp(path: str) -> list:
+    stat = os.stat(path)
+
+    return [stat.st_size, stat.st_mtime_ns]
+
+def load_manifest(root: str) -> dict:
+    try:
+        with open(os.path.join(root, MANIFEST_NAME)) as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return dict()
+
+def save_manifest(root: str, manifest: dict) -> None:
+    path = os.path.join(root, MANIFEST_NAME)
+    with open(path + ".tmp", 'w') as file:
+        json.dump(manifest, file, indent=1)
+    os.replace(path + ".tmp", path)
+
+def read_batches(path: str, batch_size: int):
+    """read the lines of a daily file in batches
+
+    Params:
+        path(str): path to the daily file
+        batch_size(int): the number of lines in a batch
+
+    Yields:
+        list: the lines, with their line feeds
+    """
+
+    batch = list()
+
+    with open(path) as file:
+        for line in file:
+            batch.append(line)
+            if len(batch) == batch_size:
+                yield batch
+                batch = list()
+
+    if batch:
+        yield batch
+
+def tag_file(pool: Pool, source: str, target: str, batch_size: int = BATCH_SIZE) -> int:
+    """tag a daily file with the pool, keeping the order of the articles
+
+    Params:
+        pool(Pool): the pool of the Kiwi workers
+        source(str): path to the cleaned file
+        target(str): path to the tagged file
+        batch_size(int): the number of articles sent to a worker at a time
+
+    Returns:
+        int: the number of articles
+    """
+
+    with measure("tag_corpus", unit="articles", file=source) as record:
+        with open(target + ".tmp", 'w') as file:
+            for tagged in pool.imap(tag_batch, read_batches(source, batch_size)):
+                file.writelines(tagged)
+                record.add(len(tagged))
+
+        os.replace(target + ".tmp", target)
+
+    return record.items
+
+def tag_corpus(cleaned_root: str = CLEANED_ROOT, tagged_root: str = TAGGED_ROOT, user_words: list = USER_WORDS,
+                user_dict: Optional[str] = None, processes: Optional[int] = None, force: bool = False) -> list:
+    """tag the cleaned daily files that are not tagged yet with the current settings
+
+    Params:
+        cleaned_root(str): the directory of the cleaned daily files
+        tagged_root(str): the directory to save the tagged daily files
+        user_words(list): list of (form, tag, score) to add to Kiwi
+        user_dict(Optional[str]): path to a Kiwi user dictionary to load
+        processes(Optional[int]): the number of the worker processes. Defaults to the number of CPUs
+        force(bool): tag every file again
+
+    Returns:
+        list: the names of the tagged files
+    """
+
+    os.makedirs(tagged_root, exist_ok=True)
+
+    settings = get_settings(user_words, user_dict)
+    manifest = load_manifest(tagged_root)
+    if manifest.get("settings") != settings:
+        manifest = {"settings": settings, "sources": dict()}
+
+    pending = list()
+    for path in get_file_paths(cleaned_root):
+        name = os.path.basename(path)
+        target = os.path.join(tagged_root, name)
+        if force or manifest["sources"].get(name) != get_source_stamp(path) or not os.path.exists(target):
+            pending.append(path)
+
+    ic(pending)
+    print(f"Tagging {len(pending)} file(s) with user words {', '.join(form for form, _, _ in user_words)}")
+
+    if not pending:
+        return list()
+
+    with measure("tag_corpus", unit="articles") as record:
+        with Pool(processes, initializer=init_worker, initargs=(user_words, user_dict)) as pool:
+            for path in tqdm(pending, desc="Files: "):
+                name = os.path.basename(path)
+                stamp = get_source_stamp(path)
+                record.add(tag_file(pool, path, os.path.join(tagged_root, name)))
+                manifest["sources"][name] = stamp
+                save_manifest(tagged_root, manifest) # saved after every file, so an interrupted run resumes from there
+
+    print(f"Tagged {record.items} articles in {record.seconds:.1f}s "
+            f"({record.items / max(record.seconds, 1e-9):.1f} articles/s)")
+
+    return [os.path.basename(path) for path in pending]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="tag_corpus",
+                                    description="Tag the cleaned corpus with Kiwi into the tagged corpus")
+
+    parser.add_argument('-c',
+                        '--cleaned_root',
+                        type=str,
+                        dest='cleaned_root',
+                        default=CLEANED_ROOT,
+                        help="Directory of the cleaned daily files")
+    parser.add_argument('-t',
+                        '--tagged_root',
+                        type=str,
+                        dest='tagged_root',
+                        default=TAGGED_ROOT,
+                        help="Directory to save the tagged daily files")
+    parser.add_argument('-u',
+                        '--user_dict',
+                        type=str,
+                        dest='user_dict',
+                        default=None,
+                        help="Kiwi user dictionary to load in addition to the user words")
+    parser.add_argument('-j',
+                        '--processes',
+                        type=int,
+                        dest='processes',
+                        default=None,
+                        help="Number of the Kiwi worker processes. Defaults to the number of CPUs")
+    parser.add_argument('-f',
+                        '--force',
+                        action='store_true',
+                        dest='force',
+                        help="Tag every file again")
+    parser.add_argument('-d',
+                        '--debugging',
+                        action='store_true',
+                        dest='debugging')
+
+    arguments = parser.parse_args()
+
+    set_debug(arguments.debugging)
+
+    tag_corpus(arguments.cleaned_root, arguments.tagged_root,
+                user_dict=arguments.user_dict,
+                processes=arguments.processes,
+                force=arguments.force)
@@ -0,0 +1,304 @@
+# coding: utf-8
+
+"""token_corpus.py
+
+Convert the tagged corpus into a compact token-id format and read it back as memory-mapped arrays.
+
+The FORM/TAG tokens of the daily files in ./data/COVID19/tagged are replaced by integer ids from a vocabulary table,
+so readers can work on NumPy arrays instead of splitting huge strings. The corpus is converted once, and converted
+again only when a daily file is added, removed, or modified.
+
+Files in the corpus directory:
+    - vocab.txt: the tokens, one per line. The line number is the token id.
+    - presses.txt: the press names, one per line. The line number is the press id.
+    - files.txt: the names of the daily files, one per line. The line number is the file id.
+    - tokens.npy: int32 token ids of the whole corpus; titles and bodies of the articles, file by file
+    - articles.npy: int64 position in tokens.npy where each article starts, followed by the total length
+    - article_press.npy: int32 press id of each article
+    - article_file.npy: int32 file id of each article
+    - article_dates.npy: datetime64[D] date of each article, from the name of its file
+    - file_articles.npy: int64 index of the first article of each file, followed by the number of articles
+    - meta.json: the format version and the size and mtime of each daily file the corpus was converted from
+
+As in get_press() of get_corpus_stats.py, the first field of a line is the press if the line has any tab, and the press
+is "NA" otherwise. Empty tokens from repeated spaces are dropped. The tokens are therefore the morphemes proper, and a
+keyword right after the press (the first token of a title) is counted, which the readers splitting the raw text on
+spaces miss because it is joined to the press by a tab.
+
+Author: Gyu-min Lee
+his.nigel at gmail dot com
+"""
+
+import argparse
+import json
+import os
+
+from array import array
+from typing import Optional
+
+import numpy as np
+
+from tqdm import tqdm
+
+from corpus_reader import parse_article
+from instrument import measure
+from instrument import set_debug
+from merge_texts_by_weeks import get_datetime
+from merge_texts_by_weeks import get_file_paths
+from merge_texts_by_weeks import get_week
+
+from icecream import ic
+ic.disable()
+
+CORPUS_VERSION = 1
+CORPUS_DIR = "./data/COVID19/tagged_ids"
+
+def get_article_fields(article: str) -> tuple:
+    """grab the press name and the tokens of the title and the body of the article
+
+    Params:
+        article(str): the article where the press name is separated by a '\t'
+
+    Returns:
+        (str, list): the press name, "NA" if no metadata available, and the tokens
+    """
+
+    article = parse_article(article)
+
+    return article.press, [token for token in article.text.split(' ') if token]
+
+def get_sources_stamp(paths: list) -> dict:
+    """get the size and mtime of the daily files, to tell whether the corpus is up to date
+
+    Params:
+        paths(list): list of paths to the daily files
+
+    Returns:
+        dict: file name and [size, mtime]
+    """
+
+    stamp = dict()
+
+    for path in paths:
+        stat = os.stat(path)
+        stamp[os.path.basename(path)] = [stat.st_size, stat.st_mtime_ns]
+
+    return stamp
+
+def is_up_to_date(corpus_dir: str, paths: list) -> bool:
+    """check whether the corpus was converted from exactly the current daily files
+
+    Params:
+        corpus_dir(str): the corpus directory
+        paths(list): list of paths to the daily files
+
+    Returns:
+        bool: True if the corpus need not be converted again
+    """
+
+    try:
+        with open(os.path.join(corpus_dir, "meta.json")) as file:
+            meta = json.load(file)
+    except (OSError, ValueError):
+        return False
+
+    return meta.get("version") == CORPUS_VERSION and meta.get("sources") == get_sources_stamp(paths)
+
+def write_lines(path: str, lines) -> None:
+    with open(path, 'w') as file:
+        for line in lines:
+            file.write(line)
+            file.write('\n')
+
+def read_lines(path: str) -> list:
+    with open(path) as file:
+        return file.read().split('\n')[:-1]
+
+def build_token_corpus(root: str = "./data/COVID19/tagged", corpus_dir: str = CORPUS_DIR, force: bool = False) -> bool:
+    """convert the daily files in root into the token-id format
+
+    Params:
+        root(str): the directory of the daily tagged files
+        corpus_dir(str): the directory to save the corpus in
+        force(bool): convert even if the corpus is up to date
+
+    Returns:
+        bool: True if the corpus was (re)converted, False if it was up to date
+    """
+
+    paths = get_file_paths(root)
+
+    if not force and is_up_to_date(corpus_dir, paths):
+        return False
+
+    os.makedirs(corpus_dir, exist_ok=True)
+
+    meta_path = os.path.join(corpus_dir, "meta.json")
+    if os.path.exists(meta_path): # invalidate first, so an interrupted conversion is never taken as complete
+        os.remove(meta_path)
+
+    vocab = dict()
+    presses = dict()
+    tokens = array('i')
+    articles = array('q')
+    article_press = array('i')
+    article_file = array('i')
+    article_dates = list()
+    file_articles = array('q')
+
+    for file_id, path in enumerate(tqdm(paths, desc="Converting: ")):
+        date = np.datetime64(get_datetime(path).date(), 'D')
+        file_articles.append(len(articles))
+        with open(path) as file:
+            for article in file:
+                press, article_tokens = get_article_fields(article.rstrip('\n'))
+                articles.append(len(tokens))
+                article_press.append(presses.setdefault(press, len(presses)))
+                article_file.append(file_id)
+                article_dates.append(date)
+                for token in article_tokens:
+                    token_id = vocab.get(token)
+                    if token_id is None:
+                        token_id = vocab[token] = len(vocab)
+                    tokens.append(token_id)
+
+    file_articles.append(len(articles))
+    articles.append(len(tokens))
+
+    save = lambda name, values: np.save(os.path.join(corpus_dir, name), values)
+    save("tokens.npy", np.frombuffer(tokens, dtype=np.int32))
+    save("articles.npy", np.frombuffer(articles, dtype=np.int64))
+    save("article_press.npy", np.frombuffer(article_press, dtype=np.int32))
+    save("article_file.npy", np.frombuffer(article_file, dtype=np.int32))
+    save("article_dates.npy", np.array(article_dates, dtype="datetime64[D]"))
+    save("file_articles.npy", np.frombuffer(file_articles, dtype=np.int64))
+
+    write_lines(os.path.join(corpus_dir, "vocab.txt"), vocab)
+    write_lines(os.path.join(corpus_dir, "presses.txt"), presses)
+    write_lines(os.path.join(corpus_dir, "files.txt"), (os.path.basename(path) for path in paths))
+
+    with open(meta_path, 'w') as file: # written last: marks the corpus as complete
+        json.dump({"version": CORPUS_VERSION, "sources": get_sources_stamp(paths)}, file, ensure_ascii=False)
+
+    return True
+
+class TokenCorpus:
+    """Memory-mapped tagged corpus in the token-id format, as build_token_corpus() saves it
+
+    Params:
+        corpus_dir(str): the corpus directory
+    """
+
+    def __init__(self, corpus_dir: str = CORPUS_DIR):
+        self.corpus_dir = corpus_dir
+
+        self.vocab = read_lines(os.path.join(corpus_dir, "vocab.txt"))
+        self.presses = read_lines(os.path.join(corpus_dir, "presses.txt"))
+        self.files = read_lines(os.path.join(corpus_dir, "files.txt"))
+
+        self.token_ids = {token: token_id for token_id, token in enumerate(self.vocab)}
+
+        self.tokens = self.load("tokens.npy")
+        self.articles = self.load("articles.npy")
+        self.article_press = self.load("article_press.npy")
+        self.article_file = self.load("article_file.npy")
+        self.article_dates = self.load("article_dates.npy")
+        self.file_articles = self.load("file_articles.npy")
+
+    def load(self, name: str) -> np.ndarray:
+        """memory-map an array of the corpus directory"""
+
+        return np.load(os.path.join(self.corpus_dir, name), mmap_mode='r')
+
+    def token_id(self, token: str) -> Optional[int]:
+        """get the id of the token, or None if it is not in the corpus"""
+
+        return self.token_ids.get(token)
+
+    def decode(self, token_ids: np.ndarray) -> list:
+        """get the tokens of the ids"""
+
+        return [self.vocab[token_id] for token_id in token_ids]
+
+    def article_lengths(self) -> np.ndarray:
+        """get the number of tokens in each article"""
+
+        return np.diff(self.articles)
+
+    def article_of(self, positions: np.ndarray) -> np.ndarray:
+        """get the article of each position in tokens.npy"""
+
+        return np.searchsorted(self.articles, positions, side="right") - 1
+
+    def weeks(self) -> tuple:
+        """group the articles by the week of their dates
+
+        The daily files are converted in the order of their dates, so the articles of a week are contiguous.
+
+        Returns:
+            (list, np.ndarray): the Monday of each week as datetime, and the index of the first article of each week
+                followed by the number of articles
+        """
+
+        file_weeks = [get_week(get_datetime(name)) for name in self.files]
+
+        weeks = list()
+        starts = list()
+
+        for file_id, week in enumerate(file_weeks):
+            if not weeks or weeks[-1] != week:
+                weeks.append(week)
+                starts.append(self.file_articles[file_id])
+
+        starts.append(self.file_articles[-1])
+
+        return weeks, np.array(starts, dtype=np.int64)
+
+def main(root, corpus_dir, force, do_debug):
+
+    set_debug(do_debug)
+
+    with measure("token_corpus", unit="tokens") as record:
+        converted = build_token_corpus(root, corpus_dir, force)
+        if converted:
+            corpus = TokenCorpus(corpus_dir)
+            record.add(len(corpus.tokens))
+
+    if converted:
+        print(f"Converted {len(corpus.files)} files, {len(corpus.articles) - 1} articles, "
+                f"and {len(corpus.tokens)} tokens of {len(corpus.vocab)} types into {corpus_dir}")
+    else:
+        print(f"The token-id corpus in {corpus_dir} is up to date")
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(prog="token_corpus",
+                                    description="Convert the tagged corpus into the token-id format")
+
+    parser.add_argument('-r',
+                        '--root',
+                        type=str,
+                        dest='root',
+                        action='store',
+                        default='./data/COVID19/tagged',
+                        help="Directory of the daily tagged files")
+    parser.add_argument('-o',
+                        '--corpus_dir',
+                        type=str,
+                        dest='corpus_dir',
+                        action='store',
+                        default=CORPUS_DIR,
+                        help="Directory to save the token-id corpus")
+    parser.add_argument('-f',
+                        '--force',
+                        action='store_true',
+                        dest='force',
+                        help="Convert even if the corpus is up to date")
+    parser.add_argument('-d',
+                        '--debugging',
+                        action='store_true',
+                        dest='debugging')
+
+    arguments = parser.parse_args()
+
+    main(arguments.root, arguments.corpus_dir, arguments.force, arguments.debugging)
@@ -0,0 +1,307 @@
+# coding: utf-8
+
+"""transfer_entropy.py
+
+Calculate the transfer entropy between the weekly linguistic features and the health indexes, in place of
+calculate_TE.r.
+
+The estimation follows transfer_entropy() of RTransferEntropy with its defaults, as calculate_TE.r used it:
+    - each series is discretized into three bins at its 5% and 95% quantiles
+    - the Shannon transfer entropy in bits, with a lag of one week for both series
+    - the effective transfer entropy, from which the mean over 100 shuffles of the source series is subtracted
+    - the p-value from 300 bootstraps under the null hypothesis of no transfer: both series are simulated as
+      independent Markov chains of their own transitions (after a burn-in of 50 weeks), and the p-value is the
+      proportion of the bootstraps with a larger transfer entropy than the observed one
+Each direction of every pair of a linguistic feature and a health index is a task for a process pool, and the shuffles
+and the bootstraps of a task are all computed at once as arrays.
+
+The result is saved in the layout of ./results/TE_wkly_220810.xlsx: a row and a column for each variable, and in each
+cell the transfer entropy from the variable of the column to that of the row, blank if not significant (p >= 0.05),
+and x for the pairs out of the scope. All the estimates are also saved as a CSV file with --details.
+
+The weekly series are read from the results store of results_store.py, or from a spreadsheet in the layout of
+./results/key_stats_wkly_220805.xlsx with --input.
+
+Usage: python ./scripts/transfer_entropy.py --output ./results/TE_wkly.xlsx
+
+Author: Gyu-min Lee
+his.nigel at gmail dot com
+"""
+
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from tqdm.contrib.concurrent import process_map
+
+from results_store import ResultsStore
+from results_store import STORE_PATH
+
+HEALTH_INDEXES = {"confirmed": "일간 확진자", "died": "일간 사망자", "vaccine_1st": "전국 1차 신규",
+                    "vaccine_2nd": "전국 2차 신규", "vaccine_3rd": "전국 3차 신규"}
+FEATURE_KEYWORDS = {"covid": "코로나/NNP", "confirmed": "확진/NNG", "vaccine": "백신/NNG", "mask": "마스크/NNG",
+                    "distancing": "거리두기/NNG"}
+FEATURE_METRICS = {"abs": "freq_abs", "rel": "freq_rel", "sa_dict": "dict_SA", "sa_bert": "bert_SA"}
+
+QUANTILES = (5, 95)
+SHUFFLES = 100
+NBOOT = 300
+BURN = 50
+SIGNIFICANCE = 0.05
+SEED = 37
+
+def get_feature_names() -> list:
+    """get the names of the linguistic features, e.g., covid_abs, in the order of key_stats"""
+
+    return [f"{name}_{suffix}" for name in FEATURE_KEYWORDS for suffix in FEATURE_METRICS]
+
+def load_key_stats(store_path: str = STORE_PATH) -> pd.DataFrame:
+    """get the weekly health indexes and linguistic features from the results store
+
+    Params:
+        store_path(str): path to the results store
+
+    Returns:
+        pd.DataFrame: the series indexed by the week, a column for each variable, only the weeks with all of them
+    """
+
+    columns = dict()
+
+    with ResultsStore(store_path) as store:
+        health = store.get_table("health")
+        for name, column in HEALTH_INDEXES.items():
+            columns[name] = health[column]
+
+        for suffix, metric in FEATURE_METRICS.items():
+            table = store.get_table(metric)
+            for name, keyword in FEATURE_KEYWORDS.items():
+                columns[f"{name}_{suffix}"] = table[keyword]
+
+    return pd.DataFrame(columns).dropna()
+
+def discretize(series: np.ndarray, quantiles: tuple = QUANTILES) -> np.ndarray:
+    """discretize the series into bins at its quantiles
+
+    The bins are closed on the right as those of cut() in R, the first being (-inf, the first quantile]. The quantiles
+    are those of type 6 in R, with which the transfer entropies of TE_wkly_220810.xlsx are reproduced from
+    key_stats_wkly_220805.xlsx.
+
+    Params:
+        series(np.ndarray): the series
+        quantiles(tuple): the quantiles in percent
+
+    Returns:
+        np.ndarray: the bin of each value, from 0 to len(quantiles)
+    """
+
+    edges = np.percentile(series, quantiles, method="weibull")
+
+    return np.searchsorted(edges, series, side='left')
+
+def entropy(codes: np.ndarray, size: int) -> np.ndarray:
+    """get the Shannon entropy in bits of each row of the codes
+
+    Params:
+        codes(np.ndarray): the states as integers in [0, size), a row for each series
+        size(int): the number of the possible states
+
+    Returns:
+        np.ndarray: the entropy of each row
+    """
+
+    rows, length = codes.shape
+    counts = np.bincount((np.arange(rows)[:, None] * size + codes).ravel(), minlength=rows * size)
+    probs = counts.reshape(rows, size) / length
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return -np.where(probs > 0, probs * np.log2(probs), 0.0).sum(axis=1)
+
+def transfer_entropy(source: np.ndarray, target: np.ndarray, bins: int) -> np.ndarray:
+    """get the Shannon transfer entropy from the source to the target with a lag of one
+
+    TE = H(target_t+1, target_t) - H(target_t) - H(target_t+1, target_t, source_t) + H(target_t, source_t)
+
+    Params:
+        source(np.ndarray): the discretized source, a row for each series
+        target(np.ndarray): the discretized target, a row for each series
+        bins(int): the number of the bins
+
+    Returns:
+        np.ndarray: the transfer entropy in bits from each row of the source to the row of the target, the rows of
+            either broadcast to those of the other
+    """
+
+    source, target = np.broadcast_arrays(np.atleast_2d(source), np.atleast_2d(target))
+    source = source[:, :-1]
+    future = target[:, 1:]
+    present = target[:, :-1]
+
+    return (entropy(future * bins + present, bins ** 2)
+            - entropy(present, bins)
+            - entropy((future * bins + present) * bins + source, bins ** 3)
+            + entropy(present * bins + source, bins ** 2))
+
+def markov_bootstrap(codes: np.ndarray, bins: int, nboot: int, burn: int, rng: np.random.Generator) -> np.ndarray:
+    """simulate series as Markov chains with the transitions of the discretized series
+
+    Params:
+        codes(np.ndarray): the discretized series
+        bins(int): the number of the bins
+        nboot(int): the number of the series to simulate
+        burn(int): the number of the first states to discard
+        rng(np.random.Generator): the random generator
+
+    Returns:
+        np.ndarray: the simulated series, a row for each
+    """
+
+    transitions = np.zeros((bins, bins))
+    np.add.at(transitions, (codes[:-1], codes[1:]), 1)
+    transitions[transitions.sum(axis=1) == 0] = 1 # a state never left moves anywhere
+    cumulative = np.cumsum(transitions / transitions.sum(axis=1, keepdims=True), axis=1)
+
+    states = rng.choice(codes, size=nboot)
+    chains = np.empty((nboot, len(codes) + burn), dtype=codes.dtype)
+
+    for step in range(chains.shape[1]):
+        states = np.minimum((rng.random(nboot)[:, None] > cumulative[states]).sum(axis=1), bins - 1)
+        chains[:, step] = states
+
+    return chains[:, burn:]
+
+def estimate(task: tuple) -> dict:
+    """estimate the transfer entropy from the source to the target, and its significance
+
+    Params:
+        task(tuple): (source name, target name, source series, target series, seed)
+
+    Returns:
+        dict: the source, the target, te, ete, se, and p
+    """
+
+    source_name, target_name, source, target, seed = task
+
+    rng = np.random.default_rng(seed)
+    bins = len(QUANTILES) + 1
+    source = discretize(source)
+    target = discretize(target)
+
+    te = transfer_entropy(source, target, bins)[0]
+
+    shuffled = rng.permuted(np.broadcast_to(source, (SHUFFLES, len(source))), axis=1)
+    ete = te - transfer_entropy(shuffled, target, bins).mean()
+
+    boot = transfer_entropy(markov_bootstrap(source, bins, NBOOT, BURN, rng),
+                            markov_bootstrap(target, bins, NBOOT, BURN, rng), bins)
+
+    return {"source": source_name, "target": target_name, "te": te, "ete": ete, "se": boot.std(ddof=1),
+            "p": (boot > te).mean()}
+
+def estimate_all(key_stats: pd.DataFrame, seed: int = SEED, max_workers: int = None) -> pd.DataFrame:
+    """estimate the transfer entropy in both directions for every pair of a linguistic feature and a health index
+
+    Params:
+        key_stats(pd.DataFrame): the weekly series, a column for each variable
+        seed(int): the random seed
+        max_workers(int): the number of the processes. Defaults to the number of CPUs
+
+    Returns:
+        pd.DataFrame: the source, the target, te, ete, se, and p of each direction
+    """
+
+    health = [name for name in HEALTH_INDEXES if name in key_stats]
+    features = [name for name in get_feature_names() if name in key_stats]
+
+    pairs = [(feature, index) for feature in features for index in health]
+    pairs += [(index, feature) for feature, index in pairs]
+
+    tasks = [(source, target, key_stats[source].to_numpy(dtype=float), key_stats[target].to_numpy(dtype=float),
+                [seed, number]) for number, (source, target) in enumerate(pairs)]
+
+    results = process_map(estimate, tasks, max_workers=max_workers, chunksize=max(1, len(tasks) // 64),
+                            desc="Pairs: ")
+
+    return pd.DataFrame(results)
+
+def get_matrix(results: pd.DataFrame, significance: float = SIGNIFICANCE) -> pd.DataFrame:
+    """lay out the significant transfer entropies as in TE_wkly_220810.xlsx
+
+    Params:
+        results(pd.DataFrame): the estimates as estimate_all() returns
+        significance(float): the p-value under which a transfer entropy is significant
+
+    Returns:
+        pd.DataFrame: the transfer entropy from the column to the row, NaN if not significant, x if out of the scope
+    """
+
+    health = [name for name in HEALTH_INDEXES if name in set(results["source"])]
+    features = [name for name in get_feature_names() if name in set(results["source"])]
+    names = health + features
+
+    matrix = pd.DataFrame("x", index=names, columns=names, dtype=object)
+    matrix.loc[health, features] = np.nan
+    matrix.loc[features, health] = np.nan
+
+    for row in results.itertuples():
+        if row.p < significance:
+            matrix.loc[row.target, row.source] = round(row.te, 3)
+
+    return matrix
+
+def main(input_path: str = None, output_path: str = "./results/TE_wkly.xlsx", details_path: str = None,
+            seed: int = SEED, max_workers: int = None):
+    if input_path is None:
+        key_stats = load_key_stats()
+    else:
+        key_stats = pd.read_excel(input_path, index_col=0)
+
+    print(f"Estimating the transfer entropy over {len(key_stats)} weeks...")
+
+    results = estimate_all(key_stats, seed, max_workers)
+
+    get_matrix(results).to_excel(output_path)
+    print(f"Result saved as {output_path}")
+
+    if details_path is not None:
+        results.to_csv(details_path, index=False)
+        print(f"Estimates saved as {details_path}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="transfer_entropy",
+                                    description="Transfer entropy between the linguistic features and the health indexes")
+
+    parser.add_argument('-i',
+                        '--input',
+                        type=str,
+                        dest='input',
+                        default=None,
+                        help="Spreadsheet of the weekly series in the layout of key_stats_wkly_220805.xlsx. "
+                                "Read from the results store if not given")
+    parser.add_argument('-o',
+                        '--output',
+                        type=str,
+                        dest='output',
+                        default="./results/TE_wkly.xlsx",
+                        help="Path to save the matrix of the significant transfer entropies")
+    parser.add_argument('--details',
+                        type=str,
+                        dest='details',
+                        default=None,
+                        help="Path to save te, ete, se, and p of every direction as CSV")
+    parser.add_argument('-s',
+                        '--seed',
+                        type=int,
+                        dest='seed',
+                        default=SEED,
+                        help="Random seed of the shuffles and the bootstraps")
+    parser.add_argument('-j',
+                        '--jobs',
+                        type=int,
+                        dest='jobs',
+                        default=None,
+                        help="Number of the processes. Defaults to the number of CPUs")
+
+    arguments = parser.parse_args()
+
+    main(arguments.input, arguments.output, arguments.details, arguments.seed, arguments.jobs)
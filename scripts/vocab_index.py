@@ -0,0 +1,191 @@
+# coding: utf-8
+
+"""vocab_index.py
+
+Expand wildcard keyword queries into the FORM/TAG tokens of the tagged corpus.
+
+The vocabulary of the token-id corpus of token_corpus.py is sorted once into an array, in which the tokens sharing a
+prefix are contiguous. A query is then answered by two binary searches for the range of its literal prefix, and only
+the tokens in that range are matched against the rest of the pattern. The queries are shell-style patterns over the
+whole FORM/TAG token, matched case-sensitively:
+    - 코로나/NNP: the token itself, if it is in the corpus
+    - 코로나*: every token starting with 코로나, e.g., 코로나/NNP, 코로나19/SN, and 코로나바이러스/NNG
+    - 백신/*: the form 백신 with any tag
+    - 코로나*/NN?: the forms starting with 코로나 tagged NNG or NNP
+    - [백신]*/NNG or */SN: any pattern of fnmatch, although those without a literal prefix are matched against the
+      whole vocabulary
+A query without any of *, ?, and [ is taken as a token as is, without loading the vocabulary.
+
+Usage: python ./scripts/vocab_index.py "코로나*" "백신/*"
+
+Author: Gyu-min Lee
+his.nigel at gmail dot com
+"""
+
+import argparse
+import os
+import re
+
+from bisect import bisect_left
+from fnmatch import fnmatchcase
+from typing import Iterable
+
+from instrument import measure
+from token_corpus import CORPUS_DIR
+from token_corpus import build_token_corpus
+from token_corpus import read_lines
+
+WILDCARDS = re.compile(r"[*?\[]")
+
+def is_pattern(query: str) -> bool:
+    """check whether the query has any wildcard"""
+
+    return WILDCARDS.search(query) is not None
+
+def get_prefix(query: str) -> str:
+    """get the literal prefix of the query, before its first wildcard"""
+
+    match = WILDCARDS.search(query)
+
+    return query if match is None else query[:match.start()]
+
+class VocabIndex:
+    """Sorted vocabulary of the corpus, answering the wildcard queries
+
+    Params:
+        vocab(Iterable[str]): the tokens in FORM/TAG format, e.g., vocab.txt of the token-id corpus
+    """
+
+    def __init__(self, vocab: Iterable[str]):
+        self.tokens = sorted(set(vocab))
+
+    def __len__(self):
+        return len(self.tokens)
+
+    def prefixed(self, prefix: str) -> list:
+        """get the tokens starting with the prefix, in sorted order
+
+        Params:
+            prefix(str): the prefix
+
+        Returns:
+            list: the tokens
+        """
+
+        if not prefix:
+            return self.tokens
+
+        start = bisect_left(self.tokens, prefix)
+        end = bisect_left(self.tokens, prefix[:-1] + chr(ord(prefix[-1]) + 1), start)
+
+        return self.tokens[start:end]
+
+    def expand(self, query: str) -> list:
+        """get the tokens matching the query, in sorted order
+
+        Params:
+            query(str): the token, or a pattern of it
+
+        Returns:
+            list: the tokens in the corpus. Empty if none matches
+        """
+
+        prefix = get_prefix(query)
+        candidates = self.prefixed(prefix)
+
+        if prefix == query:
+            return candidates[:1] if candidates[:1] == [query] else list()
+
+        return [token for token in candidates if fnmatchcase(token, query)]
+
+def load_vocab_index(root: str = "./data/COVID19/tagged", corpus_dir: str = CORPUS_DIR) -> VocabIndex:
+    """get the index of the vocabulary of the token-id corpus, converting the corpus first if it is out of date
+
+    Params:
+        root(str): the directory of the daily tagged files
+        corpus_dir(str): the directory of the token-id corpus
+
+    Returns:
+        VocabIndex: the index
+    """
+
+    build_token_corpus(root, corpus_dir)
+
+    return VocabIndex(read_lines(os.path.join(corpus_dir, "vocab.txt")))
+
+def expand_queries(queries: list, index: VocabIndex = None, root: str = "./data/COVID19/tagged",
+                    corpus_dir: str = CORPUS_DIR) -> dict:
+    """expand each query into its tokens
+
+    Params:
+        queries(list): the tokens in FORM/TAG format, or patterns of them
+        index(VocabIndex): the index of the vocabulary. Loaded with load_vocab_index() if any query is a pattern
+        root(str): the directory of the daily tagged files, to load the index from
+        corpus_dir(str): the directory of the token-id corpus, to load the index from
+
+    Returns:
+        dict: the query and the list of its tokens. A query without any wildcard is its only token
+    """
+
+    if index is None and any(is_pattern(query) for query in queries):
+        index = load_vocab_index(root, corpus_dir)
+
+    return {query: index.expand(query) if is_pattern(query) else [query] for query in queries}
+
+def get_token_queries(expansions: dict) -> dict:
+    """invert the expansions of expand_queries()
+
+    Params:
+        expansions(dict): the query and the list of its tokens
+
+    Returns:
+        dict: the token and the list of the queries it belongs to, for every token of the union
+    """
+
+    token_queries = dict()
+
+    for query, tokens in expansions.items():
+        for token in tokens:
+            token_queries.setdefault(token, list()).append(query)
+
+    return token_queries
+
+def main(queries, root, corpus_dir):
+    with measure("vocab_index", unit="queries") as record:
+        index = load_vocab_index(root, corpus_dir)
+        expansions = expand_queries(queries, index)
+        record.add(len(queries))
+
+    for query, tokens in expansions.items():
+        print(f"{query}: {len(tokens)} of {len(index)} tokens")
+        for token in tokens:
+            print(f"\t{token}")
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(prog="vocab_index",
+                                    description="Expand wildcard keyword queries into the tokens of the tagged corpus")
+
+    parser.add_argument('queries',
+                        metavar='query',
+                        nargs='+',
+                        type=str,
+                        help="Tokens in FORM/TAG format or patterns of them, e.g., 코로나* or 백신/*")
+    parser.add_argument('-r',
+                        '--root',
+                        type=str,
+                        dest='root',
+                        action='store',
+                        default='./data/COVID19/tagged',
+                        help="Directory of the daily tagged files")
+    parser.add_argument('-o',
+                        '--corpus_dir',
+                        type=str,
+                        dest='corpus_dir',
+                        action='store',
+                        default=CORPUS_DIR,
+                        help="Directory of the token-id corpus")
+
+    arguments = parser.parse_args()
+
+    main(arguments.queries, arguments.root, arguments.corpus_dir)